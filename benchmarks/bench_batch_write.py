@@ -0,0 +1,115 @@
+"""
+seed_cid_products.batch_write : écriture parallèle en process (BatchWriteItem)
+vérifiée sur moto avec un catalogue synthétique (100k items par défaut).
+
+--latency simule l'aller-retour réseau d'un appel (moto est en process) ;
+--capacity limite la table à N items/s (seau à jetons) : le surplus revient en
+UnprocessedItems, comme une table provisionnée en limite de WCU, pour exercer
+les reprises et le ralentissement adaptatif.
+Chaque passe vide la table puis vérifie qu'elle contient exactement les items.
+
+L'ancienne version lançait `aws dynamodb batch-write-item` par lot de 25 :
+~0,5 s de démarrage du CLI par appel, soit ~30 min de fork pour 100k items.
+
+    pip install boto3 moto
+    python benchmarks/bench_batch_write.py --items 100000 --workers 1,4,8 --latency 0.01
+    python benchmarks/bench_batch_write.py --items 20000 --workers 8 --capacity 1000
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from common import ROOT, create_products_table, set_default_env, synthetic_catalog, typed_item
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+
+class ThrottledClient:
+    """Client DynamoDB avec latence réseau et capacité d'écriture (items/s) simulées."""
+
+    def __init__(self, client, latency: float, capacity: float):
+        self._client = client
+        self._latency = latency
+        self._capacity = capacity
+        self._tokens = capacity
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _take(self, n: int) -> int:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * self._capacity)
+            self._refilled = now
+            granted = min(n, int(self._tokens))
+            self._tokens -= granted
+            return granted
+
+    def batch_write_item(self, RequestItems):
+        self.calls += 1
+        if self._latency:
+            time.sleep(self._latency)
+        if not self._capacity:
+            return self._client.batch_write_item(RequestItems=RequestItems)
+        (table, reqs), = RequestItems.items()
+        granted = self._take(len(reqs))
+        if granted:
+            self._client.batch_write_item(RequestItems={table: reqs[:granted]})
+        return {"UnprocessedItems": {table: reqs[granted:]} if granted < len(reqs) else {}}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=100000)
+    ap.add_argument("--workers", default="1,4,8")
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--capacity", type=float, default=0.0, help="items/s acceptés (0 = illimité)")
+    args = ap.parse_args()
+
+    set_default_env()
+    categories, products = synthetic_catalog(args.items)
+    items = [typed_item(it) for it in (categories + products)[:args.items]]
+
+    from moto import mock_aws
+
+    with mock_aws():
+        import boto3
+
+        name = os.environ["PRODUCTS_TABLE"]
+        ddb = boto3.resource("dynamodb")
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            try:
+                ddb.Table(name).delete()
+            except Exception:
+                pass
+            table = create_products_table(ddb, name)
+            client = ThrottledClient(boto3.client("dynamodb"), args.latency, args.capacity)
+
+            t0 = time.perf_counter()
+            stats = seed.batch_write(items, table=name, workers=workers, client=client, progress_every=0)
+            wall = time.perf_counter() - t0
+
+            count, kwargs = 0, {"Select": "COUNT"}
+            while True:
+                res = table.scan(**kwargs)
+                count += res["Count"]
+                if "LastEvaluatedKey" not in res:
+                    break
+                kwargs["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+            assert count == len(items) and stats.counts["failed"] == 0, (count, stats.counts)
+
+            baseline = baseline or wall
+            print(json.dumps({"workers": workers, "items": len(items), "calls": client.calls,
+                              "wall_s": round(wall, 2), "items_per_s": round(len(items) / wall),
+                              "speedup": round(baseline / wall, 2), "table_count": count,
+                              "capacity_use": round(len(items) / wall / args.capacity, 2) if args.capacity else None,
+                              "stats": stats.counts}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Construction de l'arbre /api/catalog : builder indexé vs implémentation historique.
+
+Vérifie que la sortie est identique puis mesure le temps à 1k/10k/100k produits
+(le nombre de sous-catégories grandit avec le catalogue, ce qui rend
+l'ancienne boucle imbriquée quadratique).
+
+    python benchmarks/bench_catalog_builder.py --sizes 1000,10000,100000
+"""
+import argparse
+import copy
+import random
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+from common import set_default_env, synthetic_catalog
+
+set_default_env()
+from bff import app  # noqa: E402
+
+
+def legacy_build(categories, products):
+    """Boucles de l'ancien handler /api/catalog (référence)."""
+    # Index des catégories par id
+    cat_by_id: Dict[str, Dict[str, Any]] = {}
+    top: List[Dict[str, Any]] = []
+
+    # 1) Préparer les catégories
+    for c in categories:
+        cid = c.get("product_id")
+        if not cid:
+            continue
+
+        node = {
+            "id": cid,
+            "name": c.get("name"),
+            "url": c.get("source_url"),
+            "category": c.get("category"),
+            "level": c.get("level"),
+            "children": [],   # sous-catégories
+            "products": [],   # produits attachés à ce node
+        }
+        cat_by_id[cid] = node
+
+    # Index des catégories par URL (pour rattacher les produits même si parent_id ne match pas)
+    cat_by_url: Dict[str, Dict[str, Any]] = {}
+    for node in cat_by_id.values():
+        u = (node.get("url") or "").rstrip("/")
+        if u:
+            cat_by_url[u] = node
+
+    # 2) Trouver les top categories (level=1 ou pas de parent_id)
+    #    + rattacher les sous-catégories (level=2)
+    for c in categories:
+        cid = c.get("product_id")
+        if not cid or cid not in cat_by_id:
+            continue
+
+        node = cat_by_id[cid]
+        parent = c.get("parent_id")
+
+        if not parent:
+            top.append(node)
+        else:
+            # parent_id de niveau 2 ressemble souvent à "engrais" ou "produits-chimiques"
+            parent_slug = parent
+            parent_top = None
+
+            for t in cat_by_id.values():
+                if t.get("level") == 1 and t.get("category") == parent_slug:
+                    parent_top = t
+                    break
+
+            if parent_top:
+                parent_top["children"].append(node)
+            else:
+                # fallback: si le parent_id est un vrai ID
+                if parent in cat_by_id:
+                    cat_by_id[parent]["children"].append(node)
+
+    # 3) Rattacher les produits
+    # Priorité:
+    # 1) parent_id exact (si ça match un node id)
+    # 2) sinon: URL niveau 2 (https://cidgroupe.com/<lvl1>/<lvl2>)
+    # 3) sinon: URL niveau 1 (https://cidgroupe.com/<lvl1>)
+    for p in products:
+        pid = p.get("product_id")
+        if not pid:
+            continue
+
+        prod = {
+            "id": pid,
+            "name": p.get("name"),
+            "url": p.get("source_url"),
+            "category": p.get("category"),
+            "level": p.get("level"),
+            "type": p.get("type"),
+        }
+
+        # 1) match direct parent_id -> category node id
+        parent_id = p.get("parent_id")
+        if parent_id and parent_id in cat_by_id:
+            cat_by_id[parent_id]["products"].append(prod)
+            continue
+
+        # 2) fallback: calculer l'URL "niveau 2"
+        src = (p.get("source_url") or "").rstrip("/")
+        try:
+            parts = [x for x in urlparse(src).path.strip("/").split("/") if x]
+        except Exception:
+            parts = []
+
+        if len(parts) >= 2:
+            lvl2_url = f"https://cidgroupe.com/{parts[0]}/{parts[1]}"
+            node = cat_by_url.get(lvl2_url)
+            if node:
+                node["products"].append(prod)
+                continue
+
+        # 3) fallback: URL niveau 1
+        if len(parts) >= 1:
+            lvl1_url = f"https://cidgroupe.com/{parts[0]}"
+            node = cat_by_url.get(lvl1_url)
+            if node:
+                node["products"].append(prod)
+                continue
+
+        # sinon: orphelin -> on ignore (ou tu peux les collecter)
+
+    # Tri par nom (menu stable)
+    def by_name(x):
+        return (x.get("name") or "").lower()
+
+    for t in top:
+        t["children"].sort(key=by_name)
+        t["products"].sort(key=by_name)
+        for ch in t["children"]:
+            ch["products"].sort(key=by_name)
+
+    top.sort(key=by_name)
+
+    return 200, {"categories": top}
+
+
+def new_build(categories, products, roots=None):
+    builder = app._CatalogBuilder(roots)
+    builder.add_categories(categories)
+    builder.add_products(products)
+    return 200, builder.build()
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--legacy-max", type=int, default=100000,
+                    help="ne pas lancer l'ancien code au-delà de cette taille")
+    args = ap.parse_args()
+
+    for n in (int(x) for x in args.sizes.split(",")):
+        per_top = max(10, n // 100)
+        categories, products = synthetic_catalog(n, n_top=4, per_top=per_top)
+        # un Scan DynamoDB rend les items dans l'ordre des hash, pas niveau 1 d'abord
+        rng = random.Random(n)
+        rng.shuffle(categories)
+        rng.shuffle(products)
+
+        (_, new_out), t_new = timed(new_build, copy.deepcopy(categories), products)
+        line = {"products": n, "categories": len(categories),
+                "builder_ms": round(t_new * 1000, 1),
+                "builder_us_per_item": round(t_new * 1e6 / (n + len(categories)), 3)}
+
+        if n <= args.legacy_max:
+            (_, old_out), t_old = timed(legacy_build, copy.deepcopy(categories), products)
+            assert old_out == new_out, "sortie différente de l'implémentation historique"
+            line["legacy_ms"] = round(t_old * 1000, 1)
+            line["identical"] = True
+
+        # sous-arbre : même résultat que filtrer l'arbre complet
+        root = categories[0]["category"]
+        _, sub = new_build(copy.deepcopy(categories), products, {root})
+        assert sub["categories"] == [t for t in new_out["categories"] if t["category"] == root]
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+/api/catalog : appels upstream séquentiels vs fan-out.
+
+Stub products-service local avec latence injectée, puis p50/p99 du handler BFF.
+
+    python benchmarks/bench_catalog_fanout.py --latency 0.05 --iterations 50
+"""
+import argparse
+import os
+import time
+
+from common import StubUpstream, set_default_env, summarize_ms, synthetic_catalog
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.05, help="latence upstream (s)")
+    ap.add_argument("--iterations", type=int, default=50)
+    ap.add_argument("--products", type=int, default=500)
+    args = ap.parse_args()
+
+    categories, products = synthetic_catalog(args.products)
+
+    def route(method, path, query, body):
+        if query.get("type") == "category":
+            return 200, {"items": categories}
+        return 200, {"items": products}
+
+    with StubUpstream(route, latency=args.latency) as stub:
+        os.environ["PRODUCTS_BASE_URL"] = stub.base_url
+        os.environ["BFF_CATALOG_CACHE_TTL"] = "0"  # mesurer les appels upstream, pas le cache
+        set_default_env()
+        from bff import app
+
+        event = {"httpMethod": "GET", "path": "/api/catalog"}
+        for label, fanout in (("sequential", False), ("fanout", True)):
+            app.UPSTREAM_FANOUT = fanout
+            app.handler(event, None)  # warm-up
+            samples = []
+            for _ in range(args.iterations):
+                t0 = time.perf_counter()
+                res = app.handler(event, None)
+                samples.append(time.perf_counter() - t0)
+                assert res["statusCode"] == 200, res
+            print(label, summarize_ms(samples))
+
+
+if __name__ == "__main__":
+    main()
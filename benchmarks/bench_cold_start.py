@@ -0,0 +1,205 @@
+"""
+Cold start des handlers Lambda : chaque mesure est un interpréteur neuf
+(`python -X importtime`), comme un nouvel environnement d'exécution.
+
+Mesure, par service :
+- import du module (phase "Init" Lambda), vu de l'extérieur et via STARTUP_PROFILE
+- premier appel (phase "Invoke" froide : création lazy des clients boto3, etc.)
+- les modules les plus coûteux à l'import (-X importtime, cumulé)
+
+DynamoDB est servi par moto en mode serveur (AWS_ENDPOINT_URL_DYNAMODB) pour que
+le sous-processus ne dépende pas d'un mock in-process ; le BFF parle à un stub HTTP.
+
+--baseline-rev charge la version d'un commit (ex. HEAD~1) pour comparer.
+
+    pip install boto3 "moto[server]"
+    python benchmarks/bench_cold_start.py --runs 5
+    python benchmarks/bench_cold_start.py --runs 5 --baseline-rev HEAD~1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+from common import ROOT, StubUpstream, set_default_env
+
+SERVICES = ("products", "contact", "bff")
+
+EVENTS = {
+    "products": {"pathParameters": {"product_id": "p-1"}},
+    "contact": {"httpMethod": "POST", "body": json.dumps(
+        {"name": "Bench", "email": "bench@example.com", "message": "cold start"})},
+    "bff": {"httpMethod": "GET", "path": "/api/products/p-1", "pathParameters": {"product_id": "p-1"}},
+}
+
+# exécuté dans l'interpréteur neuf ; sys.path = src du service + layer cid_shared
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from {svc} import app
+t1 = time.perf_counter()
+res = app.handler(json.loads(sys.argv[1]), None)
+t2 = time.perf_counter()
+print("COLD " + json.dumps({{"import_ms": (t1 - t0) * 1000, "invoke_ms": (t2 - t1) * 1000,
+                             "status": res["statusCode"]}}))
+"""
+
+
+def parse_importtime(stderr: str, svc: str) -> Dict[str, float]:
+    """
+    'import time: self [us] | cumulative | package' -> {module: cumul ms}, limité
+    aux imports directs de <svc>.app et aux imports lazy faits pendant l'appel
+    (le démarrage de l'interpréteur - site, encodings - est ignoré).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        stripped = name.strip()
+        depth = (len(name.rstrip()) - len(stripped) - 1) // 2
+        rows.append((depth, stripped, int(cumulative) / 1000.0))
+
+    app_at = next((i for i, r in enumerate(rows) if r[0] == 0 and r[1] == f"{svc}.app"), None)
+    if app_at is None:
+        return {}
+    start = max((i for i in range(app_at) if rows[i][0] == 0), default=-1) + 1
+
+    out: Dict[str, float] = {}
+    for i, (depth, name, ms) in enumerate(rows[start:], start):
+        # nouveaux imports enfants directs de l'app, ou top-level après l'import (lazy)
+        if (i < app_at and depth == 1) or (i > app_at and depth == 0):
+            out[name] = out.get(name, 0.0) + ms
+    return out
+
+
+def run_once(svc: str, srcs: Dict[str, str], env: Dict[str, str]) -> dict:
+    src = srcs[svc]
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(svc=svc), json.dumps(EVENTS[svc])],
+        cwd=src, env=dict(env, PYTHONPATH=os.pathsep.join([src, srcs["shared"]])),
+        capture_output=True, text=True, timeout=120,
+    )
+    cold = profile = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("COLD "):
+            cold = json.loads(line[5:])
+        elif '"startup_profile"' in line:
+            profile = json.loads(line)
+    if cold is None:
+        raise RuntimeError(f"{svc}: {proc.stderr[-2000:]}")
+    cold["profile"] = profile
+    cold["modules"] = parse_importtime(proc.stderr, svc)
+    return cold
+
+
+def checkout_rev(rev: str) -> str:
+    """
+    Copie les app.py d'un commit (et le layer cid_shared s'il existe à ce commit) dans un
+    répertoire temporaire : <base>/<svc>/<svc>/app.py, <base>/shared/cid_shared/*.py.
+    """
+    base = tempfile.mkdtemp(prefix="cold-start-")
+    shared = subprocess.run(["git", "ls-tree", "--name-only", f"{rev}:services/shared/src/cid_shared"],
+                            cwd=ROOT, capture_output=True, text=True).stdout.split()
+    files = [(f"services/{svc}/src/{svc}/app.py", os.path.join(svc, svc, "app.py")) for svc in SERVICES]
+    files += [(f"services/shared/src/cid_shared/{name}", os.path.join("shared", "cid_shared", name))
+              for name in shared if name.endswith(".py")]
+    for rel, dest in files:
+        code = subprocess.run(["git", "show", f"{rev}:{rel}"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout
+        os.makedirs(os.path.dirname(os.path.join(base, dest)), exist_ok=True)
+        with open(os.path.join(base, dest), "w") as f:
+            f.write(code)
+    return base
+
+
+def median(values: List[float]) -> float:
+    return round(statistics.median(values), 1) if values else 0.0
+
+
+def summarize(svc: str, label: str, runs: List[dict], top: int) -> dict:
+    modules: Dict[str, List[float]] = {}
+    for r in runs:
+        for name, ms in r["modules"].items():
+            modules.setdefault(name, []).append(ms)
+    heaviest = sorted(((median(v), k) for k, v in modules.items()), reverse=True)[:top]
+    profiles = [r["profile"] for r in runs if r["profile"]]
+    return {
+        "service": svc,
+        "variant": label,
+        "runs": len(runs),
+        "status": sorted({r["status"] for r in runs}),
+        "import_ms": median([r["import_ms"] for r in runs]),
+        "first_invoke_ms": median([r["invoke_ms"] for r in runs]),
+        "cold_total_ms": median([r["import_ms"] + r["invoke_ms"] for r in runs]),
+        "init_ms": profiles[-1].get("init_ms") if profiles else None,
+        "heaviest_imports_ms": {k: ms for ms, k in heaviest},
+    }
+
+
+def stub_route(method, path, query, body):
+    if path.startswith("/products/"):
+        return 200, {"product_id": path.rsplit("/", 1)[-1], "name": "Produit bench"}
+    return 201, {"ok": True}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=6, help="modules les plus lourds affichés")
+    ap.add_argument("--services", default=",".join(SERVICES))
+    ap.add_argument("--baseline-rev", help="commit de comparaison (ex. HEAD~1)")
+    ap.add_argument("--eager", action="store_true", help="mesure aussi EAGER_INIT=1")
+    args = ap.parse_args()
+
+    set_default_env()
+    import logging
+
+    import boto3
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    endpoint = f"http://{host}:{port}"
+
+    env = dict(os.environ, AWS_ENDPOINT_URL_DYNAMODB=endpoint, STARTUP_PROFILE="1",
+               AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing",
+               CATALOG_SNAPSHOT="", BFF_CATALOG_CACHE_TTL="0")
+    env.pop("PYTHONSTARTUP", None)
+
+    ddb = boto3.resource("dynamodb", endpoint_url=endpoint, aws_access_key_id="testing",
+                         aws_secret_access_key="testing")
+    for name, key in ((env["PRODUCTS_TABLE"], "product_id"), (env["CONTACTS_TABLE"], "contact_id")):
+        ddb.create_table(TableName=name, BillingMode="PAY_PER_REQUEST",
+                         KeySchema=[{"AttributeName": key, "KeyType": "HASH"}],
+                         AttributeDefinitions=[{"AttributeName": key, "AttributeType": "S"}])
+    ddb.Table(env["PRODUCTS_TABLE"]).put_item(Item={"product_id": "p-1", "name": "Produit bench"})
+
+    dirs = SERVICES + ("shared",)  # + layer cid_shared
+    variants = [("current", {d: os.path.join(ROOT, "services", d, "src") for d in dirs}, {})]
+    if args.eager:
+        variants.append(("current+eager", variants[0][1], {"EAGER_INIT": "1"}))
+    if args.baseline_rev:
+        base = checkout_rev(args.baseline_rev)
+        variants.insert(0, (args.baseline_rev, {d: os.path.join(base, d) for d in dirs}, {}))
+
+    try:
+        with StubUpstream(stub_route) as stub:
+            env.update(PRODUCTS_BASE_URL=stub.base_url, CONTACT_BASE_URL=stub.base_url)
+            for svc in args.services.split(","):
+                for label, srcs, extra in variants:
+                    runs = [run_once(svc, srcs, dict(env, **extra)) for _ in range(args.runs)]
+                    print(json.dumps(summarize(svc, label, runs, args.top), ensure_ascii=False))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
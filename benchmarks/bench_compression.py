@@ -0,0 +1,60 @@
+"""
+Compression des réponses : octets sur le fil et CPU par réponse.
+
+Corps réels produits par les handlers (arbre /api/catalog, listing /products)
+à plusieurs tailles de catalogue ; identité vs gzip vs br (si `brotli` installé).
+
+    python benchmarks/bench_compression.py --sizes 100,1000,10000,100000
+"""
+import argparse
+import base64
+import json
+import time
+
+from common import set_default_env, synthetic_catalog
+
+set_default_env()
+from bff import app  # noqa: E402
+from cid_shared import encoding  # noqa: E402
+
+
+def cpu_ms(fn, repeat: int) -> float:
+    t0 = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - t0) * 1000 / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,1000,10000,100000")
+    args = ap.parse_args()
+
+    encodings = ["gzip"] + (["br"] if encoding.brotli else [])
+    for n in (int(x) for x in args.sizes.split(",")):
+        categories, products = synthetic_catalog(n, per_top=max(10, n // 100))
+        builder = app._CatalogBuilder()
+        builder.add_categories(categories)
+        builder.add_products(products)
+        bodies = {
+            "catalog": json.dumps(builder.build(), ensure_ascii=False),
+            "listing": json.dumps({"items": categories + products}),
+        }
+        repeat = max(1, 2000 // n)
+        for kind, body in bodies.items():
+            raw = body.encode("utf-8")
+            line = {"products": n, "body": kind, "identity_bytes": len(raw)}
+            for enc in encodings:
+                packed = app._compress(raw, enc)
+                wire = len(base64.b64encode(packed))  # ce que la Lambda renvoie à API Gateway
+                line[enc] = {
+                    "bytes": len(packed),
+                    "ratio": round(len(raw) / len(packed), 1),
+                    "lambda_payload_bytes": wire,
+                    "cpu_ms": round(cpu_ms(lambda: app._compress(raw, enc), repeat), 3),
+                }
+            print(json.dumps(line))
+
+
+if __name__ == "__main__":
+    main()
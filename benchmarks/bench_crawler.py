@@ -0,0 +1,145 @@
+"""
+seed_cid_products.py : ancien pipeline (boucle deque + get_title) vs crawl
+concurrent + PageFetcher (un seul téléchargement par page, cache conditionnel).
+
+Le site synthétique (common.SyntheticSite) est servi en local avec une latence
+par page ; les deux pipelines doivent produire exactement les mêmes `seen` / `urls`
+(y compris la coupure à max_pages) et les mêmes titres. --flaky fait répondre 503
+une fois à une partie des pages : le crawl concurrent les rejoue (backoff),
+l'ancien les perdait.
+
+Le nouveau pipeline tourne deux fois : cache disque vide, puis reseed avec cache
+après modification de --changed % des pages (304 pour les autres).
+
+    python benchmarks/bench_crawler.py --latency 0.02
+    python benchmarks/bench_crawler.py --latency 0.02 --flaky 0.05 --workers 16 --per-host 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+
+from common import ROOT, SyntheticSite
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+
+def legacy_fetch(url: str) -> str:
+    """Ancien seed.fetch : page entière, sans cache ni reprise."""
+    req = Request(url, headers={"User-Agent": "Mozilla/5.0"})
+    return urlopen(req, timeout=20).read().decode("utf-8", errors="ignore")
+
+
+def legacy_crawl(fetch_fn, max_pages=600, max_depth=4):
+    """Copie de l'ancienne boucle de main() (une page à la fois)."""
+    seen = set()
+    q = deque([(seed.normalize(u), 0) for u in seed.START_URLS])
+    urls = set()
+
+    while q and len(seen) < max_pages:
+        url, depth = q.popleft()
+        if url in seen:
+            continue
+        seen.add(url)
+
+        if not seed.is_internal(url) or seed.should_skip(url):
+            continue
+
+        path = urlparse(url).path
+        if not path.startswith(seed.ALLOWED_PREFIXES):
+            continue
+
+        urls.add(url)
+
+        if depth >= max_depth:
+            continue
+
+        try:
+            html = fetch_fn(url)
+        except Exception:
+            continue
+
+        for link in seed.extract_links(html, url):
+            if link not in seen and seed.is_internal(link) and not seed.should_skip(link):
+                pth = urlparse(link).path
+                if pth.startswith(seed.ALLOWED_PREFIXES):
+                    q.append((link, depth + 1))
+
+    return seen, urls
+
+
+def legacy_titles(urls, fetch_fn):
+    """Ancien get_title : un second téléchargement par URL retenue."""
+    titles = {}
+    for u in sorted(urls):
+        try:
+            titles[u] = seed.parse_title(fetch_fn(u), u)
+        except Exception:
+            titles[u] = u
+    return titles
+
+
+def run_pipeline(site, args, cache_path):
+    get_fn = lambda url, headers: seed.http_open(site.fetch_url(url), headers)  # noqa: E731
+    fetcher = seed.PageFetcher(cache_path, seed.HostThrottle(per_host=args.per_host), get_fn=get_fn)
+    requests_before = site.requests
+    t0 = time.perf_counter()
+    seen, urls = seed.crawl(seed.START_URLS, fetcher, max_pages=args.max_pages, workers=args.workers)
+    with seed.ThreadPoolExecutor(max_workers=args.workers) as pool:
+        titles = dict(zip(sorted(urls), pool.map(fetcher.title, sorted(urls))))
+    fetcher.save()
+    wall = time.perf_counter() - t0
+    return seen, urls, titles, fetcher, site.requests - requests_before, wall
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subs", type=int, default=6)
+    ap.add_argument("--products", type=int, default=30)
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--flaky", type=float, default=0.0)
+    ap.add_argument("--max-pages", type=int, default=600)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--per-host", type=int, default=4)
+    ap.add_argument("--changed", type=float, default=2.0, help="% de pages modifiées avant le reseed")
+    args = ap.parse_args()
+
+    # référence : site sans erreurs, ancien pipeline
+    with SyntheticSite(args.subs, args.products, latency=args.latency) as site:
+        fetch_fn = lambda url: legacy_fetch(site.fetch_url(url))  # noqa: E731
+        t0 = time.perf_counter()
+        ref_seen, ref_urls = legacy_crawl(fetch_fn, args.max_pages)
+        ref_titles = legacy_titles(ref_urls, fetch_fn)
+        ref_seen = {seed.fingerprint(u) for u in ref_seen}
+        legacy_s = time.perf_counter() - t0
+        print(json.dumps({"pipeline": "legacy", "pages": len(site.pages), "seen": len(ref_seen),
+                          "urls": len(ref_urls), "requests": site.requests,
+                          "bytes": site.bytes_sent, "wall_s": round(legacy_s, 2)}))
+
+    cache_path = os.path.join(tempfile.mkdtemp(), "page_cache.json")
+    with SyntheticSite(args.subs, args.products, latency=args.latency, flaky=args.flaky) as site:
+        for run in ("cold_cache", "warm_cache"):
+            if run == "warm_cache":
+                # quelques pages changent entre deux reseeds (titre identique)
+                paths = sorted(site.pages)
+                for path in paths[::max(1, int(100 / args.changed))] if args.changed else []:
+                    site.pages[path] += "<!-- maj -->"
+            bytes_before = site.bytes_sent
+            seen, urls, titles, fetcher, requests, wall = run_pipeline(site, args, cache_path)
+            print(json.dumps({"pipeline": "concurrent", "run": run, "seen": len(seen), "urls": len(urls),
+                              "requests": requests, "bytes": site.bytes_sent - bytes_before,
+                              "wall_s": round(wall, 2), "speedup": round(legacy_s / wall, 2),
+                              "same_seen": seen == ref_seen, "same_urls": urls == ref_urls,
+                              "same_titles": titles == ref_titles, "fetch": fetcher.stats,
+                              "hosts": fetcher.throttle.stats()}))
+            assert urls == ref_urls and seen == ref_seen and titles == ref_titles
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Cache LRU des détails produit : products-service (devant get_item) et BFF (corps proxifiés).
+
+Trafic de détail concentré (loi de Zipf, --zipf) sur --products produits, plus une part
+d'ids inconnus (--unknown-ratio, 404 mis en cache négatif) :
+
+1. products-service, table DynamoDB (moto) : cache désactivé vs activé -> latence,
+   appels get_item (RCU : 0.5 par lecture eventually consistent < 4 Ko), compteurs
+2. taux de hit selon la capacité du LRU (PRODUCTS_DETAIL_CACHE_MAX_ITEMS) : évictions ;
+   reseed de la table : l'item de version réécrit par le seeder vide le cache products,
+   puis celui du BFF (X-Catalog-Version)
+3. BFF -> products-service (snapshot, API Gateway local) : cache BFF désactivé vs activé
+4. reseed : snapshot republié (nom d'un produit populaire modifié) ; la première réponse
+   upstream qui porte le nouveau X-Catalog-Version vide le cache BFF
+
+    pip install boto3 moto
+    python benchmarks/bench_detail_cache.py --products 2000 --requests 5000
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import (ROOT, ApiGatewayServer, create_products_table, percentile, seed_products_table,
+                    set_default_env, synthetic_catalog, typed_item)
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+
+def zipf_ids(ids, n: int, s: float, unknown_ratio: float, seed_: int = 7):
+    rnd = random.Random(seed_)
+    cum = list(itertools.accumulate(1 / (k ** s) for k in range(1, len(ids) + 1)))
+    out = rnd.choices(ids, cum_weights=cum, k=n)
+    for i in range(n):
+        if rnd.random() < unknown_ratio:
+            out[i] = f"inconnu-{rnd.randrange(50)}"
+    return out
+
+
+def detail(pid: str):
+    return {"httpMethod": "GET", "path": f"/products/{pid}", "pathParameters": {"product_id": pid}}
+
+
+def bff_detail(pid: str):
+    return {"httpMethod": "GET", "path": f"/api/products/{pid}", "pathParameters": {"product_id": pid}}
+
+
+def run(handler, make_event, ids):
+    samples, statuses = [], {}
+    for pid in ids:
+        t0 = time.perf_counter()
+        res = handler(make_event(pid), None)
+        samples.append(time.perf_counter() - t0)
+        statuses[res["statusCode"]] = statuses.get(res["statusCode"], 0) + 1
+    return {"p50_ms": round(percentile(samples, 50) * 1000, 3), "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3), "status": statuses}
+
+
+def reset(mod, ttl: float, max_items: int = 5000):
+    mod.DETAIL_CACHE_TTL = ttl
+    mod._detail_cache = mod._LRUCache(max_items, mod.DETAIL_CACHE_MAX_BYTES)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=2000)
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--zipf", type=float, default=1.1)
+    ap.add_argument("--unknown-ratio", type=float, default=0.02)
+    args = ap.parse_args()
+
+    set_default_env()
+    categories, products = synthetic_catalog(args.products, per_top=25)
+    everything = categories + products
+    ids = [p["product_id"] for p in products]
+    random.Random(3).shuffle(ids)  # popularité indépendante de l'ordre des clés
+    traffic = zipf_ids(ids, args.requests, args.zipf, args.unknown_ratio)
+    distinct = len(set(traffic))
+    print(json.dumps({"products": args.products, "requests": args.requests, "distinct_ids": distinct,
+                      "zipf": args.zipf, "unknown_ratio": args.unknown_ratio}))
+
+    from moto import mock_aws
+    import boto3
+
+    # 1. et 2. products-service devant DynamoDB
+    with mock_aws():
+        seed_products_table(create_products_table(boto3.resource("dynamodb")), everything)
+        from products import app
+
+        for p in (ids[0], "inconnu-1"):
+            reset(app, 0)
+            want = app.handler(detail(p), None)
+            reset(app, 60)
+            assert [app.handler(detail(p), None)["body"] for _ in range(2)] == [want["body"]] * 2
+        fields = dict(detail(ids[0]), queryStringParameters={"fields": "name,source_url"})
+        assert set(json.loads(app.handler(fields, None)["body"])) == {"product_id", "name", "source_url"}
+
+        line = {"test": "products_get_item"}
+        for mode, ttl in (("no_cache", 0), ("cache", 60)):
+            reset(app, ttl)
+            line[mode] = run(app.handler, detail, traffic)
+            m = app._detail_cache.metrics()
+            line[mode]["get_item_calls"] = m["misses"] if ttl else args.requests
+            line[mode]["rcu"] = line[mode]["get_item_calls"] * 0.5
+            if ttl:
+                line[mode]["counters"] = m
+        print(json.dumps(line))
+
+        for capacity in (20, 100, 500, args.products):
+            reset(app, 60, capacity)
+            for pid in traffic:
+                app._get_product(pid)
+            m = app._detail_cache.metrics()
+            print(json.dumps({"test": "lru_capacity", "max_items": capacity, "hit_ratio": m["hit_ratio"],
+                              "evictions": m["evictions"], "bytes": m["bytes"]}))
+
+        client = boto3.client("dynamodb")
+        table = os.environ["PRODUCTS_TABLE"]
+        seed.write_catalog_version([typed_item(x) for x in everything], table, client)
+        reset(app, 60)
+        app.CATALOG_VERSION_CHECK_INTERVAL = 0
+        hot = ids[0]
+        before = json.loads(app.handler(detail(hot), None)["body"])["name"]
+        changed = [dict(x, name="Renommé après reseed") if x["product_id"] == hot else x for x in everything]
+        client.put_item(TableName=table, Item=typed_item(next(x for x in changed if x["product_id"] == hot)))
+        stale = json.loads(app.handler(detail(hot), None)["body"])["name"]  # version pas encore publiée
+        version = seed.write_catalog_version([typed_item(x) for x in changed], table, client)
+        res = app.handler(detail(hot), None)
+        fresh = json.loads(res["body"])["name"]
+        assert stale == before and fresh == "Renommé après reseed"
+        assert res["headers"]["X-Catalog-Version"] == version  # relayée au BFF (son propre cache)
+        assert "__catalog_meta__" not in app.handler({"queryStringParameters": {}}, None)["body"]
+        print(json.dumps({"test": "table_reseed", "hot_before": before, "hot_until_version": stale,
+                          "hot_after_version": fresh, "catalog_version": version,
+                          "counters": app._detail_cache.metrics()}, ensure_ascii=False))
+
+        # BFF devant la table : l'item de version relayé en X-Catalog-Version vide aussi son cache
+        from bff import app as bff
+        with ApiGatewayServer([("GET", "/products/{product_id}", app.handler)]) as gw:
+            bff.PRODUCTS_BASE = gw.base_url
+            reset(bff, 60)
+            before = json.loads(bff.handler(bff_detail(hot), None)["body"])["name"]
+            changed = [dict(x, name="Renommé au 2e reseed") if x["product_id"] == hot else x for x in changed]
+            client.put_item(TableName=table, Item=typed_item(next(x for x in changed if x["product_id"] == hot)))
+            version = seed.write_catalog_version([typed_item(x) for x in changed], table, client)
+            stale = json.loads(bff.handler(bff_detail(hot), None)["body"])["name"]
+            cold = next(p for p in ids if p not in set(traffic))
+            bff.handler(bff_detail(cold), None)  # miss : la réponse porte la nouvelle version
+            fresh = json.loads(bff.handler(bff_detail(hot), None)["body"])["name"]
+            assert stale == before and fresh == "Renommé au 2e reseed" and bff._catalog_version == version
+            print(json.dumps({"test": "bff_table_reseed", "hot_before": before, "hot_until_next_miss": stale,
+                              "hot_after_next_miss": fresh, "catalog_version": version}, ensure_ascii=False))
+        app.CATALOG_VERSION_CHECK_INTERVAL = 30
+
+    # 3. et 4. BFF -> products-service (snapshot)
+    path = os.path.join(tempfile.mkdtemp(), "catalog_snapshot.json.gz")
+    seed.write_snapshot(seed.build_snapshot([typed_item(x) for x in everything]), path)
+    app.CATALOG_SNAPSHOT = path
+    app.SNAPSHOT_CHECK_INTERVAL = 0
+    from bff import app as bff
+
+    with ApiGatewayServer([("GET", "/products/{product_id}", app.handler)]) as gw:
+        bff.PRODUCTS_BASE = gw.base_url
+        line = {"test": "bff_detail"}
+        for mode, ttl in (("no_cache", 0), ("cache", 60)):
+            reset(bff, ttl)
+            line[mode] = run(bff.handler, bff_detail, traffic)
+            if ttl:
+                line[mode]["counters"] = bff._detail_cache.metrics()
+        print(json.dumps(line))
+
+        hot = ids[0]
+        before = json.loads(bff.handler(bff_detail(hot), None)["body"])["name"]
+        changed = [dict(x, name="Renommé après reseed") if x["product_id"] == hot else x for x in everything]
+        seed.write_snapshot(seed.build_snapshot([typed_item(x) for x in changed]), path)
+        stale = json.loads(bff.handler(bff_detail(hot), None)["body"])["name"]
+        cold = next(p for p in ids if p not in set(traffic))
+        bff.handler(bff_detail(cold), None)  # miss : la réponse porte la nouvelle version
+        fresh = json.loads(bff.handler(bff_detail(hot), None)["body"])["name"]
+        assert stale == before and fresh == "Renommé après reseed"
+        print(json.dumps({"test": "reseed", "hot_before": before, "hot_until_next_miss": stale,
+                          "hot_after_next_miss": fresh, "catalog_version": bff._catalog_version,
+                          "counters": bff._detail_cache.metrics()}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+products-service : décodage des items DynamoDB + sérialisation JSON de la réponse.
+
+- resource : TypeDeserializer boto3 (Decimal pour chaque nombre) puis
+             json.dumps(default=_json_default), comme avec PRODUCTS_FAST_DECODE=0
+- fast     : _decode_item (int/float/str natifs) puis json.dumps sans callback
+
+Les items au format "wire" (type descriptors) sont générés une fois, hors mesure :
+on ne compare que le travail CPU fait dans la Lambda après la réponse HTTP.
+--moto ajoute une mesure de bout en bout (handler, liste type=product) ; sous moto
+l'évaluation du Scan (~1 ms/item) masque l'écart, c'est surtout une vérification
+que les deux modes renvoient le même body.
+
+    pip install boto3 moto
+    python benchmarks/bench_fast_decode.py --sizes 1000,10000
+"""
+import argparse
+import json
+import os
+import time
+
+from common import (create_products_table, seed_products_table, set_default_env,
+                    summarize_ms, synthetic_catalog)
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize_ms(samples)
+
+
+def micro(app, n: int, repeat: int):
+    from boto3.dynamodb.types import TypeDeserializer
+
+    categories, products = synthetic_catalog(n)
+    wire = [app._encode_item(it) for it in (categories + products)[:n]]
+    deserializer = TypeDeserializer()
+
+    def resource_path():
+        items = [{k: deserializer.deserialize(v) for k, v in it.items()} for it in wire]
+        return json.dumps({"items": items}, default=app._json_default)
+
+    def fast_path():
+        return json.dumps({"items": [app._decode_item(it) for it in wire]}, default=app._json_default)
+
+    assert resource_path() == fast_path()
+    resource = timed(resource_path, repeat)
+    fast = timed(fast_path, repeat)
+    return {"items": n, "resource": resource, "fast": fast,
+            "speedup_p50": round(resource["p50_ms"] / fast["p50_ms"], 2)}
+
+
+def end_to_end(app, n: int, repeat: int):
+    from moto import mock_aws
+
+    with mock_aws():
+        import boto3
+
+        table = create_products_table(boto3.resource("dynamodb"), os.environ["PRODUCTS_TABLE"])
+        categories, products = synthetic_catalog(n)
+        seed_products_table(table, categories + products)
+
+        # client/resource recréés dans le mock
+        app._client = app._table = None
+        event = {"queryStringParameters": {"type": "product"}}
+        line = {"items": len(products)}
+        bodies = {}
+        for label, fast in (("resource", False), ("fast", True)):
+            app.FAST_DECODE = fast
+            bodies[label] = app.handler(event, None)["body"]
+            line[label] = timed(lambda: app.handler(event, None), repeat)
+        assert bodies["resource"] == bodies["fast"]
+        line["speedup_p50"] = round(line["resource"]["p50_ms"] / line["fast"]["p50_ms"], 2)
+        return line
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--moto", action="store_true", help="mesure aussi le handler sur moto (lent)")
+    args = ap.parse_args()
+
+    set_default_env()
+    from products import app
+
+    for n in (int(x) for x in args.sizes.split(",")):
+        print(json.dumps(dict(micro(app, n, args.repeat), mode="decode+json")))
+        if args.moto:
+            print(json.dumps(dict(end_to_end(app, n, max(1, args.repeat // 5)), mode="handler")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+seed_cid_products.py : frontier du crawl (empreintes + checkpoint + reprise).
+
+1. mémoire : set des URLs complètes (ancien `seen`) vs set d'empreintes 64 bits,
+   taille et temps d'écriture / relecture du checkpoint
+2. reprise : crawl "tué" après N requêtes (exception qui traverse le fetcher),
+   repris depuis le checkpoint -> mêmes pages vues / retenues qu'un crawl d'une traite ;
+   les pages déjà lues repartent en requêtes conditionnelles (304)
+3. budget augmenté à la reprise (--max-pages 1000 puis 3000) == crawl à 3000 direct
+
+    python benchmarks/bench_frontier.py --urls 200000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import ROOT, SyntheticSite
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+
+class Crash(BaseException):
+    """Arrêt brutal simulé (pas une erreur réseau : le fetcher ne la rattrape pas)."""
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def memory(n: int):
+    def url(i):
+        return f"https://cidgroupe.com/granules-de-bois/gamme-{i % 97}/produit-{i}-sac-15-kg-premium/fiche-technique"
+
+    # chaque set construit avec ses propres chaînes, comme pendant un crawl
+    urls, by_url = measure(lambda: {url(i) for i in range(n)})
+    fps, by_fp = measure(lambda: {seed.fingerprint(url(i)) for i in range(n)})
+
+    fr = seed.Frontier(seed.START_URLS, 4)
+    fr.seen = fps
+    path = os.path.join(tempfile.mkdtemp(), "frontier.json")
+    t0 = time.perf_counter()
+    fr.save(path, seed.START_URLS)
+    save_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    loaded = seed.Frontier.load(path, seed.START_URLS, 4)
+    load_ms = (time.perf_counter() - t0) * 1000
+    assert loaded.seen == fps
+    return {"urls": n, "avg_url_len": sum(map(len, urls)) // n,
+            "seen_urls_mb": round(by_url / 2**20, 1), "seen_fingerprints_mb": round(by_fp / 2**20, 1),
+            "checkpoint_kb": os.path.getsize(path) // 1024,
+            "save_ms": round(save_ms, 1), "load_ms": round(load_ms, 1)}
+
+
+def run(site, cache_path, max_pages, crash_after=None, frontier=None, checkpoint=None):
+    requests = [0]
+
+    def get_fn(url, headers):
+        requests[0] += 1
+        if crash_after is not None and requests[0] > crash_after:
+            raise Crash()
+        return seed.http_open(site.fetch_url(url), headers)
+
+    fetcher = seed.PageFetcher(cache_path, seed.HostThrottle(per_host=8), get_fn=get_fn)
+    seen, urls = seed.crawl(seed.START_URLS, fetcher, max_pages=max_pages, frontier=frontier,
+                            checkpoint=checkpoint, checkpoint_every=0.05)
+    return seen, urls, fetcher, requests[0]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--urls", type=int, default=200_000, help="taille du test mémoire")
+    ap.add_argument("--subs", type=int, default=10)
+    ap.add_argument("--products", type=int, default=60)
+    ap.add_argument("--max-pages", type=int, default=3000)
+    ap.add_argument("--crash-after", type=int, default=1200, help="requêtes avant l'arrêt simulé")
+    args = ap.parse_args()
+
+    print(json.dumps(dict(memory(args.urls), test="memory")))
+
+    tmp = tempfile.mkdtemp()
+    checkpoint = os.path.join(tmp, "frontier.json")
+    with SyntheticSite(args.subs, args.products, latency=0.002) as site:
+        ref_seen, ref_urls, _, ref_requests = run(site, None, args.max_pages)
+
+        cache = os.path.join(tmp, "pages.json")
+        try:
+            run(site, cache, args.max_pages, crash_after=args.crash_after, checkpoint=checkpoint)
+            raise AssertionError("le crawl aurait dû s'arrêter")
+        except Crash:
+            pass
+        fr = seed.Frontier.load(checkpoint, seed.START_URLS, 4)
+        before = fr.summary()
+        seen, urls, fetcher, requests = run(site, cache, args.max_pages, frontier=fr, checkpoint=checkpoint)
+        assert seen == ref_seen and urls == ref_urls
+        print(json.dumps({"test": "crash_resume", "pages": len(site.pages), "seen": len(seen),
+                          "urls": len(urls), "crawl_requests": ref_requests, "crashed_after": args.crash_after,
+                          "checkpoint": before, "requests_after_resume": requests,
+                          "not_modified": fetcher.stats["not_modified"], "same_result": True}))
+
+        os.remove(checkpoint)
+        run(site, None, 1000, checkpoint=checkpoint)
+        fr = seed.Frontier.load(checkpoint, seed.START_URLS, 4)
+        seen, urls, _, _ = run(site, None, args.max_pages, frontier=fr)
+        assert seen == ref_seen and urls == ref_urls
+        print(json.dumps({"test": "budget_raised", "from": 1000, "to": args.max_pages,
+                          "seen": len(seen), "same_result": True}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+seed_cid_products.py : extraction titre + liens d'une page.
+
+- legacy : ancien code (re.findall sur toute la page + parse_title par re.search,
+           chaque href normalisé à chaque occurrence) sur le body décodé en entier
+- stream : HtmlExtractor alimenté par morceaux de FETCH_CHUNK octets (un seul
+           passage, normalisation mémoïsée, lecture arrêtée à </title> pour un titre seul)
+
+Pages de taille réelle (~150 Ko, plusieurs centaines de liens : nav et pied de page
+répétés, liens relatifs, bruit à ignorer). La sortie est comparée à l'ancien code,
+y compris avec des morceaux de 1 et 7 octets (href / caractères UTF-8 coupés).
+
+    python benchmarks/bench_html_extract.py --pages 200
+"""
+import argparse
+import html
+import json
+import re
+import sys
+import time
+from urllib.parse import urljoin
+
+from common import ROOT, summarize_ms
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+
+def legacy_extract_links(html_str: str, base_url: str):
+    hrefs = re.findall(r'href=["\']([^"\']+)["\']', html_str, flags=re.IGNORECASE)
+    out = []
+    for h in hrefs:
+        if not h:
+            continue
+
+        raw = h.strip()
+
+        low = raw.lower()
+        if low.startswith(("mailto:", "tel:", "javascript:")):
+            continue
+        if low.startswith("//"):
+            continue
+        if "gstatic.com" in low or "fonts." in low:
+            continue
+
+        link = seed.normalize(urljoin(base_url, raw))
+
+        if seed.should_skip(link):
+            continue
+
+        out.append(link)
+    return out
+
+
+def legacy_parse_title(page_html: str, url: str) -> str:
+    m = re.search(r"<title>(.*?)</title>", page_html, re.IGNORECASE | re.DOTALL)
+    if not m:
+        return url
+
+    title = re.sub(r"\s+", " ", m.group(1)).strip()
+    title = html.unescape(title)
+    title = re.sub(r"\s*\|\s*CID Groupe.*$", "", title).strip()
+
+    return title or url
+
+
+TOPS = ("adblue", "engrais", "granules-de-bois", "produits-chimiques")
+
+
+def make_page(i: int, size: int):
+    """(url, body utf-8) d'une fiche produit synthétique d'environ `size` octets."""
+    top = TOPS[i % len(TOPS)]
+    url = f"https://cidgroupe.com/{top}/gamme-{i % 7}/produit-{i}"
+    nav = "".join(
+        f'<li><a href="https://cidgroupe.com/{t}/gamme-{g}">Gamme {g}</a></li>'
+        f'<li><a href="/{t}/gamme-{g}/">Gamme {g}</a></li>'
+        for t in TOPS for g in range(12)
+    )
+    noise = (
+        '<link rel="stylesheet" href="/wp-content/themes/cid/style.css?ver=6.4">'
+        '<link href="//fonts.gstatic.com/s/roboto.woff2" rel="preload">'
+        '<link href="https://fonts.googleapis.com/css?family=Roboto" rel="stylesheet">'
+        "<a href='mailto:info@cidgroupe.com'>Mail</a> <a HREF='tel:+33100000000'>Tel</a>"
+        '<a href="javascript:void(0)">Menu</a><a href="/contact">Contact</a>'
+        '<a href="https://www.facebook.com/cidgroupe">fb</a><img src="/media/logo.png">'
+    )
+    related = "".join(
+        f'<a href="../produit-{i + k}#avis">Produit {i + k}</a>'
+        f'<a href="https://www.cidgroupe.com/{top}/gamme-{i % 7}/produit-{i + k}/">www</a>'
+        for k in range(1, 40)
+    )
+    head = (
+        '<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8">'
+        f'<title>\n  Produit n°{i} &amp; accessoires – qualité | CID Groupe\n</title>'
+        + noise + "</head>"
+    )
+    chunk = ("<p>Granulés de bois, engrais azotés, AdBlue® : fiche détaillée, "
+             "conditionnements, sécurité, éco-conception. </p>")
+    body_parts = [f"<body><nav><ul>{nav}</ul></nav><main><h1>Produit {i}</h1>"]
+    filler_len = max(0, size - len(head) - 2 * len(nav) - len(related) - len(noise))
+    body_parts.append(chunk * (filler_len // len(chunk.encode("utf-8")) + 1))
+    body_parts.append(f"<section>{related}</section>{noise}<footer><ul>{nav}</ul></footer></main></body></html>")
+    return url, (head + "".join(body_parts)).encode("utf-8")
+
+
+def legacy(url: str, body: bytes, links: bool):
+    text = body.decode("utf-8", errors="ignore")
+    return legacy_parse_title(text, url), (legacy_extract_links(text, url) if links else None)
+
+
+def stream(url: str, body: bytes, links: bool, chunk: int = seed.FETCH_CHUNK):
+    ex = seed.HtmlExtractor(url, want_links=links)
+    read = 0
+    for off in range(0, len(body), chunk):
+        read += chunk
+        if not ex.feed(body[off:off + chunk]):
+            break
+    ex.close()
+    return ex.title, (ex.links if links else None), min(read, len(body))
+
+
+def timed(fn, pages, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for url, body in pages:
+            fn(url, body)
+        samples.append(time.perf_counter() - t0)
+    return summarize_ms(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--size", type=int, default=150_000, help="octets par page")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    pages = [make_page(i, args.size) for i in range(args.pages)]
+
+    # équivalence, y compris morceaux minuscules (href et UTF-8 coupés en deux)
+    for url, body in pages[:3]:
+        want = legacy(url, body, True)
+        for chunk in (1, 7, 4096, seed.FETCH_CHUNK):
+            got = stream(url, body, True, chunk)
+            assert got[:2] == want, (url, chunk)
+            assert stream(url, body, False, chunk)[0] == want[0]
+    for url, body in pages:
+        assert stream(url, body, True)[:2] == legacy(url, body, True)
+
+    links = sum(len(legacy(u, b, True)[1]) for u, b in pages[:10]) // 10
+    print(json.dumps({"pages": len(pages), "avg_bytes": sum(len(b) for _, b in pages) // len(pages),
+                      "links_per_page": links}))
+
+    for mode, want_links in (("title+links", True), ("title_only", False)):
+        seed._link_for.cache_clear()
+        seed.in_scope.cache_clear()
+        old = timed(lambda u, b: legacy(u, b, want_links), pages, args.repeat)
+        new = timed(lambda u, b: stream(u, b, want_links), pages, args.repeat)
+        read = sum(stream(u, b, want_links)[2] for u, b in pages)
+        print(json.dumps({"mode": mode, "legacy": old, "stream": new,
+                          "speedup_p50": round(old["p50_ms"] / new["p50_ms"], 2),
+                          "bytes_read": read, "bytes_total": sum(len(b) for _, b in pages)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Pagination products-service -> BFF : toutes les pages sont-elles lues, et à quel coût ?
+
+Stub qui découpe les listes en pages (next_token) avec latence par page.
+Compare lecture séquentielle (BFF_UPSTREAM_FANOUT=0) et prefetch, vérifie que
+/api/catalog et /api/products contiennent tous les items, et que le délai
+global renvoie bien une erreur.
+
+    python benchmarks/bench_pagination.py --products 5000 --page-size 100 --latency 0.005
+"""
+import argparse
+import base64
+import json
+import os
+import time
+
+from common import StubUpstream, set_default_env, summarize_ms, synthetic_catalog
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=5000)
+    ap.add_argument("--page-size", type=int, default=100)
+    ap.add_argument("--latency", type=float, default=0.005)
+    ap.add_argument("--iterations", type=int, default=5)
+    args = ap.parse_args()
+
+    categories, products = synthetic_catalog(args.products, per_top=25)
+
+    def route(method, path, query, body):
+        items = {"category": categories, "product": products}.get(query.get("type"), categories + products)
+        start = 0
+        if query.get("next_token"):
+            start = json.loads(base64.urlsafe_b64decode(query["next_token"]))["offset"]
+        page = items[start:start + args.page_size]
+        out = {"items": page}
+        if start + args.page_size < len(items):
+            out["next_token"] = base64.urlsafe_b64encode(
+                json.dumps({"offset": start + args.page_size}).encode()).decode()
+        return 200, out
+
+    with StubUpstream(route, latency=args.latency) as stub:
+        os.environ["PRODUCTS_BASE_URL"] = stub.base_url
+        os.environ["BFF_CATALOG_CACHE_TTL"] = "0"
+        set_default_env()
+        from bff import app
+
+        catalog = {"httpMethod": "GET", "path": "/api/catalog"}
+        listing = {"httpMethod": "GET", "path": "/api/products"}
+
+        for label, fanout in (("sequential", False), ("prefetch", True)):
+            app.UPSTREAM_FANOUT = fanout
+            samples = []
+            for _ in range(args.iterations):
+                t0 = time.perf_counter()
+                res = app.handler(catalog, None)
+                samples.append(time.perf_counter() - t0)
+            tree = json.loads(res["body"])["categories"]
+            attached = sum(len(t["products"]) + sum(len(c["products"]) for c in t["children"]) for t in tree)
+            print(label, "catalog", summarize_ms(samples), "products attached:", attached)
+
+        res = json.loads(app.handler(listing, None)["body"])
+        assert len(res["items"]) == len(categories) + len(products), len(res["items"])
+        assert "next_token" not in res
+        print("listing items:", len(res["items"]), "(complete)")
+
+        app.PAGINATION_DEADLINE = args.latency * 3
+        res = app.handler(listing, None)
+        print("deadline:", res["statusCode"], res["body"])
+        assert res["statusCode"] == 504
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+products-service : Scan + FilterExpression vs Query sur GSI.
+
+Table locale (moto) au schéma du template, catalogue synthétique.
+Pour chaque filtre : items lus (ScannedCount), RCU estimées (formule DynamoDB :
+0.5 par 4 Ko lus ; moto renvoie une valeur forfaitaire), latence du handler :
+- scan    : PRODUCTS_USE_INDEXES=0 (avant)
+- partial : PRODUCTS_USE_INDEXES=parent_id (déploiement en cours : 1 GSI ACTIVE sur 3)
+- query   : PRODUCTS_USE_INDEXES=1 (après)
+Puis le total des RCU consommées par mode, sur l'ensemble des filtres.
+
+    pip install boto3 moto
+    python benchmarks/bench_products_query.py --products 20000
+"""
+import argparse
+import json
+import os
+import time
+
+from common import (create_products_table, read_capacity_units, seed_products_table,
+                    set_default_env, summarize_ms, synthetic_catalog)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=20000)
+    ap.add_argument("--iterations", type=int, default=5)
+    args = ap.parse_args()
+
+    set_default_env()
+    from moto import mock_aws
+
+    with mock_aws():
+        import boto3
+
+        ddb = boto3.resource("dynamodb")
+        table = create_products_table(ddb, os.environ["PRODUCTS_TABLE"])
+        categories, products = synthetic_catalog(args.products, per_top=25)
+        seed_products_table(table, categories + products)
+        everything = categories + products
+        # RCU de tout lire une fois, ramené à l'item
+        avg_rcu_per_item = read_capacity_units(everything) / len(everything)
+
+        from products import app
+
+        cases = [
+            {"type": "category"},
+            {"category": categories[0]["category"]},
+            {"parent_id": products[0]["parent_id"]},
+            {"type": "product", "parent_id": products[0]["parent_id"]},
+        ]
+
+        modes = (("scan", frozenset()), ("partial", frozenset({"parent_id"})),
+                 ("query", frozenset(attr for attr, _ in app.QUERY_INDEXES)))
+        totals = {label: 0.0 for label, _ in modes}
+        for qs in cases:
+            line = {"filters": qs}
+            for label, enabled in modes:
+                app.ENABLED_INDEXES = enabled
+                app.USE_INDEXES = bool(enabled)
+                op, kwargs = app._plan(qs)
+
+                # pages complètes, pour compter ce que DynamoDB lit (et facture)
+                scanned, returned = 0, 0
+                while True:
+                    res = getattr(table, op)(**kwargs)
+                    returned += res["Count"]
+                    scanned += res["ScannedCount"]
+                    if "LastEvaluatedKey" not in res:
+                        break
+                    kwargs["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+
+                event = {"queryStringParameters": qs}
+                samples = []
+                for _ in range(args.iterations):
+                    t0 = time.perf_counter()
+                    out = app.handler(event, None)
+                    samples.append(time.perf_counter() - t0)
+                assert out["statusCode"] == 200, out
+
+                line[label] = {
+                    "op": op,
+                    "returned": returned,
+                    "items_read": scanned,
+                    "est_rcu": round(scanned * avg_rcu_per_item, 1),
+                    "handler": summarize_ms(samples),
+                }
+                totals[label] += line[label]["est_rcu"]
+            assert line["scan"]["returned"] == line["partial"]["returned"] == line["query"]["returned"]
+            print(json.dumps(line))
+        print(json.dumps({"est_rcu_total": {k: round(v, 1) for k, v in totals.items()},
+                          "saved": round(1 - totals["query"] / totals["scan"], 3)}))
+
+
+if __name__ == "__main__":
+    main()
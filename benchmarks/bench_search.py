@@ -0,0 +1,298 @@
+"""
+products-service : GET /products/search (index inversé + préfixes en mémoire).
+
+Catalogue synthétique aux noms réalistes (accents, ligatures, contenances, références
+uniques -> gros vocabulaire), servi par un snapshot local :
+
+1. construction de l'index : durée, mémoire (tracemalloc), taille du vocabulaire
+2. exactitude : résultats et total comparés à une recherche brute (parcours de tous les
+   items avec les mêmes règles) ; "granules" == "granulés" == "GRANULÉS"
+3. latence du handler (JSON compris) par requête type, et via le BFF (transport inprocess)
+4. avant : lister tout /products puis filtrer côté client (ce que faisait un client)
+5. snapshot republié (--churn % de noms modifiés, ajouts, suppressions) : mise à jour
+   incrémentale de l'index vs reconstruction complète
+6. sans snapshot (table DynamoDB, moto, --table-products items) : premier Scan hors requête
+   (503 le temps de la construction), aucun nouveau Scan tant que la version du catalogue
+   ne change pas, puis rafraîchissement après l'item de version réécrit par le seeder
+
+    python benchmarks/bench_search.py --products 100000
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+
+from common import (ROOT, create_products_table, percentile, seed_products_table, set_default_env,
+                    synthetic_catalog, typed_item)
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+NOUNS = ("Granulés de bois", "Bûches compressées", "Engrais azoté", "Engrais NPK", "AdBlue®",
+         "Acide chlorhydrique", "Sulfate de cuivre", "Chlorure de sodium", "Désherbant sélectif",
+         "Soude caustique", "Javel concentrée", "Bicarbonate de soude", "Sel de déneigement",
+         "Terreau horticole", "Fioul domestique", "Huile hydraulique", "Liquide de refroidissement",
+         "Gazon rustique", "Répulsif à taupes", "Purin d'ortie", "Œillets de Bretagne")
+QUALIFIERS = ("premium", "bio", "écologique", "haute pureté", "qualité pro", "prêt à l'emploi",
+              "concentré", "granulé", "liquide", "poudre")
+BRANDS = ("Forêt d'Orient", "Vosges Énergie", "Agri'Pôle", "Chimie Lorraine", "Océane",
+          "Méditerranée", "Pyrénées", "Bretagne Sud")
+SIZES = ("sac 15 kg", "sac 25 kg", "bidon 5 L", "bidon 10 L", "fût 200 L", "palette 66 sacs",
+         "big bag 1 t", "seau 20 kg")
+TOPS = ("granules-de-bois", "engrais", "adblue", "produits-chimiques")
+
+QUERIES = {
+    "mot exact": ["engrais ", "javel ", "sulfate "],
+    "sans accents": ["granules", "deneigement", "foret orient"],
+    "préfixe court": ["gr", "en", "bi"],
+    "préfixe": ["granu", "chlor", "hydrau"],
+    "plusieurs mots": ["acide chlor", "sulfate cuivre bio", "bidon 10", "engrais azote vosges"],
+    "référence": ["ref 0042", "004217"],
+    "catégorie": ["produits chimiques", "adblue"],
+    "aucun résultat": ["xyzzy", "granules zzz"],
+}
+
+
+def catalog(n: int):
+    categories, products = synthetic_catalog(n, per_top=25)
+    rnd = random.Random(42)
+    for it in categories + products:
+        it["category"] = TOPS[int(it["category"].rsplit("-", 1)[-1]) % len(TOPS)]
+    for i, it in enumerate(products):
+        it["name"] = (f"{rnd.choice(NOUNS)} {rnd.choice(QUALIFIERS)} {rnd.choice(BRANDS)} – "
+                      f"{rnd.choice(SIZES)} réf. {i:06d}")
+    return categories + products
+
+
+def brute_force(app, items, query: str, limit: int):
+    """Mêmes règles que _SearchIndex.search, sur tous les items (ordre statique)."""
+    words = list(dict.fromkeys(app._search_words(query)))
+    if not words:
+        return [], 0
+    prefix = words.pop() if not query[-1:].isspace() and len(words[-1]) >= app.SEARCH_MIN_PREFIX else None
+    first = words[0] if words else prefix
+    matches = []
+    for rank, it in enumerate(sorted(items, key=app._search_rank)):
+        name_words = app._search_words(it.get("name") or "")
+        cat_words = app._search_words(it.get("category") or "")
+        score = 0.0
+        for w in words:
+            if w in name_words:
+                score += app._SCORE_NAME_EXACT
+            elif w in cat_words:
+                score += app._SCORE_CATEGORY_EXACT
+            else:
+                break
+        else:
+            if prefix:
+                if prefix in name_words:
+                    score += app._SCORE_NAME_EXACT
+                elif any(w.startswith(prefix) for w in name_words):
+                    score += app._SCORE_NAME_PREFIX
+                elif prefix in cat_words:
+                    score += app._SCORE_CATEGORY_EXACT
+                elif any(w.startswith(prefix) for w in cat_words):
+                    score += app._SCORE_CATEGORY_PREFIX
+                else:
+                    continue
+            if name_words and name_words[0].startswith(first):
+                score += app._SCORE_LEADING
+            matches.append((-score, rank, it["product_id"]))
+    return [pid for _, _, pid in heapq.nsmallest(limit, matches)], len(matches)
+
+
+def call(app, qs):
+    return app.handler({"httpMethod": "GET", "path": "/products/search", "queryStringParameters": qs}, None)
+
+
+def search(app, q: str, limit: int = 10):
+    return json.loads(call(app, {"q": q, "limit": str(limit)})["body"])
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def ms(samples, p):
+    return round(percentile(samples, p) * 1000, 3)
+
+
+def fold(text: str) -> str:
+    return unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--churn", type=float, default=0.5, help="%% d'items modifiés à la republication")
+    ap.add_argument("--table-products", type=int, default=5000)
+    args = ap.parse_args()
+
+    set_default_env()
+    items = catalog(args.products)
+    path = os.path.join(tempfile.mkdtemp(), "catalog_snapshot.json.gz")
+    seed.write_snapshot(seed.build_snapshot([typed_item(x) for x in items]), path)
+    os.environ["CATALOG_SNAPSHOT"] = path
+    os.environ["CATALOG_SNAPSHOT_CHECK_INTERVAL"] = "0"
+
+    from products import app
+
+    # 1. construction
+    snap = app._current_snapshot()
+    t0 = time.perf_counter()
+    index = app._SearchIndex(snap.items, snap.version)
+    build_ms = (time.perf_counter() - t0) * 1000
+    tracemalloc.start()
+    traced = app._SearchIndex(snap.items, snap.version)
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+    print(json.dumps({"test": "build", "docs": len(index), "vocabulary": len(index.vocab),
+                      "build_ms": round(build_ms, 1), "index_mb": round(mem / 2**20, 1)}))
+
+    # 2. exactitude
+    checked = 0
+    for q in [q for group in QUERIES.values() for q in group]:
+        got = search(app, q)
+        words = app._search_words(q)
+        capped = (words and not q.endswith(" ") and len(index._expand(words[-1])) >= app.SEARCH_MAX_EXPANSIONS)
+        if got["total_relation"] == "eq" and not capped:
+            want_ids, want_total = brute_force(app, snap.items, q, 10)
+            assert [it["product_id"] for it in got["items"]] == want_ids, q
+            assert got["total"] == want_total, q
+            checked += 1
+    same = {json.dumps(search(app, q)["items"]) for q in ("granules bois", "granulés bois", "GRANULÉS DE BOIS")}
+    assert len(same) == 1
+    print(json.dumps({"test": "exactness", "queries_checked": checked, "accent_case_insensitive": True}))
+
+    # 3. latence par requête type
+    for label, group in QUERIES.items():
+        samples = []
+        for q in group:
+            samples += timed(lambda: call(app, {"q": q}), args.repeat)
+        example = search(app, group[0], 3)
+        print(json.dumps({"test": "latency", "kind": label, "queries": group, "p50_ms": ms(samples, 50),
+                          "p95_ms": ms(samples, 95), "p99_ms": ms(samples, 99),
+                          "total": example["total"], "total_relation": example["total_relation"],
+                          "top": [it["name"] for it in example["items"]]}, ensure_ascii=False))
+
+    os.environ["BFF_TRANSPORT"] = "inprocess"
+    from bff import app as bff
+
+    event = {"httpMethod": "GET", "path": "/api/search", "queryStringParameters": {"q": "sulfate cuivre bi"}}
+    assert bff.handler(dict(event), None)["statusCode"] == 200
+    samples = timed(lambda: bff.handler(dict(event), None), args.repeat)
+    print(json.dumps({"test": "bff_inprocess", "p50_ms": ms(samples, 50), "p95_ms": ms(samples, 95)}))
+
+    # 4. avant : toute la liste puis filtre client
+    def list_and_filter(q: str):
+        found, token = [], None
+        while True:
+            qs = {"next_token": token} if token else {}
+            body = json.loads(app.handler({"queryStringParameters": qs}, None)["body"])
+            found += [it for it in body["items"] if q in fold(it.get("name") or "")]
+            token = body.get("next_token")
+            if not token:
+                return found
+
+    samples = timed(lambda: list_and_filter("sulfate de cuivre"), 3)
+    print(json.dumps({"test": "list_and_filter", "p50_ms": ms(samples, 50)}))
+
+    # 5. republication du snapshot
+    rnd = random.Random(1)
+    changed = rnd.sample(range(len(items)), int(len(items) * args.churn / 100))
+    new_items = [dict(it) for it in items]
+    for i in changed:
+        new_items[i]["name"] = new_items[i]["name"] + " nouveauté"
+    removed = {new_items[i]["product_id"] for i in changed[:len(changed) // 5]}
+    new_items = [it for it in new_items if it["product_id"] not in removed]
+    new_items.append(dict(new_items[-1], product_id="zz-ajout-1", name="Xylophage traitement charpente"))
+    seed.write_snapshot(seed.build_snapshot([typed_item(x) for x in new_items]), path)
+
+    t0 = time.perf_counter()
+    res = search(app, "xylophage")
+    reload_ms = (time.perf_counter() - t0) * 1000
+    assert [it["product_id"] for it in res["items"]] == ["zz-ajout-1"]
+    assert not any(it["product_id"] in removed for it in search(app, "nouveaute", 50)["items"])
+    snap = app._current_snapshot()
+    t0 = time.perf_counter()
+    app._SearchIndex(snap.items, snap.version)
+    rebuild_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    app._snapshot_read()
+    app._Snapshot(app._snapshot_read())
+    snapshot_ms = (time.perf_counter() - t0) * 1000
+    print(json.dumps({"test": "republish", "changed": len(changed), "removed": len(removed), "added": 1,
+                      "first_search_after_publish_ms": round(reload_ms, 1),
+                      "of_which_snapshot_reload_ms": round(snapshot_ms / 2, 1),
+                      "full_index_rebuild_ms": round(rebuild_ms, 1),
+                      "index_changes": app._search_index.changes}))
+
+    # 6. table : index construit en tâche de fond, rafraîchi au changement de version
+    table_scenario(app, items[:args.table_products])
+
+
+def table_scenario(app, items):
+    from moto import mock_aws
+    import boto3
+
+    with mock_aws():
+        seed_products_table(create_products_table(boto3.resource("dynamodb")), items)
+        client = boto3.client("dynamodb")
+        seed.write_catalog_version([typed_item(x) for x in items], os.environ["PRODUCTS_TABLE"], client)
+        app.CATALOG_SNAPSHOT = ""
+        app.CATALOG_VERSION_CHECK_INTERVAL = 0
+        app.SEARCH_REFRESH_INTERVAL = 0  # ignoré tant que l'item de version existe
+        app._search_index, app._search_source = None, None
+        scans = []
+        scan = app._scan_search_items
+        app._scan_search_items = lambda: scans.append(1) or scan()
+
+        def wait_index():
+            t0 = time.perf_counter()
+            while app._search_refreshing:
+                time.sleep(0.005)
+            return round((time.perf_counter() - t0) * 1000, 1)
+
+        t0 = time.perf_counter()
+        first = call(app, {"q": "granules"})
+        first_ms = round((time.perf_counter() - t0) * 1000, 3)
+        assert first["statusCode"] == 503 and first["headers"]["Retry-After"] == "1"
+        build_ms = wait_index()
+        samples = timed(lambda: call(app, {"q": "granules"}), 20)
+        assert len(scans) == 1 and call(app, {"q": "granules"})["statusCode"] == 200
+
+        renamed = dict(items[0], name="Xylophage traitement charpente")
+        client.put_item(TableName=os.environ["PRODUCTS_TABLE"], Item=typed_item(renamed))
+        search(app, "xylophage")
+        wait_index()
+        unchanged_scans = len(scans)
+        assert unchanged_scans == 1 and search(app, "xylophage")["total"] == 0  # version inchangée : pas de Scan
+        changed = [renamed] + items[1:]
+        seed.write_catalog_version([typed_item(x) for x in changed], os.environ["PRODUCTS_TABLE"], client)
+        search(app, "xylophage")  # lance le Scan, l'ancien index répond encore
+        refresh_ms = wait_index()
+        found = [it["product_id"] for it in search(app, "xylophage")["items"]]
+        assert len(scans) == 2 and found == [renamed["product_id"]]
+        app._scan_search_items = scan
+        print(json.dumps({"test": "table", "items": len(items), "first_search_ms": first_ms,
+                          "first_status": first["statusCode"], "background_build_ms": build_ms,
+                          "p50_ms_version_check_each_call": ms(samples, 50),
+                          "scans_while_version_unchanged": unchanged_scans,
+                          "refresh_after_new_version_ms": refresh_ms, "scans": len(scans)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+GET /products sans filtre : temps de lecture complète selon le nombre de segments.
+
+Table seedée sur DynamoDB Local (--endpoint-url, recommandé) ou moto in-process.
+moto évalue le Scan en Python (~1 ms/item, sous le GIL) : les segments ne peuvent
+pas y aller plus vite ; --latency / --per-item-us ajoutent un temps de service
+simulé par appel pour observer l'effet du parallélisme.
+
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python benchmarks/bench_segmented_scan.py --endpoint-url http://localhost:8000 --products 20000
+
+    pip install boto3 moto
+    python benchmarks/bench_segmented_scan.py --products 2000 --latency 0.05
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+
+from common import create_products_table, seed_products_table, set_default_env, synthetic_catalog
+
+
+class LatencyTable:
+    def __init__(self, table, latency: float, per_item: float):
+        self._table = table
+        self._latency = latency
+        self._per_item = per_item
+
+    def scan(self, **kwargs):
+        res = self._table.scan(**kwargs)
+        time.sleep(self._latency + self._per_item * res["ScannedCount"])
+        return res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=20000)
+    ap.add_argument("--segments", default="1,2,4,8")
+    ap.add_argument("--latency", type=float, default=0.0, help="ajout par appel Scan (s)")
+    ap.add_argument("--per-item-us", type=float, default=0.0, help="ajout par item lu (µs)")
+    ap.add_argument("--endpoint-url", help="DynamoDB Local (sinon moto)")
+    args = ap.parse_args()
+
+    set_default_env()
+    if args.endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.endpoint_url
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+        os.environ["PRODUCTS_TABLE"] = f"bench-products-{int(time.time())}"
+        ctx = contextlib.nullcontext()
+    else:
+        from moto import mock_aws
+        ctx = mock_aws()
+
+    with ctx:
+        import boto3
+
+        table = create_products_table(boto3.resource("dynamodb"), os.environ["PRODUCTS_TABLE"])
+        table.wait_until_exists()
+        categories, products = synthetic_catalog(args.products, per_top=25)
+        seed_products_table(table, categories + products)
+        expected = len(categories) + len(products)
+
+        from products import app
+
+        if args.latency or args.per_item_us:
+            slow = LatencyTable(table, args.latency, args.per_item_us / 1e6)
+            app._table = slow
+            app._thread_table = lambda: slow
+            fast_read = app._fast_read
+
+            def slow_fast_read(op, kwargs):
+                res = fast_read(op, kwargs)
+                time.sleep(args.latency + args.per_item_us / 1e6 * res.get("ScannedCount", 0))
+                return res
+
+            app._fast_read = slow_fast_read
+
+        baseline = None
+        for seg in (int(x) for x in args.segments.split(",")):
+            token, n, calls = None, 0, 0
+            t0 = time.perf_counter()
+            while True:
+                qs = {"segments": str(seg)}
+                if token:
+                    qs["next_token"] = token
+                body = json.loads(app.handler({"queryStringParameters": qs}, None)["body"])
+                n += len(body["items"])
+                calls += 1
+                token = body.get("next_token")
+                if not token:
+                    break
+            wall = time.perf_counter() - t0
+            assert n == expected, (n, expected)
+            baseline = baseline or wall
+            print(json.dumps({"segments": seg, "items": n, "handler_calls": calls,
+                              "wall_s": round(wall, 3), "speedup": round(baseline / wall, 2)}))
+
+
+if __name__ == "__main__":
+    main()
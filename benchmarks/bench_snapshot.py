@@ -0,0 +1,95 @@
+"""
+products-service : snapshot catalogue en mémoire vs lecture DynamoDB (moto).
+
+Génère un snapshot avec les fonctions du seeder, compare la latence du handler
+(liste filtrée, liste complète, détail) dans les deux modes, puis vérifie qu'un
+snapshot republié (nouvelle version) est rechargé.
+
+    pip install boto3 moto
+    python benchmarks/bench_snapshot.py --products 10000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from common import (ROOT, create_products_table, seed_products_table, set_default_env,
+                    summarize_ms, synthetic_catalog, typed_item)
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+
+def drain(app, qs):
+    items, token, calls = [], None, 0
+    while True:
+        q = dict(qs, next_token=token) if token else dict(qs)
+        body = json.loads(app.handler({"queryStringParameters": q}, None)["body"])
+        items += body["items"]
+        calls += 1
+        token = body.get("next_token")
+        if not token:
+            return items, calls
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=10000)
+    ap.add_argument("--iterations", type=int, default=3)
+    args = ap.parse_args()
+
+    set_default_env()
+    categories, products = synthetic_catalog(args.products, per_top=25)
+    everything = categories + products
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog_snapshot.json.gz")
+    snap = seed.build_snapshot([typed_item(x) for x in everything])
+    seed.write_snapshot(snap, path)
+    os.environ["CATALOG_SNAPSHOT"] = path
+    os.environ["CATALOG_SNAPSHOT_CHECK_INTERVAL"] = "0"
+    print(f"snapshot {snap['version']}: {os.path.getsize(path)} bytes for {len(everything)} items")
+
+    from moto import mock_aws
+
+    with mock_aws():
+        import boto3
+
+        seed_products_table(create_products_table(boto3.resource("dynamodb")), everything)
+        from products import app
+
+        cases = {
+            "list ?type=category": lambda: drain(app, {"type": "category"}),
+            "list ?parent_id": lambda: drain(app, {"parent_id": products[0]["parent_id"]}),
+            "list all": lambda: drain(app, {"segments": "1"}),
+            "detail": lambda: app.handler({"pathParameters": {"product_id": products[5]["product_id"]}}, None),
+        }
+        t0 = time.perf_counter()
+        app._current_snapshot()
+        print("snapshot load+index ms:", round((time.perf_counter() - t0) * 1000, 1))
+
+        for name, fn in cases.items():
+            line = {"case": name}
+            for mode, source in (("dynamodb", ""), ("snapshot", path)):
+                app.CATALOG_SNAPSHOT = source
+                samples = []
+                for _ in range(args.iterations):
+                    t0 = time.perf_counter()
+                    fn()
+                    samples.append(time.perf_counter() - t0)
+                line[mode] = summarize_ms(samples)
+            print(json.dumps(line))
+
+        # republication : nouvelle version -> rechargée au prochain appel
+        app.CATALOG_SNAPSHOT = path
+        old = app._current_snapshot().version
+        snap2 = seed.build_snapshot([typed_item(x) for x in everything[:-1]])
+        seed.write_snapshot(snap2, path)
+        new = app._current_snapshot().version
+        assert new == snap2["version"] != old
+        print("reloaded:", old, "->", new)
+
+
+if __name__ == "__main__":
+    main()
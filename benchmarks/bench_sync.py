@@ -0,0 +1,117 @@
+"""
+seed_cid_products --sync : reseed incrémental (content_hash) vs réécriture complète.
+
+Catalogue v1 écrit en entier dans moto, puis v2 = v1 avec quelques titres changés,
+quelques pages ajoutées et d'autres disparues. On compare les requêtes d'écriture
+(et une estimation WCU : 1 par Ko et par item écrit) d'un reseed complet et d'un
+--sync, puis on vérifie que la table contient exactement v2 (aucun item périmé).
+
+    pip install boto3 moto
+    python benchmarks/bench_sync.py --items 600 --changed 3 --added 2 --removed 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from common import ROOT, create_products_table, item_size, set_default_env, synthetic_catalog, typed_item
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+
+class CountingClient:
+    def __init__(self, client):
+        self._client = client
+        self.write_requests = 0
+        self.write_units = 0
+
+    def batch_write_item(self, RequestItems):
+        for reqs in RequestItems.values():
+            self.write_requests += len(reqs)
+            for r in reqs:
+                item = r.get("PutRequest", {}).get("Item")
+                # plain_item écarte content_hash, qui est pourtant écrit dans la table
+                size = item_size(dict(seed.plain_item(item), content_hash=item["content_hash"]["S"])) if item else 1
+                self.write_units += -(-size // 1024)
+        return self._client.batch_write_item(RequestItems=RequestItems)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def stamped(plain):
+    item = typed_item(plain)
+    item["content_hash"] = {"S": seed.content_hash(item)}
+    return item
+
+
+def table_state(client, table):
+    state, kwargs = {}, {"TableName": table}
+    while True:
+        res = client.scan(**kwargs)
+        for it in res["Items"]:
+            state[it["product_id"]["S"]] = it
+        if "LastEvaluatedKey" not in res:
+            return state
+        kwargs["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=600)
+    ap.add_argument("--changed", type=int, default=3)
+    ap.add_argument("--added", type=int, default=2)
+    ap.add_argument("--removed", type=int, default=4)
+    args = ap.parse_args()
+
+    set_default_env()
+    categories, products = synthetic_catalog(args.items + args.added)
+    everything = categories + products
+    v1 = everything[:args.items]
+    v2 = [dict(x) for x in everything[args.removed:args.items + args.added]]
+    for x in v2[-args.added - args.changed:len(v2) - args.added]:
+        x["name"] += " (nouveau nom)"
+    v1_items, v2_items = [stamped(x) for x in v1], [stamped(x) for x in v2]
+
+    from moto import mock_aws
+
+    with mock_aws():
+        import boto3
+
+        name = os.environ["PRODUCTS_TABLE"]
+        create_products_table(boto3.resource("dynamodb"), name)
+        client = CountingClient(boto3.client("dynamodb"))
+        seed.batch_write(v1_items, table=name, client=client, progress_every=0)
+
+        # reseed complet (ancien comportement) : tout est réécrit, rien n'est supprimé
+        full = CountingClient(client._client)
+        t0 = time.perf_counter()
+        seed.batch_write(v2_items, table=name, client=full, progress_every=0)
+        full_s = time.perf_counter() - t0
+        stale_after_full = len(set(table_state(client, name)) - {x["product_id"] for x in v2})
+
+        # retour à v1 puis --sync vers v2
+        seed.batch_write(v1_items, table=name, client=client, progress_every=0,
+                         deletes=sorted(set(table_state(client, name)) - {x["product_id"] for x in v1}))
+        sync = CountingClient(client._client)
+        opts = SimpleNamespace(write_workers=4, dry_run=False, max_delete_ratio=0.5)
+        t0 = time.perf_counter()
+        stats = seed.sync_table(v2_items, opts, client=sync, table=name)
+        sync_s = time.perf_counter() - t0
+
+        state = table_state(client, name)
+        assert state == {x["product_id"]["S"]: x for x in v2_items}, "table != v2"
+        print(json.dumps({
+            "items": len(v2_items),
+            "full_reseed": {"write_requests": full.write_requests, "est_wcu": full.write_units,
+                            "stale_items_left": stale_after_full, "wall_s": round(full_s, 2)},
+            "sync": {"write_requests": sync.write_requests, "est_wcu": sync.write_units,
+                     "stale_items_left": 0, "wall_s": round(sync_s, 2), "stats": stats.counts},
+        }))
+
+
+if __name__ == "__main__":
+    main()
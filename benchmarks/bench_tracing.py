@@ -0,0 +1,120 @@
+"""
+Instrumentation par requête (spans, Server-Timing, logs JSON) : coût à l'échantillonnage.
+
+1. primitive : `with _span(...)` hors requête échantillonnée (objet partagé, aucun
+   appel d'horloge) vs span réellement enregistré
+2. handler products-service (snapshot en mémoire : chemin le plus court, donc le
+   surcoût relatif le plus visible), détail et liste filtrée :
+   - baseline : app.py d'un commit antérieur (--baseline-rev), sans instrumentation
+   - off      : version courante, TRACE_SAMPLE_RATE=0
+   - sampled  : version courante, en-tête X-Trace-Sampled: 1 (log JSON écarté)
+
+    pip install boto3
+    python benchmarks/bench_tracing.py --products 2000 --baseline-rev HEAD~1
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, percentile, set_default_env, synthetic_catalog, typed_item
+from cid_shared import tracing
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+
+def load_rev(rev: str):
+    """Importe products/app.py tel qu'au commit `rev`, sous un autre nom de module."""
+    code = subprocess.run(["git", "show", f"{rev}:services/products/src/products/app.py"], cwd=ROOT,
+                          capture_output=True, text=True, check=True).stdout
+    path = os.path.join(tempfile.mkdtemp(prefix="tracing-"), "products_baseline.py")
+    with open(path, "w") as f:
+        f.write(code)
+    spec = importlib.util.spec_from_file_location("products_baseline", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def timed(fn, n: int, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        samples.append((time.perf_counter() - t0) / n)
+    return {"n": repeat, "p50_us": round(percentile(samples, 50) * 1e6, 2),
+            "min_us": round(min(samples) * 1e6, 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=2000)
+    ap.add_argument("--calls", type=int, default=2000, help="appels par échantillon")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--baseline-rev", default="HEAD~1")
+    args = ap.parse_args()
+
+    set_default_env()
+    categories, products = synthetic_catalog(args.products, per_top=25)
+    path = os.path.join(tempfile.mkdtemp(), "catalog_snapshot.json.gz")
+    seed.write_snapshot(seed.build_snapshot([typed_item(x) for x in categories + products]), path)
+    os.environ["CATALOG_SNAPSHOT"] = path
+    os.environ["CATALOG_SNAPSHOT_CHECK_INTERVAL"] = "0"
+    os.environ["TRACE_SAMPLE_RATE"] = "0"
+
+    from products import app
+
+    # 1. primitive
+    def span_off():
+        with app._span("dynamodb") as sp:
+            if sp:
+                sp.set(op="get_item")
+
+    trace = tracing.Trace("bench")
+
+    def span_on():
+        token = app._trace_var.set(trace)
+        with app._span("dynamodb") as sp:
+            if sp:
+                sp.set(op="get_item")
+        app._trace_var.reset(token)
+        trace.spans.clear()
+
+    print(json.dumps({"test": "span", "off": timed(span_off, args.calls * 10, args.repeat),
+                      "recorded": timed(span_on, args.calls * 10, args.repeat)}))
+
+    # 2. handler
+    base = load_rev(args.baseline_rev)
+    pid = products[5]["product_id"]
+    cases = {
+        "detail": {"pathParameters": {"product_id": pid}},
+        "list ?parent_id": {"queryStringParameters": {"parent_id": products[0]["parent_id"]}},
+    }
+    sink = io.StringIO()
+    for name, event in cases.items():
+        sampled = dict(event, headers={"X-Trace-Sampled": "1"})
+        want = base.handler(dict(event), None)["body"]
+        assert app.handler(dict(event), None)["body"] == want
+        res = app.handler(dict(sampled), None)
+        assert res["body"] == want and "Server-Timing" in res["headers"]
+        line = {"case": name}
+        with contextlib.redirect_stdout(sink):
+            for mode, mod, ev in (("baseline", base, event), ("off", app, event), ("sampled", app, sampled)):
+                line[mode] = timed(lambda: mod.handler(dict(ev), None), args.calls, args.repeat)
+                sink.seek(0)
+                sink.truncate()
+        line["off_vs_baseline_us"] = round(line["off"]["min_us"] - line["baseline"]["min_us"], 2)
+        line["server_timing"] = res["headers"]["Server-Timing"]
+        print(json.dumps(line))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+BFF : transport HTTP (API Gateway -> Lambda products) vs colocalisé (BFF_TRANSPORT=inprocess).
+
+Routes /api/catalog (cache BFF désactivé : arbre reconstruit à chaque requête) et
+/api/products/{id}. Pour chaque mode : latence de bout en bout du handler BFF et coût
+estimé par requête :
+
+- http      : 1 + N invocations Lambda (BFF + appels products), 1 + N requêtes API
+              Gateway, durée facturée du BFF (qui attend ses upstreams) + celle des
+              handlers products
+- inprocess : 1 invocation, 1 requête API Gateway, durée facturée du BFF seul
+
+Le saut HTTP mesuré ici est local (loopback, common.ApiGatewayServer) : un vrai
+aller-retour API Gateway + Lambda ajoute plusieurs ms par appel, non comptées.
+products-service lit un snapshot en mémoire (--backend snapshot, défaut : ni AWS ni
+moto) ou DynamoDB via moto (--backend moto, lent : ~1 ms/item).
+
+    pip install boto3 moto
+    python benchmarks/bench_transport.py --products 2000 --requests 50
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+from common import (ROOT, ApiGatewayServer, create_products_table, percentile, seed_products_table,
+                    set_default_env, synthetic_catalog, typed_item)
+
+sys.path.insert(0, ROOT)
+import seed_cid_products as seed  # noqa: E402
+
+# us-east-1, x86 : Lambda 0.20 $/M requêtes + 0.0000166667 $/Go-s, API Gateway REST 3.50 $/M
+LAMBDA_REQUEST_USD = 0.20 / 1e6
+LAMBDA_GB_SECOND_USD = 0.0000166667
+APIGW_REQUEST_USD = 3.50 / 1e6
+
+
+class Timed:
+    """Handler upstream chronométré (durée facturée Lambda = arrondi à la ms supérieure)."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.calls = 0
+        self.billed_ms = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event, context):
+        t0 = time.perf_counter()
+        try:
+            return self.fn(event, context)
+        finally:
+            ms = math.ceil((time.perf_counter() - t0) * 1000)
+            with self._lock:
+                self.calls += 1
+                self.billed_ms += ms
+
+
+def cost_usd(invocations: int, billed_ms: int, apigw: int, memory_mb: int) -> float:
+    return (invocations * LAMBDA_REQUEST_USD + billed_ms / 1000 * memory_mb / 1024 * LAMBDA_GB_SECOND_USD
+            + apigw * APIGW_REQUEST_USD)
+
+
+def run(bff, event, requests: int, upstream: Timed, memory_mb: int):
+    calls0, billed0 = upstream.calls, upstream.billed_ms
+    samples, bff_billed, statuses = [], 0, {}
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        res = bff.handler(dict(event), None)
+        dt = time.perf_counter() - t0
+        samples.append(dt)
+        bff_billed += math.ceil(dt * 1000)
+        statuses[res["statusCode"]] = statuses.get(res["statusCode"], 0) + 1
+    up_calls = upstream.calls - calls0
+    up_billed = upstream.billed_ms - billed0
+    cost = cost_usd(requests + up_calls, bff_billed + up_billed, requests + up_calls, memory_mb)
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "status": statuses,
+        "lambda_invocations_per_request": round(1 + up_calls / requests, 2),
+        "billed_ms_per_request": round((bff_billed + up_billed) / requests, 1),
+        "usd_per_million": round(cost / requests * 1e6, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=2000)
+    ap.add_argument("--requests", type=int, default=50)
+    ap.add_argument("--backend", choices=("snapshot", "moto"), default="snapshot")
+    ap.add_argument("--memory-mb", type=int, default=256, help="MemorySize des fonctions (template)")
+    args = ap.parse_args()
+
+    set_default_env()
+    # mesurer le transport, pas les caches (un détail servi du cache n'appelle pas l'upstream)
+    os.environ["BFF_CATALOG_CACHE_TTL"] = "0"
+    os.environ["BFF_DETAIL_CACHE_TTL"] = "0"
+    os.environ["PRODUCTS_DETAIL_CACHE_TTL"] = "0"
+    categories, products = synthetic_catalog(args.products, per_top=25)
+    everything = categories + products
+
+    with ExitStack() as stack:
+        if args.backend == "snapshot":
+            path = os.path.join(tempfile.mkdtemp(), "catalog_snapshot.json.gz")
+            seed.write_snapshot(seed.build_snapshot([typed_item(x) for x in everything]), path)
+            os.environ["CATALOG_SNAPSHOT"] = path
+            os.environ["CATALOG_SNAPSHOT_CHECK_INTERVAL"] = "3600"
+        else:
+            from moto import mock_aws
+            import boto3
+
+            stack.enter_context(mock_aws())
+            seed_products_table(create_products_table(boto3.resource("dynamodb")), everything)
+
+        from bff import app as bff
+        from contact import app as contact
+        from products import app as products_app
+
+        timed = Timed(products_app.handler)
+        gw = stack.enter_context(ApiGatewayServer([
+            ("GET", "/products", timed), ("GET", "/products/{product_id}", timed),
+        ]))
+
+        def use(transport: str):
+            bff.TRANSPORT = transport
+            bff._products_app, bff._contact_app = products_app, contact
+            bff.PRODUCTS_BASE = gw.base_url if transport == "http" else ""
+
+        pid = products[7]["product_id"]
+        routes = {
+            "GET /api/catalog": {"httpMethod": "GET", "path": "/api/catalog"},
+            "GET /api/products/{id}": {"httpMethod": "GET", "path": f"/api/products/{pid}",
+                                       "pathParameters": {"product_id": pid}},
+        }
+        print(json.dumps({"backend": args.backend, "items": len(everything), "requests": args.requests}))
+        for name, event in routes.items():
+            bodies = {}
+            for transport in ("http", "inprocess"):
+                use(transport)
+                bodies[transport] = json.loads(bff.handler(dict(event), None)["body"])
+            assert bodies["http"] == bodies["inprocess"], name
+
+            line = {"route": name}
+            for transport in ("http", "inprocess"):
+                use(transport)
+                line[transport] = run(bff, event, args.requests, timed, args.memory_mb)
+            line["latency_p50_gain"] = round(line["http"]["p50_ms"] / line["inprocess"]["p50_ms"], 2)
+            line["cost_ratio"] = round(line["http"]["usd_per_million"] / line["inprocess"]["usd_per_million"], 2)
+            print(json.dumps(line))
+
+
+if __name__ == "__main__":
+    main()
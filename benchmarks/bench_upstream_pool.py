@@ -0,0 +1,62 @@
+"""
+Appels upstream du BFF : urlopen (une connexion par requête) vs pool keep-alive.
+
+Stand-in HTTP/1.1 local ; affiche latences, connexions ouvertes côté serveur
+et les métriques du pool (reuse ratio, handshake évité).
+
+    python benchmarks/bench_upstream_pool.py --requests 500 --concurrency 4
+"""
+import argparse
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import StubUpstream, set_default_env, summarize_ms
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=4)
+    args = ap.parse_args()
+
+    def route(method, path, query, body):
+        return 200, {"items": [{"product_id": "x", "name": "AdBlue"}]}
+
+    with StubUpstream(route) as stub:
+        os.environ["PRODUCTS_BASE_URL"] = stub.base_url
+        set_default_env()
+        from bff import app
+
+        url = f"{stub.base_url}/products/x"
+
+        def legacy(_):
+            t0 = time.perf_counter()
+            req = urllib.request.Request(url, headers={"Accept": "application/json"})
+            with urllib.request.urlopen(req, timeout=15) as resp:
+                json.loads(resp.read().decode("utf-8"))
+            return time.perf_counter() - t0
+
+        def pooled(_):
+            t0 = time.perf_counter()
+            app._http_json("GET", url)
+            return time.perf_counter() - t0
+
+        for label, fn in (("urlopen", legacy), ("pool", pooled)):
+            before = stub.connections
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+                samples = list(ex.map(fn, range(args.requests)))
+            wall = time.perf_counter() - t0
+            res = summarize_ms(samples)
+            res["req_per_s"] = round(args.requests / wall, 1)
+            res["server_connections"] = stub.connections - before
+            print(label, res)
+
+        print("pool metrics", app._upstream_metrics())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Client upstream du BFF face à un upstream capricieux (stub HTTP local).
+
+1. tail : réponses lentes aléatoires (--slow-ratio des requêtes, 150-300 ms, sinon
+   2-6 ms), GET /api/products/{id} en séquence (une invocation à la fois, comme
+   Lambda) : p50 / p95 / p99 sans puis avec hedging, requêtes upstream par appel
+2. deadline : upstream bloqué 3 s, invocation avec 1 s restante
+   (context.get_remaining_time_in_millis) : 504 avant le Timeout Lambda
+3. breaker : upstream en 503 puis rétabli : appels qui l'atteignent encore une
+   fois le circuit ouvert, latence d'un refus, fermeture après l'appel d'essai
+
+    python benchmarks/bench_upstream_resilience.py --requests 1000 --slow-ratio 0.03
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from common import StubUpstream, set_default_env, summarize_ms
+
+
+class FakeContext:
+    """Contexte Lambda minimal : temps restant avant le Timeout."""
+
+    def __init__(self, remaining_ms: int):
+        self.deadline = time.monotonic() + remaining_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self.deadline - time.monotonic()) * 1000)
+
+
+def detail_event(pid: str):
+    return {"httpMethod": "GET", "path": f"/api/products/{pid}", "pathParameters": {"product_id": pid}}
+
+
+def reset(app):
+    app._op_stats.clear()
+    app._breakers.clear()
+
+
+def tail(app, stub, requests: int):
+    out = {}
+    for mode, enabled in (("no_hedge", False), ("hedge", True)):
+        reset(app)
+        app.HEDGE_ENABLED = enabled
+        random.seed(7)
+        before = stub.requests
+        samples, statuses = [], {}
+        for i in range(requests):
+            t0 = time.perf_counter()
+            res = app.handler(detail_event(f"p-{i % 50}"), FakeContext(15000))
+            samples.append(time.perf_counter() - t0)
+            statuses[res["statusCode"]] = statuses.get(res["statusCode"], 0) + 1
+        line = summarize_ms(samples)
+        line["max_ms"] = round(max(samples) * 1000, 3)
+        line["status"] = statuses
+        line["upstream_per_call"] = round((stub.requests - before) / requests, 3)
+        line["op"] = app._upstream_metrics()["ops"]["product_detail"]
+        out[mode] = line
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--slow-ratio", type=float, default=0.03)
+    args = ap.parse_args()
+
+    state = {"mode": "flaky"}
+
+    def latency():
+        if state["mode"] == "hang":
+            return 3.0
+        if state["mode"] == "flaky" and random.random() < args.slow_ratio:
+            return random.uniform(0.150, 0.300)
+        return random.uniform(0.002, 0.006)
+
+    def route(method, path, query, body):
+        if state["mode"] == "down":
+            return 503, {"message": "Service Unavailable"}
+        return 200, {"product_id": path.rsplit("/", 1)[-1], "name": "AdBlue 10 L"}
+
+    with StubUpstream(route, latency_fn=latency) as stub:
+        os.environ["PRODUCTS_BASE_URL"] = stub.base_url
+        os.environ["BFF_DETAIL_CACHE_TTL"] = "0"  # chaque détail doit partir vers l'upstream
+        set_default_env()
+        from bff import app
+
+        # 1. tail
+        print(json.dumps(dict(tail(app, stub, args.requests), test="tail", slow_ratio=args.slow_ratio)))
+
+        # 2. deadline
+        reset(app)
+        state["mode"] = "hang"
+        line = {"test": "deadline", "upstream_latency_s": 3.0}
+        for label, ctx in (("remaining_1000ms", FakeContext(1000)), ("no_context", None)):
+            t0 = time.perf_counter()
+            res = app.handler(detail_event("p-1"), ctx)
+            line[label] = {"status": res["statusCode"], "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+                           "body": json.loads(res["body"])}
+        print(json.dumps(line))
+
+        # 3. breaker
+        reset(app)
+        app.BREAKER_COOLDOWN = 0.5
+        state["mode"] = "down"
+        before = stub.requests
+        statuses, rejected = {}, []
+        for _ in range(50):
+            t0 = time.perf_counter()
+            res = app.handler(detail_event("p-1"), FakeContext(15000))
+            status = res["statusCode"]
+            statuses[status] = statuses.get(status, 0) + 1
+            if json.loads(res["body"]).get("error") == "upstream_circuit_open":
+                rejected.append(time.perf_counter() - t0)
+        reached = stub.requests - before
+        state["mode"] = "ok"
+        time.sleep(app.BREAKER_COOLDOWN)
+        probe = app.handler(detail_event("p-1"), FakeContext(15000))["statusCode"]
+        breaker = app._upstream_metrics()["breakers"][stub.base_url]
+        print(json.dumps({"test": "breaker", "calls": 50, "status": statuses, "upstream_reached": reached,
+                          "rejected_p50_ms": summarize_ms(rejected)["p50_ms"], "probe_status": probe,
+                          "breaker_after_probe": breaker}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+"""
+Outils partagés par les benchmarks locaux (pas de réseau, pas d'AWS).
+
+- rend les services importables (bff.app, products.app, contact.app, layer cid_shared)
+- serveur HTTP "stub" local avec latence injectée
+- serveur HTTP local devant les vrais handlers (événements API Gateway)
+- site HTML synthétique (crawler du seeder)
+- percentiles
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# shared : layer cid_shared, sur le sys.path du runtime Lambda des trois fonctions
+for _svc in ("shared", "bff", "products", "contact"):
+    _src = os.path.join(ROOT, "services", _svc, "src")
+    if _src not in sys.path:
+        sys.path.insert(0, _src)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+def summarize_ms(samples: List[float]) -> Dict[str, float]:
+    """samples en secondes -> p50/p95/p99 en millisecondes"""
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+# route(method, path, query, body) -> (status, payload)
+Route = Callable[[str, str, Dict[str, str], Optional[bytes]], Tuple[int, Any]]
+
+
+class StubUpstream:
+    """
+    Serveur HTTP/1.1 local (keep-alive) qui répond via `route`.
+    `latency` (secondes) ou `latency_fn()` simulent un upstream lent.
+    """
+
+    def __init__(self, route: Route, latency: float = 0.0,
+                 latency_fn: Optional[Callable[[], float]] = None, gzip_responses: bool = False):
+        self.route = route
+        self.gzip_responses = gzip_responses
+        self.latency = latency
+        self.latency_fn = latency_fn
+        self.requests = 0
+        self.connections = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self):
+                stub.requests += 1
+                delay = stub.latency_fn() if stub.latency_fn else stub.latency
+                if delay:
+                    time.sleep(delay)
+                u = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(u.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else None
+                status, payload = stub.route(self.command, u.path, query, body)
+                raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if stub.gzip_responses and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                    raw = gzip.compress(raw)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                try:
+                    self.wfile.write(raw)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # l'appelant a abandonné (timeout)
+
+            do_GET = _serve
+            do_POST = _serve
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class ApiGatewayServer:
+    """
+    Serveur HTTP/1.1 local qui joue API Gateway (REST, événements v1) devant des
+    handlers Lambda : routes = [("GET", "/products/{product_id}", handler), ...].
+    Les {params} du chemin vont dans pathParameters ; body base64 décodé en sortie.
+    `calls` compte les invocations par route ; wait_idle() attend la fin des requêtes
+    en cours (ex. un appelant parti en timeout pendant que le handler travaille).
+    """
+
+    def __init__(self, routes: List[Tuple[str, str, Callable[[dict, Any], dict]]]):
+        self.routes = [(m.upper(), tpl.strip("/").split("/"), tpl, fn) for m, tpl, fn in routes]
+        self.calls: Dict[str, int] = {}
+        self.inflight = 0
+        self._idle = threading.Condition()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def wait_idle(self, timeout: float = 60.0) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: self.inflight == 0, timeout)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def match(self, method: str, path: str):
+        parts = path.strip("/").split("/")
+        for m, segs, tpl, fn in self.routes:
+            if m != method or len(segs) != len(parts):
+                continue
+            params = {}
+            for seg, part in zip(segs, parts):
+                if seg.startswith("{") and seg.endswith("}"):
+                    params[seg[1:-1]] = part
+                elif seg != part:
+                    break
+            else:
+                return tpl, fn, params
+        return None
+
+    def event(self, method: str, path: str, tpl: str, params: Dict[str, str],
+              query: Dict[str, str], headers: Dict[str, str], body: Optional[bytes]) -> dict:
+        return {
+            "resource": tpl,
+            "path": path,
+            "httpMethod": method,
+            "headers": headers,
+            "queryStringParameters": query or None,
+            "pathParameters": params or None,
+            "body": body.decode("utf-8") if body else None,
+            "isBase64Encoded": False,
+            "requestContext": {"requestId": str(uuid.uuid4()), "httpMethod": method, "path": path},
+        }
+
+    def __enter__(self):
+        gw = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, headers: Dict[str, str], raw: bytes):
+                self.send_response(status)
+                for k, v in headers.items():
+                    if k.lower() != "content-length":
+                        self.send_header(k, v)
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                try:
+                    self.wfile.write(raw)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # l'appelant a abandonné (timeout)
+
+            def _serve(self):
+                with gw._idle:
+                    gw.inflight += 1
+                try:
+                    self._invoke()
+                finally:
+                    with gw._idle:
+                        gw.inflight -= 1
+                        gw._idle.notify_all()
+
+            def _invoke(self):
+                u = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else None
+                found = gw.match(self.command, u.path)
+                if not found:
+                    self._send(403, {"Content-Type": "application/json"}, b'{"message":"Missing Authentication Token"}')
+                    return
+                tpl, fn, params = found
+                with gw._idle:
+                    gw.calls[tpl] = gw.calls.get(tpl, 0) + 1
+                query = {k: v[-1] for k, v in parse_qs(u.query).items()}
+                try:
+                    res = fn(gw.event(self.command, u.path, tpl, params, query, dict(self.headers), body), None)
+                except Exception:
+                    # Lambda en erreur : API Gateway répond 502
+                    self._send(502, {"Content-Type": "application/json"}, b'{"message":"Internal server error"}')
+                    return
+                raw = res.get("body") or ""
+                raw = base64.b64decode(raw) if res.get("isBase64Encoded") else raw.encode("utf-8")
+                self._send(res["statusCode"], res.get("headers") or {}, raw)
+
+            do_GET = _serve
+            do_POST = _serve
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class SyntheticSite:
+    """
+    Site "cidgroupe.com" synthétique servi en local (HTML), pour le crawler du seeder.
+
+    4 familles (ALLOWED_PREFIXES) x `subs` gammes x `products` produits, chaque produit
+    ayant une fiche technique (profondeur 3). Chaque page porte la navigation, un fil
+    d'Ariane, ses enfants, quelques voisins, des liens à ignorer (contact, assets, mailto,
+    fonts, www./slash final/#fragment) et parfois un lien mort (404).
+
+    `flaky` : part des pages qui répondent 503 à leur première requête.
+    ETag (hash du contenu) + Last-Modified : requêtes conditionnelles -> 304.
+    Les URLs publiques restent https://cidgroupe.com/... : le crawler réécrit l'hôte
+    via `fetch_fn` (cf. `fetch_url`).
+    """
+
+    TOPS = ("adblue", "engrais", "granules-de-bois", "produits-chimiques")
+
+    def __init__(self, subs: int = 6, products: int = 30, latency: float = 0.0, flaky: float = 0.0):
+        self.latency = latency
+        self.flaky = flaky
+        self.pages: Dict[str, str] = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._failed_once: set = set()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._build(subs, products)
+
+    def _page(self, path: str, title: str, links: List[str]) -> None:
+        nav = "".join(f'<li><a href="https://cidgroupe.com/{t}">{t}</a></li>' for t in self.TOPS)
+        noise = (
+            '<link rel="stylesheet" href="/assets/site.css">'
+            '<link href="//fonts.gstatic.com/s/roboto.woff2" rel="preload">'
+            '<a href="/contact">Contact</a> <a href="/mentions-legales">Mentions</a>'
+            '<a href="mailto:info@cidgroupe.com">Mail</a> <a href="tel:+33100000000">Tel</a>'
+            '<a href="https://www.facebook.com/cidgroupe">fb</a>'
+            '<img src="/media/logo.png">'
+        )
+        body = "".join(f'<li><a href="{h}">{h.rsplit("/", 1)[-1]}</a></li>' for h in links)
+        filler = "<p>" + "Lorem ipsum dolor sit amet, engrais et granulés. " * 40 + "</p>"
+        self.pages[path] = (
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+            f"<title>\n  {title} | CID Groupe\n</title>{noise}</head>"
+            f"<body><nav><ul>{nav}</ul></nav><main><h1>{title}</h1>{filler}<ul>{body}</ul></main></body></html>"
+        )
+
+    def _build(self, subs: int, products: int) -> None:
+        for t, top in enumerate(self.TOPS):
+            sub_paths = [f"/{top}/gamme-{s}" for s in range(subs)]
+            self._page(f"/{top}", f"Famille {top} &amp; services", sub_paths + [f"/{top}/gamme-{subs}"])
+            for s, sub in enumerate(sub_paths):
+                prods = [f"{sub}/produit-{s}-{p}" for p in range(products)]
+                # variantes d'écriture d'une même URL (www, slash final, fragment)
+                links = [f"https://www.cidgroupe.com{prods[0]}/", f"{prods[-1]}#avis", f"/{top}"]
+                self._page(sub, f"Gamme {t}.{s}", prods + links)
+                for p, prod in enumerate(prods):
+                    neighbours = prods[max(0, p - 2):p] + [f"{prod}/fiche-technique", sub]
+                    self._page(prod, f"Produit {t}.{s}.{p}", neighbours)
+                    self._page(f"{prod}/fiche-technique", f"Fiche {t}.{s}.{p}", [prod, f"{prod}/fiche-technique/pdf"])
+
+    def _flaky(self, path: str) -> bool:
+        if not self.flaky:
+            return False
+        h = int(hashlib.sha1(path.encode("utf-8")).hexdigest()[:8], 16)
+        return h / 0xFFFFFFFF < self.flaky
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fetch_url(self, url: str) -> str:
+        """URL publique https://cidgroupe.com/... -> URL du serveur local."""
+        return url.replace("https://cidgroupe.com", self.base_url, 1)
+
+    def __enter__(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                with site._lock:
+                    site.requests += 1
+                    fail = site._flaky(path) and path not in site._failed_once
+                    if fail:
+                        site._failed_once.add(path)
+                if site.latency:
+                    time.sleep(site.latency)
+                page = site.pages.get(path)
+                status = 503 if fail else (200 if page is not None else 404)
+                raw = (page if status == 200 else "<html><title>Erreur</title></html>").encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(raw).hexdigest()[:16]
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    status, raw = 304, b""
+                    with site._lock:
+                        site.not_modified += 1
+                self.send_response(status)
+                if status in (200, 304):
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", "Mon, 05 Oct 2026 08:00:00 GMT")
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+                with site._lock:
+                    site.bytes_sent += len(raw)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def synthetic_catalog(n_products: int, n_top: int = 4, per_top: int = 10) -> Tuple[List[dict], List[dict]]:
+    """
+    Catalogue synthétique au format products-service (comme seed_cid_products.py).
+    Renvoie (categories, products).
+    """
+    categories: List[dict] = []
+    products: List[dict] = []
+    subs: List[Tuple[str, str, str]] = []
+
+    for t in range(n_top):
+        top = f"famille-{t}"
+        categories.append({
+            "product_id": f"{top}__{t:08x}",
+            "type": "category",
+            "level": 1,
+            "name": f"Famille {t}",
+            "category": top,
+            "source_url": f"https://cidgroupe.com/{top}",
+            "active": True,
+        })
+        for s in range(per_top):
+            sub = f"gamme-{s}"
+            sid = f"{top}__{sub}__{t:04x}{s:04x}"
+            categories.append({
+                "product_id": sid,
+                "type": "category",
+                "level": 2,
+                "name": f"Gamme {t}.{s}",
+                "category": top,
+                "parent_id": top,
+                "source_url": f"https://cidgroupe.com/{top}/{sub}",
+                "active": True,
+            })
+            subs.append((top, sub, sid))
+
+    for i in range(n_products):
+        top, sub, sid = subs[(i * 7919) % len(subs)]
+        leaf = f"produit-{i}"
+        # parent_id au format seeder ("<top>__<slug>") -> rattachement par URL ;
+        # une partie matche directement un id, quelques orphelins
+        parent = sid if i % 7 == 0 else f"{top}__{sub}"
+        url = f"https://cidgroupe.com/{top}/{sub}/{leaf}"
+        if i % 50 == 49:
+            url = f"https://cidgroupe.com/inconnu/{leaf}"
+        elif i % 11 == 0:
+            url = f"https://www.cidgroupe.com/{top}/{leaf}"  # niveau 1 seulement
+        products.append({
+            "product_id": f"{top}__{leaf}__{i:08x}",
+            "type": "product",
+            "level": 3,
+            "name": f"Produit {(i * 31) % n_products:06d}",
+            "category": top,
+            "parent_id": parent,
+            "source_url": url,
+            "active": True,
+        })
+
+    return categories, products
+
+
+def set_default_env() -> None:
+    os.environ.setdefault("PRODUCTS_BASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("CONTACT_BASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("PRODUCTS_TABLE", "cid-ms-products")
+    os.environ.setdefault("CONTACTS_TABLE", "cid-ms-contacts")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-3")
+
+
+def create_products_table(dynamodb, name: str = "cid-ms-products"):
+    """Même schéma que services/products/template.yaml (table + GSI)."""
+    def gsi(attr):
+        return {
+            "IndexName": f"{attr}-index",
+            "KeySchema": [
+                {"AttributeName": attr, "KeyType": "HASH"},
+                {"AttributeName": "product_id", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+        }
+
+    return dynamodb.create_table(
+        TableName=name,
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[
+            {"AttributeName": a, "AttributeType": "S"}
+            for a in ("product_id", "type", "parent_id", "category")
+        ],
+        KeySchema=[{"AttributeName": "product_id", "KeyType": "HASH"}],
+        GlobalSecondaryIndexes=[gsi("type"), gsi("parent_id"), gsi("category")],
+    )
+
+
+def seed_products_table(table, items: List[dict]) -> None:
+    from decimal import Decimal
+
+    with table.batch_writer() as bw:
+        for it in items:
+            it = dict(it)
+            if "level" in it:
+                it["level"] = Decimal(it["level"])
+            bw.put_item(Item=it)
+
+
+def typed_item(item: dict) -> dict:
+    """Item JSON -> format DynamoDB, comme le construit le seeder."""
+    out = {}
+    for k, v in item.items():
+        if isinstance(v, bool):
+            out[k] = {"BOOL": v}
+        elif isinstance(v, int):
+            out[k] = {"N": str(v)}
+        else:
+            out[k] = {"S": v}
+    return out
+
+
+def item_size(item: dict) -> int:
+    """Taille DynamoDB approximative d'un item (noms + valeurs)."""
+    size = 0
+    for k, v in item.items():
+        size += len(k.encode("utf-8"))
+        if isinstance(v, str):
+            size += len(v.encode("utf-8"))
+        elif isinstance(v, bool):
+            size += 1
+        else:
+            size += len(str(v)) // 2 + 1
+    return size
+
+
+def read_capacity_units(items_read: List[dict]) -> float:
+    """RCU d'un Scan/Query (lecture eventually consistent) : 0.5 par 4 Ko lus."""
+    total = sum(item_size(it) for it in items_read)
+    return 0.5 * -(-total // 4096)
@@ -0,0 +1,371 @@
+"""
+Suite de bout en bout : toutes les routes du BFF et des services, par taille de catalogue.
+
+- DynamoDB : moto in-process (mock_aws), table produits au schéma du template
+- products-service / contact-service : vrais handlers derrière un serveur HTTP local
+  qui joue API Gateway (common.ApiGatewayServer) ; le BFF les appelle en HTTP
+- BFF : handler appelé avec des événements API Gateway synthétiques
+
+Par route et par taille : débit, p50/p95/p99, pic mémoire (tracemalloc, une requête
+dédiée ; inclut le travail des handlers upstream, qui tournent dans ce process) et
+capacité DynamoDB par requête.
+
+La capacité est estimée à partir des tailles d'items (moto renvoie des
+ConsumedCapacity fixes) : lecture eventually consistent 0.5 RCU / 4 Ko d'items
+lus - items complets, y compris ceux écartés par un filtre -, écriture 1 WCU / 1 Ko.
+
+Résultats en JSON (--out) ; --compare compare à un fichier précédent et sort en
+erreur si une route régresse au-delà de --threshold.
+
+    pip install boto3 moto
+    python benchmarks/run_suite.py --sizes 1000,10000 --out suite.json
+    python benchmarks/run_suite.py --sizes 1000,10000 --compare suite.json
+    python benchmarks/run_suite.py --sizes 100000 --route-budget 120   # long (moto ~1 ms/item)
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from common import (ROOT, ApiGatewayServer, create_products_table, item_size, percentile,
+                    seed_products_table, set_default_env, synthetic_catalog)
+
+# métriques comparées par --compare : (clé, True si plus haut = mieux)
+COMPARED = (("p50_ms", False), ("p95_ms", False), ("throughput_rps", True),
+            ("peak_alloc_kb", False), ("rcu_per_request", False), ("wcu_per_request", False))
+
+
+def _plain(v: Any) -> Any:
+    """Valeur d'attribut, au format "wire" ({"S": ...}) ou déjà désérialisée (resource)."""
+    if isinstance(v, dict) and len(v) == 1:
+        return next(iter(v.values()))
+    return v
+
+
+def _wire_size(item: Dict[str, Any]) -> int:
+    size = 0
+    for k, v in item.items():
+        size += len(k.encode("utf-8"))
+        v = _plain(v)
+        size += len(v.encode("utf-8")) if isinstance(v, str) else len(str(v))
+    return size
+
+
+class CapacityMeter:
+    """
+    RCU / WCU estimés de chaque appel DynamoDB du process (tous clients botocore,
+    y compris ceux créés par les handlers), cumulés jusqu'au prochain take().
+    """
+
+    def __init__(self, sizes: Dict[str, int]):
+        self.sizes = sizes
+        self.avg = sum(sizes.values()) / len(sizes) if sizes else 0
+        self.rcu = self.wcu = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._orig: Optional[Callable] = None
+
+    def _read_units(self, size: float) -> float:
+        return 0.5 * max(1, math.ceil(size / 4096))
+
+    def _record(self, op: str, params: Dict[str, Any], resp: Dict[str, Any]) -> None:
+        rcu = wcu = 0.0
+        if op == "GetItem":
+            rcu = self._read_units(self.sizes.get(_plain(params["Key"]["product_id"]), 0))
+        elif op == "BatchGetItem":
+            unprocessed = resp.get("UnprocessedKeys") or {}
+            for table, req in params["RequestItems"].items():
+                skipped = len((unprocessed.get(table) or {}).get("Keys") or [])
+                for key in req["Keys"][:len(req["Keys"]) - skipped]:
+                    rcu += self._read_units(self.sizes.get(_plain(key.get("product_id")), 0))
+        elif op in ("Scan", "Query"):
+            items = resp.get("Items") or []
+            known = sum(self.sizes.get(_plain(it.get("product_id")), self.avg) for it in items)
+            filtered = max(0, resp.get("ScannedCount", len(items)) - len(items))
+            rcu = self._read_units(known + filtered * self.avg)
+        elif op == "PutItem":
+            wcu = math.ceil(_wire_size(params["Item"]) / 1024)
+        elif op == "BatchWriteItem":
+            for reqs in params["RequestItems"].values():
+                for r in reqs:
+                    wcu += math.ceil(_wire_size(r["PutRequest"]["Item"]) / 1024) if "PutRequest" in r else 1
+        with self._lock:
+            self.rcu += rcu
+            self.wcu += wcu
+            self.calls += 1
+
+    def install(self) -> None:
+        from botocore.client import BaseClient
+
+        meter = self
+        self._orig = orig = BaseClient._make_api_call
+
+        def _make_api_call(client, operation_name, api_params):
+            resp = orig(client, operation_name, api_params)
+            if client.meta.service_model.service_name == "dynamodb":
+                meter._record(operation_name, api_params, resp)
+            return resp
+
+        BaseClient._make_api_call = _make_api_call
+
+    def uninstall(self) -> None:
+        from botocore.client import BaseClient
+
+        BaseClient._make_api_call = self._orig
+
+    def take(self):
+        with self._lock:
+            out = (self.rcu, self.wcu, self.calls)
+            self.rcu = self.wcu = 0.0
+            self.calls = 0
+        return out
+
+
+def bench_route(name: str, call: Callable[[int], dict], meter: CapacityMeter, settle: Callable[[], Any],
+                requests: int, budget: float, concurrency: int) -> Dict[str, Any]:
+    """
+    Appels répétés de `call(i)` -> statistiques de la route.
+    `settle()` attend que les upstreams n'aient plus de requête en cours.
+    """
+    gc.collect()  # pas de déchets des routes précédentes dans les mesures
+    call(0)  # chauffe (clients, pools de connexions)
+    settle()
+    meter.take()
+
+    samples: List[float] = []
+    statuses: Dict[int, int] = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + budget
+
+    def one(i: int):
+        if i >= 3 and time.monotonic() > deadline:
+            return
+        t0 = time.perf_counter()
+        res = call(i)
+        dt = time.perf_counter() - t0
+        with lock:
+            samples.append(dt)
+            statuses[res["statusCode"]] = statuses.get(res["statusCode"], 0) + 1
+
+    t0 = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(1, requests + 1)))
+    else:
+        for i in range(1, requests + 1):
+            one(i)
+    wall = time.perf_counter() - t0
+    settle()
+    rcu, wcu, calls = meter.take()
+
+    # pic mémoire : une requête à part (tracemalloc ralentit tout, l'appel peut
+    # dépasser les timeouts du BFF : on attend que les upstreams aient fini)
+    tracemalloc.start()
+    peak_status = call(requests + 1)["statusCode"]
+    settle()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    meter.take()
+
+    n = len(samples)
+    return {
+        "route": name,
+        "requests": n,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "errors": sum(v for k, v in statuses.items() if k >= 500),
+        "throughput_rps": round(n / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "peak_status": peak_status,
+        "rcu_per_request": round(rcu / n, 2) if n else 0.0,
+        "wcu_per_request": round(wcu / n, 2) if n else 0.0,
+        "dynamodb_calls_per_request": round(calls / n, 2) if n else 0.0,
+    }
+
+
+def contact_body(i: int) -> str:
+    return json.dumps({"name": f"Client {i}", "email": f"client{i}@example.com", "phone": "0600000000",
+                       "subject": "Devis", "message": "Bonjour, je souhaite un devis. " * 8,
+                       "product_id": "", "source": "bench"})
+
+
+def run_size(n: int, args, apps) -> List[Dict[str, Any]]:
+    from moto import mock_aws
+
+    bff, products, contact = apps
+    categories, items = synthetic_catalog(n)
+    catalog = categories + items
+    rng = random.Random(n)
+    ids = [it["product_id"] for it in rng.sample(items, min(len(items), 200))]
+
+    with mock_aws():
+        import boto3
+
+        ddb = boto3.resource("dynamodb")
+        t0 = time.perf_counter()
+        seed_products_table(create_products_table(ddb, os.environ["PRODUCTS_TABLE"]), catalog)
+        ddb.create_table(TableName=os.environ["CONTACTS_TABLE"], BillingMode="PAY_PER_REQUEST",
+                         KeySchema=[{"AttributeName": "contact_id", "KeyType": "HASH"}],
+                         AttributeDefinitions=[{"AttributeName": "contact_id", "AttributeType": "S"}])
+        print(json.dumps({"size": n, "items": len(catalog), "seed_s": round(time.perf_counter() - t0, 1)}),
+              file=sys.stderr)
+
+        # clients boto3 recréés dans le mock
+        products._client = products._table = None
+        contact._client = None
+
+        meter = CapacityMeter({it["product_id"]: item_size(it) for it in catalog})
+        meter.install()
+        gateway = ApiGatewayServer([
+            ("GET", "/products", products.handler),
+            ("GET", "/products/{product_id}", products.handler),
+            ("POST", "/contacts", contact.handler),
+        ])
+        try:
+            with gateway:
+                bff.PRODUCTS_BASE = bff.CONTACT_BASE = gateway.base_url
+                headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+
+                def bff_get(path, params=None):
+                    return lambda i: bff.handler({"httpMethod": "GET", "path": path, "headers": headers,
+                                                  "pathParameters": params(i) if params else None}, None)
+
+                def direct(fn, event):
+                    return lambda i: fn(dict(event(i), headers=headers), None)
+
+                routes = {
+                    "bff GET /api/catalog": bff_get("/api/catalog"),
+                    "bff GET /api/products": bff_get("/api/products"),
+                    "bff GET /api/products/{id}": bff_get(
+                        "/api/products/x", lambda i: {"product_id": ids[i % len(ids)]}),
+                    "bff POST /api/contact": lambda i: bff.handler(
+                        {"httpMethod": "POST", "path": "/api/contact", "headers": headers,
+                         "body": contact_body(i)}, None),
+                    "products GET /products?type=product": direct(
+                        products.handler, lambda i: {"httpMethod": "GET", "path": "/products",
+                                                     "queryStringParameters": {"type": "product"}}),
+                    "products GET /products/{id}": direct(
+                        products.handler, lambda i: {"httpMethod": "GET", "path": "/products/x",
+                                                     "pathParameters": {"product_id": ids[i % len(ids)]}}),
+                    "contact POST /contacts": direct(
+                        contact.handler, lambda i: {"httpMethod": "POST", "path": "/contacts",
+                                                    "body": contact_body(i)}),
+                }
+                selected = [r for r in routes if not args.routes or any(s in r for s in args.routes.split(","))]
+                out = []
+                for name in selected:
+                    line = dict(bench_route(name, routes[name], meter, gateway.wait_idle, args.requests,
+                                            args.route_budget, args.concurrency), size=n)
+                    print(json.dumps(line, ensure_ascii=False), file=sys.stderr)
+                    out.append(line)
+                return out
+        finally:
+            meter.uninstall()
+
+
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> List[str]:
+    """Lignes de comparaison ; les régressions au-delà du seuil sont préfixées par "REGRESSION"."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["size"], r["route"]): r for r in json.load(f)["results"]}
+    lines = []
+    for r in results:
+        old = baseline.get((r["size"], r["route"]))
+        if not old:
+            lines.append(f"new      {r['size']:>7} {r['route']}")
+            continue
+        for key, higher_is_better in COMPARED:
+            a, b = old.get(key), r.get(key)
+            if not a or b is None:
+                continue
+            delta = (b - a) / a * 100
+            worse = -delta if higher_is_better else delta
+            tag = "REGRESSION" if worse > threshold else "ok"
+            lines.append(f"{tag:<10} {r['size']:>7} {r['route']:<38} {key:<24} {a:>12} -> {b:<12} ({delta:+.1f}%)")
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000", help="tailles de catalogue (produits), ex. 1000,10000,100000")
+    ap.add_argument("--requests", type=int, default=20, help="requêtes mesurées par route")
+    ap.add_argument("--route-budget", type=float, default=30.0,
+                    help="secondes max par route (au moins 3 requêtes mesurées)")
+    ap.add_argument("--concurrency", type=int, default=1, help="requêtes simultanées par route")
+    ap.add_argument("--routes", help="sous-ensemble (sous-chaînes séparées par des virgules)")
+    ap.add_argument("--gzip", action="store_true", help="Accept-Encoding: gzip sur les requêtes")
+    ap.add_argument("--catalog-cache", action="store_true",
+                    help="garde le cache /api/catalog du BFF (par défaut désactivé : chemin complet mesuré)")
+    ap.add_argument("--detail-cache", action="store_true",
+                    help="garde les caches de détails produit (BFF et products-service ; par défaut désactivés)")
+    ap.add_argument("--upstream-timeout", type=float, default=600.0,
+                    help="délai BFF -> upstreams (s), large par défaut à cause de moto")
+    ap.add_argument("--out", metavar="PATH", help="écrit les résultats (JSON)")
+    ap.add_argument("--compare", metavar="PATH", help="résultats de référence (JSON d'un run précédent)")
+    ap.add_argument("--threshold", type=float, default=20.0, help="%% de dégradation toléré par --compare")
+    args = ap.parse_args()
+
+    set_default_env()
+    os.environ.update(AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing", CATALOG_SNAPSHOT="")
+    if not args.catalog_cache:
+        os.environ["BFF_CATALOG_CACHE_TTL"] = "0"
+    if not args.detail_cache:
+        os.environ["BFF_DETAIL_CACHE_TTL"] = "0"
+        os.environ["PRODUCTS_DETAIL_CACHE_TTL"] = "0"
+    # moto est ~100x plus lent que DynamoDB (et tracemalloc ralentit encore) :
+    # les délais du BFF pensés pour la prod couperaient les grosses listes
+    os.environ["BFF_PAGINATION_DEADLINE"] = str(args.upstream_timeout)
+
+    from bff import app as bff
+    from contact import app as contact
+    from products import app as products
+
+    bff.UPSTREAM_TIMEOUT = args.upstream_timeout
+
+    results: List[Dict[str, Any]] = []
+    for n in (int(x) for x in args.sizes.split(",")):
+        results.extend(run_size(n, args, (bff, products, contact)))
+
+    report = {
+        "meta": {
+            "git_rev": git_rev(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    print(json.dumps(report, ensure_ascii=False))
+
+    if args.compare:
+        lines = compare(results, args.compare, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        if any(line.startswith("REGRESSION") for line in lines):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
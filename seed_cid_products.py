@@ -1,8 +1,19 @@
+import argparse
+import base64
+import codecs
+import gzip
 import json
+import os
+import random
 import re
-import subprocess
 import hashlib
-from collections import deque
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.error import HTTPError
 from urllib.parse import urljoin, urlparse
 from urllib.request import Request, urlopen
 import html
@@ -30,9 +41,76 @@ ALLOWED_PREFIXES = (
     "/adblue", "/engrais", "/granules-de-bois", "/produits-chimiques"
 )
 
-def fetch(url: str) -> str:
-    req = Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    return urlopen(req, timeout=20).read().decode("utf-8", errors="ignore")
+def http_open(url: str, headers=None):
+    """
+    GET -> (status, réponse à lire par morceaux puis fermer | None, headers).
+    304 renvoyé tel quel (sans body), autres erreurs HTTP levées.
+    """
+    req = Request(url, headers=dict({"User-Agent": "Mozilla/5.0"}, **(headers or {})))
+    try:
+        r = urlopen(req, timeout=20)
+    except HTTPError as e:
+        if e.code == 304:
+            e.close()
+            return 304, None, e.headers
+        raise
+    return r.status, r, r.headers
+
+class HostThrottle:
+    """
+    Limite par hôte pour le crawl concurrent :
+    - au plus `per_host` requêtes en vol
+    - au moins `interval` secondes entre deux départs
+    L'intervalle s'adapte : doublé (au moins `first_backoff`) après une réponse
+    lente ou en erreur, divisé par 2 après une réponse normale (jamais sous `min_interval`).
+    """
+
+    def __init__(self, per_host=4, min_interval=0.0, max_interval=10.0, slow_after=5.0, first_backoff=0.1):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.first_backoff = first_backoff
+        self.max_interval = max_interval
+        self.slow_after = slow_after
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host):
+        with self._lock:
+            st = self._hosts.get(host)
+            if st is None:
+                st = self._hosts[host] = {
+                    "sem": threading.BoundedSemaphore(self.per_host),
+                    "interval": self.min_interval, "next_at": 0.0,
+                    "requests": 0, "errors": 0, "slow": 0,
+                }
+            return st
+
+    def acquire(self, host):
+        st = self._host(host)
+        st["sem"].acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, st["next_at"])
+            st["next_at"] = start + st["interval"]
+            st["requests"] += 1
+        if start > now:
+            time.sleep(start - now)
+        return st
+
+    def release(self, st, elapsed: float, ok: bool):
+        with self._lock:
+            if not ok or elapsed > self.slow_after:
+                st["errors" if not ok else "slow"] += 1
+                st["interval"] = min(self.max_interval, max(st["interval"] * 2, self.first_backoff))
+            elif st["interval"] > self.min_interval:
+                half = st["interval"] / 2
+                st["interval"] = half if half > max(self.min_interval, self.first_backoff / 8) else self.min_interval
+        st["sem"].release()
+
+    def stats(self):
+        with self._lock:
+            return {h: {k: (round(v, 3) if k == "interval" else v) for k, v in st.items() if k not in ("sem", "next_at")}
+                    for h, st in self._hosts.items()}
 
 def normalize(url: str) -> str:
     # decode &lt; &gt; etc.
@@ -97,51 +175,294 @@ def should_skip(url: str) -> bool:
 
     return False
 
+@lru_cache(maxsize=65536)
+def _link_for(base_url: str, href: str):
+    """Un href -> lien normalisé, ou None s'il est ignoré (mêmes règles qu'avant)."""
+    raw = href.strip()
+
+    # ignore protocol-relative and external font/cdn links early
+    low = raw.lower()
+    if low.startswith(("mailto:", "tel:", "javascript:")):
+        return None
+    if low.startswith("//"):             # ex: //fonts.gstatic.com/...
+        return None
+    if "gstatic.com" in low or "fonts." in low:
+        return None
+
+    link = normalize(urljoin(base_url, raw))
+
+    if should_skip(link):
+        return None
+    return link
+
+def link_for(base_url: str, href: str):
+    # clé de mémoïsation la plus large possible : un lien absolu ne dépend pas de la
+    # page, un lien "/..." seulement de son origine (nav et pied de page répétés partout)
+    low = href[:8].lower()
+    if low.startswith(("http://", "https://")):
+        return _link_for("", href)
+    if href.startswith("/") and not href.startswith("//"):
+        cut = base_url.find("/", base_url.find("//") + 2)
+        return _link_for(base_url if cut < 0 else base_url[:cut], href)
+    return _link_for(base_url, href)
+
+HREF_RE = re.compile(r'href=["\']([^"\']+)["\']', re.IGNORECASE)
+# début de href="... coupé par la fin d'un morceau : à garder pour le morceau suivant
+HREF_TAIL_RE = re.compile(r'h(?:r(?:e(?:f(?:=(?:["\'][^"\']*)?)?)?)?)?\Z', re.IGNORECASE)
+TITLE_RE = re.compile(r"<title>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
 def extract_links(html_str: str, base_url: str):
-    hrefs = re.findall(r'href=["\']([^"\']+)["\']', html_str, flags=re.IGNORECASE)
     out = []
-    for h in hrefs:
-        if not h:
-            continue
-
-        raw = h.strip()
-
-        # ignore protocol-relative and external font/cdn links early
-        low = raw.lower()
-        if low.startswith(("mailto:", "tel:", "javascript:")):
-            continue
-        if low.startswith("//"):             # ex: //fonts.gstatic.com/...
-            continue
-        if "gstatic.com" in low or "fonts." in low:
-            continue
+    for m in HREF_RE.finditer(html_str):
+        link = link_for(base_url, m.group(1))
+        if link is not None:
+            out.append(link)
+    return out
 
-        link = normalize(urljoin(base_url, raw))
+def clean_title(raw: str, url: str) -> str:
+    title = re.sub(r"\s+", " ", raw).strip()
 
-        if should_skip(link):
-            continue
+    # ✅ Convertit &amp; &quot; &#039; etc. en vrais caractères
+    title = html.unescape(title)
 
-        out.append(link)
-    return out
+    # Retire le suffixe " | CID Groupe"
+    title = re.sub(r"\s*\|\s*CID Groupe.*$", "", title).strip()
 
-def get_title(url: str) -> str:
-    try:
-        page_html = fetch(url)
-    except Exception:
-        return url
+    return title or url
 
-    m = re.search(r"<title>(.*?)</title>", page_html, re.IGNORECASE | re.DOTALL)
+def parse_title(page_html: str, url: str) -> str:
+    m = TITLE_RE.search(page_html)
     if not m:
         return url
+    return clean_title(m.group(1), url)
 
-    title = re.sub(r"\s+", " ", m.group(1)).strip()
+class HtmlExtractor:
+    """
+    Titre + liens en un seul passage, au fil des morceaux de la réponse
+    (mêmes résultats que parse_title / extract_links sur la page entière).
+    want_links=False : feed() renvoie False dès que le titre est connu,
+    l'appelant peut arrêter de lire.
+    """
 
-    # ✅ Convertit &amp; &quot; &#039; etc. en vrais caractères
-    title = html.unescape(title)
+    def __init__(self, base_url: str, want_links: bool = True):
+        self.base_url = base_url
+        self.want_links = want_links
+        self.links = []
+        self._title_raw = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._head = ""   # texte lu tant que le titre n'est pas trouvé
+        self._tail = ""   # href="... incomplet en fin de morceau
+
+    @property
+    def title(self) -> str:
+        return self.base_url if self._title_raw is None else clean_title(self._title_raw, self.base_url)
+
+    def feed(self, data: bytes) -> bool:
+        self._consume(self._decoder.decode(data))
+        return self.want_links or self._title_raw is None
+
+    def close(self):
+        self._consume(self._decoder.decode(b"", final=True))
+        self._head = self._tail = ""
+
+    def _consume(self, text: str):
+        if not text:
+            return
+
+        if self._title_raw is None:
+            # regex relancée seulement quand une balise fermante vient d'arriver
+            start = max(0, len(self._head) - 7)
+            self._head += text
+            if "</title>" in self._head[start:].lower():
+                m = TITLE_RE.search(self._head)
+                if m:
+                    self._title_raw = m.group(1)
+                    self._head = ""
+
+        if self.want_links:
+            buf = self._tail + text
+            end = 0
+            for m in HREF_RE.finditer(buf):
+                link = link_for(self.base_url, m.group(1))
+                if link is not None:
+                    self.links.append(link)
+                end = m.end()
+            t = HREF_TAIL_RE.search(buf, end)
+            self._tail = buf[t.start():] if t else ""
+
+# version du contenu des entrées du cache disque : à incrémenter si
+# extract_links / parse_title changent (les titres / liens stockés seraient faux)
+PAGE_CACHE_FORMAT = 2
+
+# lecture de la réponse par morceaux (HtmlExtractor)
+FETCH_CHUNK = 16 * 1024
+
+class PageFetcher:
+    """
+    Couche de téléchargement du seeder :
+    - chaque page est téléchargée au plus une fois par run ; titre et liens sont
+      extraits du même body (pas de second téléchargement pour le titre, pas de nouvel
+      essai d'une page en échec pendant le crawl)
+    - réponse lue par morceaux et analysée au fil de l'eau (HtmlExtractor) ; pour
+      un titre seul la lecture s'arrête à </title>
+    - cache disque optionnel (ETag / Last-Modified + titre et liens extraits) :
+      requêtes conditionnelles au reseed suivant, une 304 réutilise l'extraction
+    - erreurs transitoires (timeout, 429, 5xx) rejouées sous le contrôle de `throttle`
+    """
 
-    # Retire le suffixe " | CID Groupe"
-    title = re.sub(r"\s*\|\s*CID Groupe.*$", "", title).strip()
+    def __init__(self, cache_path=None, throttle=None, retries=2, get_fn=None):
+        self.cache_path = cache_path
+        self.throttle = throttle or HostThrottle()
+        self.retries = retries
+        self.get_fn = get_fn or http_open
+        self._lock = threading.Lock()
+        self._pages = {}    # url -> {"title", "links"} | None (échec), pour ce run
+        self._stored = self._load_cache()
+        self._touched = {}  # entrées à réécrire (seulement les URLs vues dans ce run)
+        self.stats = {"fetched": 0, "not_modified": 0, "errors": 0, "bytes_downloaded": 0, "bytes_saved": 0}
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("format") != PAGE_CACHE_FORMAT:
+            return {}
+        return data.get("pages") or {}
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self._lock:
+            # appelé aussi pendant le crawl (checkpoint) : copie sous verrou
+            data = {"format": PAGE_CACHE_FORMAT, "pages": dict(self._touched)}
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.cache_path)
+
+    def _count(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self.stats[k] += v
+
+    def _usable(self, cached, links: bool) -> bool:
+        # une entrée "titre seul" (links None) ne suffit pas quand on veut les liens
+        return bool(cached) and (not links or cached.get("links") is not None)
+
+    def _read(self, url: str, status, stream, links: bool):
+        """Lit la réponse par morceaux -> (extracteur, octets lus, lue jusqu'au bout)."""
+        ex = HtmlExtractor(url, want_links=links)
+        size, complete = 0, True
+        try:
+            while True:
+                chunk = stream.read(FETCH_CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if not ex.feed(chunk):
+                    complete = False   # titre seul trouvé : le reste n'est pas lu
+                    break
+        finally:
+            stream.close()
+        ex.close()
+        return ex, size, complete
+
+    def _download(self, url: str, links: bool):
+        """-> (status, extracteur | None, headers, octets lus) ou None si la page est perdue."""
+        cached = self._stored.get(url)
+        headers = {}
+        if self._usable(cached, links):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
 
-    return title or url
+        host = urlparse(url).netloc.lower()
+        for attempt in range(self.retries + 1):
+            st = self.throttle.acquire(host)
+            t0 = time.monotonic()
+            try:
+                status, stream, resp_headers = self.get_fn(url, headers)
+                # le body est lu dans la même tentative : une coupure en cours de
+                # lecture est rejouée comme un timeout
+                ex, size = None, 0
+                if stream is not None:
+                    ex, size, _ = self._read(url, status, stream, links)
+            except HTTPError as e:
+                # 404 & co : page absente, l'hôte va bien -> pas de ralentissement
+                transient = e.code == 429 or e.code >= 500
+                self.throttle.release(st, time.monotonic() - t0, ok=not transient)
+                if not transient:
+                    return None
+            except Exception:
+                self.throttle.release(st, time.monotonic() - t0, ok=False)
+            except BaseException:
+                # arrêt (Ctrl-C, SystemExit) : rendre le créneau de l'hôte aux autres threads
+                self.throttle.release(st, time.monotonic() - t0, ok=True)
+                raise
+            else:
+                self.throttle.release(st, time.monotonic() - t0, ok=True)
+                return status, ex, resp_headers, size
+            if attempt < self.retries:
+                time.sleep(random.uniform(0, st["interval"] or 0.1))
+        return None
+
+    def get(self, url: str, links: bool = True):
+        """
+        {"title", "links"} de la page, ou None si elle n'a pas pu être lue.
+        links=False : seul le titre est voulu, la lecture s'arrête après </title>
+        ("links" vaut alors None si la page n'a pas déjà été lue en entier).
+        """
+        with self._lock:
+            page = self._pages.get(url, False)
+            if page is None or (page and (not links or page["links"] is not None)):
+                return page
+
+        res = self._download(url, links)
+        page = entry = None
+        if res is None:
+            self._count(errors=1)
+            # échec ponctuel : on garde les validateurs pour le prochain reseed
+            entry = self._stored.get(url)
+        else:
+            status, ex, headers, size = res
+            cached = self._stored.get(url)
+            if status == 304 and self._usable(cached, links):
+                entry = dict(cached)
+                self._count(not_modified=1, bytes_saved=cached.get("size", 0))
+            else:
+                entry = {
+                    "etag": headers.get("ETag"),
+                    "last_modified": headers.get("Last-Modified"),
+                    # octets à relire pour refaire cette extraction (toute la page si liens)
+                    "size": size,
+                    "title": ex.title if ex else url,
+                    "links": ex.links if (ex and links) else None,
+                }
+                self._count(fetched=1, bytes_downloaded=size)
+
+        if res is not None:
+            page = {"title": entry["title"], "links": entry["links"]}
+
+        with self._lock:
+            self._pages[url] = page
+            if entry is not None:
+                self._touched[url] = entry
+        return page
+
+    def title(self, url: str) -> str:
+        page = self.get(url, links=False)
+        return page["title"] if page else url
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"pages: {s['fetched']} downloaded, {s['not_modified']} not modified (cache), "
+                f"{s['errors']} errors; {s['bytes_downloaded']} bytes downloaded, "
+                f"{s['bytes_saved']} bytes saved by the cache")
 
 def path_parts(url: str):
     p = urlparse(url).path.strip("/")
@@ -204,56 +525,169 @@ def make_id(url: str) -> str:
 
     return f"{base}__{short_hash(url)}"
 
-def batch_write(items):
-    for i in range(0, len(items), 25):
-        chunk = items[i:i+25]
-        payload = {TABLE: [{"PutRequest": {"Item": it}} for it in chunk]}
-        p = subprocess.run(
-            ["aws", "dynamodb", "batch-write-item", "--request-items", json.dumps(payload)],
-            capture_output=True, text=True
-        )
-        if p.returncode != 0:
-            print("Batch error:", p.stderr.strip())
-            raise SystemExit(1)
-
-def main():
-    max_pages = 600
-    max_depth = 4
-
-    seen = set()
-    q = deque([(normalize(u), 0) for u in START_URLS])
-    urls = set()
-
-    while q and len(seen) < max_pages:
-        url, depth = q.popleft()
-        if url in seen:
-            continue
-        seen.add(url)
+# erreurs DynamoDB qui signalent un débit dépassé : on ralentit et on rejoue
+THROTTLE_ERRORS = ("ProvisionedThroughputExceededException", "ThrottlingException",
+                   "RequestLimitExceeded", "InternalServerError")
 
-        if not is_internal(url) or should_skip(url):
-            continue
+def _write_chunk(client, table, chunk, throttle, stats, max_retries):
+    """
+    Un BatchWriteItem (<= 25 PutRequest / DeleteRequest). UnprocessedItems et erreurs
+    de débit rejoués avec un backoff exponentiel "full jitter" ; renvoie les requêtes
+    jamais appliquées.
+    """
+    from botocore.exceptions import ClientError
 
-        path = urlparse(url).path
-        if not path.startswith(ALLOWED_PREFIXES):
-            continue
+    request = {table: chunk}
+    for attempt in range(max_retries + 1):
+        st = throttle.acquire(table)
+        t0 = time.monotonic()
+        try:
+            res = client.batch_write_item(RequestItems=request)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in THROTTLE_ERRORS:
+                throttle.release(st, time.monotonic() - t0, ok=True)
+                raise
+            throttle.release(st, time.monotonic() - t0, ok=False)
+            stats.add(throttled=1)
+        else:
+            left = (res.get("UnprocessedItems") or {}).get(table) or []
+            # écriture partielle = capacité de la table atteinte -> cadence réduite
+            throttle.release(st, time.monotonic() - t0, ok=not left)
+            stats.add(written=len(request[table]) - len(left), unprocessed=len(left))
+            if not left:
+                return []
+            request = {table: left}
+        if attempt < max_retries:
+            stats.add(retries=1)
+            time.sleep(random.uniform(0, min(5.0, 0.05 * 2 ** attempt)))
+    return request[table]
+
+class WriteStats:
+    def __init__(self, total):
+        self.total = total
+        self.counts = {"written": 0, "unprocessed": 0, "retries": 0, "throttled": 0, "failed": 0}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self.counts[k] += v
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        c = self.counts
+        rate = c["written"] / elapsed if elapsed else 0.0
+        return (f"{c['written']}/{self.total} items written in {elapsed:.1f}s ({rate:.0f} items/s); "
+                f"unprocessed retried: {c['unprocessed']}, throttled calls: {c['throttled']}, "
+                f"retries: {c['retries']}, failed: {c['failed']}")
+
+def dynamodb_client(workers=4):
+    import boto3
+    from botocore.config import Config
+    return boto3.client("dynamodb", config=Config(max_pool_connections=max(workers, 10),
+                                                  retries={"mode": "standard"}))
+
+def batch_write(items, table=TABLE, workers=4, max_retries=8, client=None, progress_every=5.0, deletes=()):
+    """
+    BatchWriteItem en process (client boto3 partagé, thread-safe), `workers` lots de 25
+    en vol. HostThrottle (clé = table) espace les envois quand DynamoDB renvoie des
+    UnprocessedItems ou des erreurs de débit, puis revient à pleine vitesse.
+    `deletes` : product_id à supprimer dans les mêmes lots (mode --sync).
+    Renvoie WriteStats ; requêtes jamais appliquées comptées dans counts["failed"].
+    """
+    from concurrent.futures import as_completed
 
-        urls.add(url)
+    client = client or dynamodb_client(workers)
+    requests = [{"PutRequest": {"Item": it}} for it in items]
+    requests += [{"DeleteRequest": {"Key": {"product_id": {"S": pid}}}} for pid in deletes]
 
-        if depth >= max_depth:
-            continue
+    stats = WriteStats(len(requests))
+    throttle = HostThrottle(per_host=workers, max_interval=5.0, slow_after=30.0, first_backoff=0.01)
+    chunks = [requests[i:i + 25] for i in range(0, len(requests), 25)]
+    last_report = time.monotonic()
 
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_write_chunk, client, table, c, throttle, stats, max_retries) for c in chunks]
         try:
-            html = fetch(url)
+            for fut in as_completed(futures):
+                stats.add(failed=len(fut.result()))
+                if progress_every and time.monotonic() - last_report >= progress_every:
+                    last_report = time.monotonic()
+                    print("Write:", stats.line())
         except Exception:
-            continue
-
-        for link in extract_links(html, url):
-            if link not in seen and is_internal(link) and not should_skip(link):
-                pth = urlparse(link).path
-                if pth.startswith(ALLOWED_PREFIXES):
-                    q.append((link, depth + 1))
-
-    # Build items + déduplication par product_id
+            # erreur non rejouable (droits, table absente...) : on arrête les lots en attente
+            for f in futures:
+                f.cancel()
+            raise
+
+    return stats
+
+# Item de version du catalogue : réécrit après chaque seed, relu par products-service qui vide
+# son cache de détails quand la version change (cf. CATALOG_META_ID dans products/app.py)
+CATALOG_META_ID = "__catalog_meta__"
+
+def content_hash(item) -> str:
+    """Hash du contenu d'un item (format DynamoDB), hors content_hash lui-même."""
+    body = {k: v for k, v in item.items() if k != "content_hash"}
+    canonical = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+def scan_hashes(client, table=TABLE, segments=4):
+    """État actuel de la table : {product_id: content_hash | None} (Scan parallèle, 2 attributs)."""
+    def scan_segment(seg):
+        out = {}
+        kwargs = {
+            "TableName": table, "Segment": seg, "TotalSegments": segments,
+            "ProjectionExpression": "#id, #h",
+            "ExpressionAttributeNames": {"#id": "product_id", "#h": "content_hash"},
+        }
+        while True:
+            res = client.scan(**kwargs)
+            for it in res.get("Items", []):
+                if it["product_id"]["S"] != CATALOG_META_ID:
+                    out[it["product_id"]["S"]] = (it.get("content_hash") or {}).get("S")
+            if not res.get("LastEvaluatedKey"):
+                return out
+            kwargs["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+
+    current = {}
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        for part in pool.map(scan_segment, range(segments)):
+            current.update(part)
+    return current
+
+def diff_items(items, current):
+    """-> (nouveaux items, items modifiés, product_id absents du crawl)."""
+    adds, updates = [], []
+    for it in items:
+        pid = it["product_id"]["S"]
+        if pid not in current:
+            adds.append(it)
+        elif current[pid] != it["content_hash"]["S"]:
+            updates.append(it)
+    built = {it["product_id"]["S"] for it in items}
+    deletes = sorted(pid for pid in current if pid not in built)
+    return adds, updates, deletes
+
+def catalog_version(items) -> str:
+    """Hash des (product_id, content_hash) : même catalogue -> même version."""
+    pairs = sorted(f'{it["product_id"]["S"]}:{(it.get("content_hash") or {}).get("S") or content_hash(it)}'
+                   for it in items)
+    return hashlib.sha256("\n".join(pairs).encode("utf-8")).hexdigest()[:16]
+
+def write_catalog_version(items, table=TABLE, client=None) -> str:
+    """Écrit l'item de version (CATALOG_META_ID) une fois la table à jour ; renvoie la version."""
+    version = catalog_version(items)
+    (client or dynamodb_client()).put_item(TableName=table, Item={
+        "product_id": {"S": CATALOG_META_ID},
+        "version": {"S": version},
+        "updated_at": {"S": datetime.now(timezone.utc).isoformat()},
+    })
+    return version
+
+def build_items(urls, titles):
+    """Items DynamoDB (avec content_hash, pour --sync), dédupliqués par product_id."""
     by_id = {}
 
     for u in sorted(urls):
@@ -264,7 +698,7 @@ def main():
         parts = path_parts(u)
         level = len(parts)
         item_id = make_id(u)
-        title = get_title(u)
+        title = titles[u]
         cat = category_from_url(u)
 
         parent = ""
@@ -284,18 +718,386 @@ def main():
         }
         if parent:
             item["parent_id"] = {"S": parent}
+        item["content_hash"] = {"S": content_hash(item)}
 
         # garde le premier si collision (normalement très rare avec hash)
         by_id.setdefault(item_id, item)
 
-    items = list(by_id.values())
+    return list(by_id.values())
 
-    print(f"Crawled {len(seen)} pages; inserting {len(items)} unique catalog items into {TABLE} ...")
+def sync_table(items, args, client=None, table=TABLE):
+    """
+    --sync / --dry-run : n'écrit que les items nouveaux ou modifiés et supprime
+    ceux qui ont disparu du site. Renvoie WriteStats, ou None en dry-run.
+    """
+    client = client or dynamodb_client(args.write_workers)
+    current = scan_hashes(client, table)
+    adds, updates, deletes = diff_items(items, current)
+    unchanged = len(items) - len(adds) - len(updates)
+    print(f"Sync: {len(adds)} new, {len(updates)} changed, {len(deletes)} stale, "
+          f"{unchanged} unchanged (table had {len(current)} items)")
+    for label, ids in (("new", [it["product_id"]["S"] for it in adds]),
+                       ("changed", [it["product_id"]["S"] for it in updates]),
+                       ("stale", deletes)):
+        if ids:
+            more = f" (+{len(ids) - 10})" if len(ids) > 10 else ""
+            print(f"  {label}: {', '.join(ids[:10])}{more}")
+
+    # un crawl raté (site en panne, changement de structure) viderait la table
+    too_many = current and len(deletes) > args.max_delete_ratio * len(current)
+    if too_many:
+        print(f"Sync {'would abort' if args.dry_run else 'aborted'}: {len(deletes)} deletions > "
+              f"{args.max_delete_ratio:.0%} of the table (raise --max-delete-ratio to allow)")
+    if args.dry_run:
+        return None
+    if too_many:
+        raise SystemExit(1)
+    return batch_write(adds + updates, table=table, workers=args.write_workers, client=client, deletes=deletes)
+
+def plain_item(item):
+    """Item au format DynamoDB ({"S": ...}) -> JSON simple, sans content_hash (propre à --sync)."""
+    out = {}
+    for k, v in item.items():
+        if k == "content_hash":
+            continue
+        if "S" in v:
+            out[k] = v["S"]
+        elif "N" in v:
+            n = v["N"]
+            out[k] = int(n) if n.lstrip("-").isdigit() else float(n)
+        elif "BOOL" in v:
+            out[k] = v["BOOL"]
+    return out
+
+def build_snapshot(items):
+    """
+    Snapshot versionné du catalogue (lu par products-service, cf. CATALOG_SNAPSHOT).
+    version = hash du contenu : même catalogue -> même version -> pas de rechargement.
+    """
+    plain = sorted((plain_item(it) for it in items), key=lambda x: x["product_id"])
+    canonical = json.dumps(plain, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return {
+        "format": 1,
+        "version": hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16],
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "count": len(plain),
+        "items": plain,
+    }
+
+def write_snapshot(snapshot, path: str):
+    # compact ; gzip si le nom finit par .gz ; écriture atomique (tmp + rename)
+    raw = json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if path.endswith(".gz"):
+        raw = gzip.compress(raw, mtime=0)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(raw)
+    os.replace(tmp, path)
+
+def parse_s3_uri(s3_uri: str):
+    """s3://bucket/key -> (bucket, key) ; ValueError sinon."""
+    bucket, _, key = s3_uri[5:].partition("/") if s3_uri.startswith("s3://") else ("", "", "")
+    if not bucket or not key:
+        raise ValueError(f"URI S3 invalide (attendu s3://bucket/key) : {s3_uri}")
+    return bucket, key
+
+def publish_snapshot(path: str, s3_uri: str, client=None):
+    # même SDK que batch_write ; une erreur (droits, bucket absent) remonte telle quelle
+    import boto3
+    bucket, key = parse_s3_uri(s3_uri)
+    with open(path, "rb") as f:
+        body = f.read()
+    (client or boto3.client("s3")).put_object(
+        Bucket=bucket, Key=key, Body=body,
+        ContentType="application/gzip" if path.endswith(".gz") else "application/json")
+
+@lru_cache(maxsize=65536)
+def in_scope(url: str) -> bool:
+    return is_internal(url) and not should_skip(url) and urlparse(url).path.startswith(ALLOWED_PREFIXES)
+
+# version du fichier de checkpoint du crawl
+FRONTIER_FORMAT = 1
+
+def fingerprint(url: str) -> int:
+    """Empreinte 64 bits d'une URL (collision négligeable sous ~10^8 URLs)."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+class Frontier:
+    """
+    État du crawl en largeur, sauvegardable / reprenable :
+    - seen : empreintes des URLs déjà dépilées (8 octets par URL, quelle que soit sa longueur)
+    - urls : URLs retenues pour le catalogue (il faut l'URL complète pour les items)
+    - level : URLs du niveau `depth` encore à dépiler
+    - to_fetch / fetched : pages du niveau dépilé à télécharger / déjà téléchargées
+    - next_level : liens trouvés dans ces pages (sans doublon, dans l'ordre de la file)
+    - done : None, "budget" (max_pages atteint) ou "complete"
+    """
+
+    def __init__(self, start_urls, max_depth: int):
+        self.max_depth = max_depth
+        self.seen = set()
+        self.urls = set()
+        self.depth = 0
+        self.level = []
+        self.to_fetch = []
+        self.fetched = 0
+        self.next_level = []
+        self._next_fps = set()
+        self.done = None
+        for url in start_urls:
+            self.add_link(normalize(url))
+        self.level, self.next_level, self._next_fps = self.next_level, [], set()
+
+    def add_link(self, url: str):
+        # un doublon dans la file serait de toute façon ignoré au dépilage
+        fp = fingerprint(url)
+        if fp not in self._next_fps:
+            self._next_fps.add(fp)
+            self.next_level.append(url)
+
+    def dequeue(self, max_pages: int) -> bool:
+        """Dépile le niveau courant ; False si le budget de pages est atteint."""
+        for i, url in enumerate(self.level):
+            if len(self.seen) >= max_pages:
+                self.level = self.level[i:]
+                break
+            fp = fingerprint(url)
+            if fp in self.seen:
+                continue
+            self.seen.add(fp)
+            if not in_scope(url):
+                continue
+            self.urls.add(url)
+            if self.depth < self.max_depth:
+                self.to_fetch.append(url)
+        else:
+            self.level = []
+
+        # budget atteint : les liens de ce niveau ne seraient jamais dépilés
+        if len(self.seen) >= max_pages:
+            self.done = "budget"
+            return False
+        return True
+
+    def page_done(self, links):
+        for link in links:
+            self.add_link(link)
+        self.fetched += 1
+
+    def next_depth(self):
+        self.level, self.next_level, self._next_fps = self.next_level, [], set()
+        self.to_fetch, self.fetched = [], 0
+        self.depth += 1
+        if not self.level:
+            self.done = "complete"
+
+    def reopen(self, max_pages: int):
+        # reprise avec un budget plus grand : on repart du niveau interrompu
+        if self.done == "budget" and len(self.seen) < max_pages:
+            self.done = None
+
+    def summary(self) -> str:
+        return (f"depth {self.depth}, {len(self.seen)} seen, {len(self.urls)} kept, "
+                f"{len(self.to_fetch) - self.fetched} to fetch, "
+                f"{len(self.level) + len(self.next_level)} queued, done={self.done}")
+
+    def save(self, path: str, start_urls):
+        data = {
+            "format": FRONTIER_FORMAT,
+            "start_urls": list(start_urls),
+            "max_depth": self.max_depth,
+            "depth": self.depth,
+            "done": self.done,
+            "seen": base64.b64encode(array("Q", sorted(self.seen)).tobytes()).decode("ascii"),
+            "urls": sorted(self.urls),
+            "level": self.level,
+            "to_fetch": self.to_fetch,
+            "fetched": self.fetched,
+            "next_level": self.next_level,
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, start_urls, max_depth: int):
+        """Frontier sauvegardée ; ValueError si elle ne correspond pas à ce crawl."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != FRONTIER_FORMAT:
+            raise ValueError(f"{path}: unknown checkpoint format")
+        if data["start_urls"] != list(start_urls):
+            raise ValueError(f"{path}: checkpoint of another crawl (start URLs differ)")
+        if data["max_depth"] != max_depth:
+            raise ValueError(f"{path}: checkpoint made with --max-depth {data['max_depth']}")
+
+        fr = cls((), max_depth)
+        seen = array("Q")
+        seen.frombytes(base64.b64decode(data["seen"]))
+        fr.seen = set(seen)
+        fr.urls = set(data["urls"])
+        fr.depth = data["depth"]
+        fr.done = data["done"]
+        fr.level = data["level"]
+        fr.to_fetch = data["to_fetch"]
+        fr.fetched = data["fetched"]
+        fr.next_level = data["next_level"]
+        fr._next_fps = {fingerprint(u) for u in fr.next_level}
+        return fr
+
+def crawl(start_urls, fetcher=None, max_pages=600, max_depth=4, workers=8,
+          frontier=None, checkpoint=None, checkpoint_every=30.0):
+    """
+    Parcours en largeur, niveau par niveau : les pages d'un niveau sont
+    téléchargées en parallèle, mais les URLs sont dépilées dans l'ordre exact
+    de l'ancienne file (deque) -> mêmes pages vues / retenues, même coupure à max_pages.
+
+    `frontier` : état repris d'un checkpoint (Frontier.load). `checkpoint` : fichier
+    réécrit toutes les `checkpoint_every` secondes et en fin de crawl (avec le cache
+    de pages du fetcher : les pages déjà lues repartent en requêtes conditionnelles).
+
+    Renvoie (seen, urls) : empreintes des URLs dépilées, URLs retenues pour le catalogue.
+    """
+    fetcher = fetcher or PageFetcher()
+    fr = frontier or Frontier(start_urls, max_depth)
+    fr.reopen(max_pages)
+    last_save = time.monotonic()
+
+    def links_of(url):
+        page = fetcher.get(url)
+        if page is None:
+            return []
+        return [link for link in page["links"] if in_scope(link) and fingerprint(link) not in fr.seen]
+
+    def save_checkpoint(force=False):
+        nonlocal last_save
+        if checkpoint and (force or time.monotonic() - last_save >= checkpoint_every):
+            fetcher.save()
+            fr.save(checkpoint, start_urls)
+            last_save = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while fr.done is None:
+            if not fr.dequeue(max_pages):
+                break
+            # map() garde l'ordre des pages -> file du niveau suivant identique ;
+            # `seen` ne bouge pas pendant les téléchargements d'un niveau
+            for links in pool.map(links_of, fr.to_fetch[fr.fetched:]):
+                fr.page_done(links)
+                save_checkpoint()
+            fr.next_depth()
+
+    save_checkpoint(force=True)
+    return fr.seen, fr.urls
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Crawl cidgroupe.com et remplit " + TABLE)
+    ap.add_argument("--snapshot", metavar="PATH",
+                    help="écrit aussi le snapshot catalogue (ex: catalog_snapshot.json.gz)")
+    ap.add_argument("--snapshot-s3", metavar="S3_URI",
+                    help="publie le snapshot (ex: s3://bucket/catalog/snapshot.json.gz)")
+    ap.add_argument("--workers", type=int, default=8, help="pages téléchargées en parallèle")
+    ap.add_argument("--per-host", type=int, default=4, help="requêtes simultanées max par hôte")
+    ap.add_argument("--min-interval", type=float, default=0.0,
+                    help="secondes min entre deux requêtes vers un même hôte")
+    ap.add_argument("--retries", type=int, default=2, help="nouvelles tentatives (timeout, 429, 5xx)")
+    ap.add_argument("--write-workers", type=int, default=4, help="BatchWriteItem en parallèle")
+    ap.add_argument("--sync", action="store_true",
+                    help="n'écrit que les items nouveaux / modifiés (content_hash) et supprime les disparus")
+    ap.add_argument("--dry-run", action="store_true", help="rapport --sync sans écriture")
+    ap.add_argument("--max-delete-ratio", type=float, default=0.5,
+                    help="--sync refuse de supprimer plus que cette part de la table")
+    ap.add_argument("--cache", metavar="PATH", default=".seed_page_cache.json",
+                    help="cache HTTP conditionnel (ETag / Last-Modified) entre deux reseeds")
+    ap.add_argument("--no-cache", action="store_true", help="désactive le cache disque")
+    ap.add_argument("--max-pages", type=int, default=600, help="budget de pages du crawl")
+    ap.add_argument("--max-depth", type=int, default=4, help="profondeur max du crawl")
+    ap.add_argument("--checkpoint", metavar="PATH", default=".seed_crawl_checkpoint.json",
+                    help="état du crawl sauvegardé régulièrement (reprise avec --resume)")
+    ap.add_argument("--checkpoint-every", type=float, default=30.0, help="secondes entre deux checkpoints")
+    ap.add_argument("--no-checkpoint", action="store_true", help="pas de fichier de checkpoint")
+    ap.add_argument("--resume", action="store_true",
+                    help="reprend le crawl depuis --checkpoint (même --max-depth ; --max-pages peut augmenter)")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.snapshot_s3:
+        try:
+            parse_s3_uri(args.snapshot_s3)  # avant le crawl, pas après
+        except ValueError as e:
+            raise SystemExit(str(e))
+        if not args.snapshot:
+            args.snapshot = "catalog_snapshot.json.gz"
+
+    t0 = time.monotonic()
+    throttle = HostThrottle(per_host=args.per_host, min_interval=args.min_interval)
+    fetcher = PageFetcher(None if args.no_cache else args.cache, throttle, args.retries)
+    checkpoint = None if args.no_checkpoint else args.checkpoint
+
+    frontier = None
+    if args.resume:
+        if not checkpoint or not os.path.exists(checkpoint):
+            print("No checkpoint to resume, starting a new crawl")
+        else:
+            try:
+                frontier = Frontier.load(checkpoint, START_URLS, args.max_depth)
+            except (OSError, ValueError, KeyError) as e:
+                print("Checkpoint error:", e)
+                raise SystemExit(1)
+            print(f"Resuming crawl: {frontier.summary()}")
+
+    seen, urls = crawl(START_URLS, fetcher, max_pages=args.max_pages, max_depth=args.max_depth,
+                       workers=args.workers, frontier=frontier, checkpoint=checkpoint,
+                       checkpoint_every=args.checkpoint_every)
+
+    # titres : pages déjà lues pendant le crawl réutilisées ; le reste (profondeur max,
+    # niveau coupé par max_pages) téléchargé une fois, en parallèle
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        titles = dict(zip(sorted(urls), pool.map(fetcher.title, sorted(urls))))
+    fetcher.save()
+    print(f"Crawl: {len(seen)} pages in {time.monotonic() - t0:.1f}s, hosts: {json.dumps(throttle.stats())}")
+    print(f"Fetch: {fetcher.report()}")
+
+    items = build_items(urls, titles)
+
+    print(f"Crawled {len(seen)} pages; {len(items)} unique catalog items for {TABLE} ...")
     if not items:
         print("No items found.")
         return
 
-    batch_write(items)
+    try:
+        if args.sync or args.dry_run:
+            stats = sync_table(items, args)
+        else:
+            stats = batch_write(items, workers=args.write_workers)
+    except Exception as e:
+        print("Batch error:", e)
+        raise SystemExit(1)
+    if stats is None:
+        print("Dry run: nothing written.")
+        return
+    print("Write:", stats.line())
+    if stats.counts["failed"]:
+        raise SystemExit(1)
+    try:
+        print(f"Catalog version: {write_catalog_version(items)}")
+    except Exception as e:
+        print("Catalog version error:", e)
+        raise SystemExit(1)
+
+    if args.snapshot:
+        snapshot = build_snapshot(items)
+        write_snapshot(snapshot, args.snapshot)
+        print(f"Snapshot {snapshot['version']} ({snapshot['count']} items) -> {args.snapshot}")
+        if args.snapshot_s3:
+            publish_snapshot(args.snapshot, args.snapshot_s3)
+            print(f"Snapshot published to {args.snapshot_s3}")
+
+    # seed terminé : le prochain run repart d'un crawl neuf
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
     print("Done.")
 
 
@@ -1,45 +1,672 @@
+import time
+
+_MODULE_T0 = time.perf_counter()
+
+import base64
+import contextvars
+import gzip
+import hashlib
+import http.client
 import json
 import os
-import urllib.request
-import urllib.error
-from typing import Any, Dict, Optional, List
-from urllib.parse import urlparse
+import re
+import socket
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from decimal import Decimal
+from typing import Any, Deque, Dict, Iterator, Optional, List, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlparse, urlsplit
+
+from cid_shared.encoding import COMPRESS_MIN_BYTES, compress as _compress, encode_response as _encode_response
+from cid_shared.encoding import negotiate_encoding as _negotiate_encoding
+from cid_shared.events import header as _header
+from cid_shared.lru import MISS as _MISS, LRUCache as _LRUCache
+from cid_shared.startup import StartupProfile as _StartupProfile
+from cid_shared.tracing import correlation_id as _correlation_id, finish_trace, span as _span
+from cid_shared.tracing import start_trace as _start_trace, trace_var as _trace_var
+
+# Transport vers products / contact :
+# - "http" (défaut) : API Gateway des services, pool keep-alive, hedging, breaker (cf. _send)
+# - "inprocess" : déploiement colocalisé ; products.app et contact.app sont empaquetés avec
+#   le BFF (leur config : PRODUCTS_TABLE, CONTACTS_TABLE, CATALOG_SNAPSHOT, droits DynamoDB)
+#   et appelés directement (event synthétisé, invoke() : cf. cid_shared.inprocess)
+TRANSPORT = os.environ.get("BFF_TRANSPORT", "http")
+
+if TRANSPORT == "inprocess":
+    from contact import app as _contact_app
+    from products import app as _products_app
+
+    PRODUCTS_BASE = CONTACT_BASE = ""  # URLs réduites au chemin, routées par _local_json
+else:
+    PRODUCTS_BASE = os.environ["PRODUCTS_BASE_URL"].rstrip("/")
+    CONTACT_BASE = os.environ["CONTACT_BASE_URL"].rstrip("/")
+
+_startup = _StartupProfile("bff", _MODULE_T0)  # STARTUP_PROFILE, cf. cid_shared.startup
+
+# Fan-out: les appels upstream indépendants partent en parallèle (thread pool)
+UPSTREAM_FANOUT = os.environ.get("BFF_UPSTREAM_FANOUT", "1") != "0"
+UPSTREAM_MAX_WORKERS = int(os.environ.get("BFF_UPSTREAM_MAX_WORKERS", "8"))
+
+# créé à la demande puis réutilisé entre les invocations "warm"
+_executor: Optional[ThreadPoolExecutor] = None
 
-PRODUCTS_BASE = os.environ["PRODUCTS_BASE_URL"].rstrip("/")
-CONTACT_BASE = os.environ["CONTACT_BASE_URL"].rstrip("/")
+UPSTREAM_TIMEOUT = 15  # plafond par appel ; borné aussi par le temps Lambda restant
 
+# marge gardée sur le temps Lambda restant (réponse à sérialiser / compresser)
+DEADLINE_MARGIN = float(os.environ.get("BFF_DEADLINE_MARGIN_MS", "250")) / 1000
 
-def _resp(status: int, payload: Any):
+# Hedging des GET : 2e requête identique si la 1re dépasse le p95 observé de l'opération
+HEDGE_ENABLED = os.environ.get("BFF_HEDGE", "1") != "0"
+HEDGE_MIN_DELAY = float(os.environ.get("BFF_HEDGE_MIN_MS", "5")) / 1000
+HEDGE_BUDGET = float(os.environ.get("BFF_HEDGE_BUDGET", "0.1"))  # part max des appels doublés
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Circuit breaker par upstream (origine)
+BREAKER_THRESHOLD = int(os.environ.get("BFF_BREAKER_THRESHOLD", "5"))  # échecs consécutifs
+BREAKER_COOLDOWN = float(os.environ.get("BFF_BREAKER_COOLDOWN", "10"))  # secondes ouvert
+
+# Pool keep-alive vers les API Gateway upstream (products / contact)
+POOL_MAXSIZE = int(os.environ.get("BFF_POOL_MAXSIZE", "8"))  # connexions idle max par origine
+POOL_IDLE_TIMEOUT = float(os.environ.get("BFF_POOL_IDLE_TIMEOUT", "45"))  # secondes
+
+
+def _resp_body(status: int, body: str, headers: Optional[Dict[str, str]] = None):
+    base_headers = {"Content-Type": "application/json"}
+    if headers:
+        base_headers.update(headers)
     return {
         "statusCode": status,
-        "headers": {"Content-Type": "application/json"},
-        # accents lisibles
-        "body": json.dumps(payload, ensure_ascii=False),
+        "headers": base_headers,
+        "body": body,
     }
 
 
-def _http_json(method: str, url: str, body: Optional[Dict[str, Any]] = None):
+def _json_default(o):
+    # BFF_TRANSPORT=inprocess : les payloads de products-service (resource boto3) gardent leurs Decimal
+    if isinstance(o, Decimal):
+        return int(o) if o % 1 == 0 else float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _resp(status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+    # accents lisibles
+    with _span("serialize"):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default)
+    return _resp_body(status, body, headers)
+
+
+def _event_body(event) -> str:
+    # BinaryMediaTypes "*/*" : API Gateway passe aussi les bodies JSON en base64
+    body = event.get("body") or ""
+    if body and event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode("utf-8")
+    return body
+
+
+# -----------------------------
+# Traces par requête (spans + Server-Timing, cf. cid_shared.tracing)
+# -----------------------------
+# Étapes mesurées : upstream, parse, build, serialize, compress. X-Correlation-Id part
+# vers les services avec chaque appel upstream : leurs traces se joignent à celle du BFF.
+# contextvars : suivies dans le pool upstream (copy_context au submit) ; le thread de
+# rafraîchissement du cache catalogue, qui survit à la requête, n'en hérite pas
+_correlation_var: contextvars.ContextVar = contextvars.ContextVar("correlation_id", default=None)
+# échéance (time.monotonic) de l'invocation en cours, None hors Lambda
+_deadline_var: contextvars.ContextVar = contextvars.ContextVar("deadline", default=None)
+
+
+# Erreurs typiques d'une connexion keep-alive fermée côté serveur pendant l'idle
+_STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+# rejouables sur une nouvelle connexion sans risque de double traitement
+_REPLAYABLE_METHODS = ("GET", "HEAD")
+# requête impossible à construire (URL, valeur de header) : rien n'est parti vers l'upstream
+_REQUEST_ERRORS = (http.client.InvalidURL, ValueError)
+
+
+class _ConnectionPool:
+    """
+    Connexions HTTP persistantes par origine (scheme, host, port).
+
+    - au plus `maxsize` connexions idle gardées par origine (le surplus est fermé)
+    - une connexion idle depuis plus de `idle_timeout` est fermée au lieu d'être réutilisée
+    - une connexion réutilisée qui s'avère morte (stale) est remplacée et la requête rejouée une
+      fois, pour GET / HEAD seulement : un POST a pu être traité avant la coupure, l'erreur remonte
+
+    Vit au niveau module : les connexions survivent entre invocations "warm".
+    """
+
+    def __init__(self, maxsize: int, idle_timeout: float):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "stale_reconnects": 0,
+            "idle_evictions": 0,
+            "handshake_seconds": 0.0,
+        }
+
+    def _count(self, key: str, n: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _acquire(self, origin: Tuple[str, str, int]) -> Optional[http.client.HTTPConnection]:
+        now = time.monotonic()
+        expired = []
+        conn = None
+        with self._lock:
+            idle = self._idle.get(origin) or []
+            while idle:
+                c, last_used = idle.pop()  # LIFO: la plus récemment utilisée
+                if now - last_used > self.idle_timeout:
+                    expired.append(c)
+                    continue
+                conn = c
+                break
+            self.stats["idle_evictions"] += len(expired)
+        for c in expired:
+            c.close()
+        return conn
+
+    def _release(self, origin: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.maxsize:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def _connect(self, origin: Tuple[str, str, int], timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = origin
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(host, port, timeout=timeout)
+        t0 = time.perf_counter()
+        conn.connect()  # TCP (+ TLS) : le coût qu'on veut payer une seule fois
+        self._count("connections_created")
+        self._count("handshake_seconds", time.perf_counter() - t0)
+        return conn
+
+    def request(self, method: str, url: str, body: Optional[bytes],
+                headers: Dict[str, str], timeout: float) -> Tuple[int, bytes, Dict[str, str]]:
+        u = urlsplit(url)
+        scheme = u.scheme or "https"
+        port = u.port or (443 if scheme == "https" else 80)
+        origin = (scheme, u.hostname or "", port)
+        target = u.path or "/"
+        if u.query:
+            target += "?" + u.query
+
+        self._count("requests")
+        conn = self._acquire(origin)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = self._connect(origin, timeout)
+            else:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused or method not in _REPLAYABLE_METHODS:
+                    raise
+                # connexion idle fermée par le serveur : on reconnecte une fois
+                self._count("stale_reconnects")
+                conn, reused = None, False
+                continue
+            except Exception:
+                conn.close()
+                raise
+
+            if reused:
+                self._count("connections_reused")
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(origin, conn)
+            return resp.status, raw, {k.lower(): v for k, v in resp.getheaders()}
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            st = dict(self.stats)
+        created = st["connections_created"]
+        avg_handshake = st["handshake_seconds"] / created if created else 0.0
+        st["reuse_ratio"] = round(st["connections_reused"] / st["requests"], 4) if st["requests"] else 0.0
+        st["avg_handshake_ms"] = round(avg_handshake * 1000, 3)
+        # estimation : chaque réutilisation évite un handshake moyen
+        st["handshake_ms_saved"] = round(st["connections_reused"] * avg_handshake * 1000, 3)
+        st["handshake_seconds"] = round(st["handshake_seconds"], 6)
+        return st
+
+
+_http_pool = _ConnectionPool(POOL_MAXSIZE, POOL_IDLE_TIMEOUT)
+
+
+def _upstream_metrics() -> Dict[str, Any]:
+    """Réutilisation des connexions, hedging et breakers upstream depuis le démarrage du container."""
+    st = _http_pool.metrics()
+    with _upstream_lock:
+        st["ops"] = {op: s.metrics() for op, s in _op_stats.items()}
+        st["breakers"] = {origin: b.metrics() for origin, b in _breakers.items()}
+    return st
+
+
+class _UpstreamFailure(Exception):
+    """Appel upstream sans réponse exploitable -> (status, {"error": ...}) côté client."""
+
+    def __init__(self, status: int, error: str):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+
+
+class _CircuitBreaker:
+    """
+    Par upstream (origine) :
+    - fermé : BREAKER_THRESHOLD échecs consécutifs (réseau, timeout, 5xx) -> ouvert
+    - ouvert : les appels échouent tout de suite (503) pendant BREAKER_COOLDOWN secondes
+    - semi-ouvert : un seul appel d'essai ; succès -> fermé, échec -> rouvert
+    Un 4xx est une réponse normale de l'upstream (succès pour le breaker). Une requête
+    impossible à construire (_REQUEST_ERRORS) ne compte pas : elle n'a jamais atteint l'upstream.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.probing = True
+            return True
+
+    def closed(self) -> bool:
+        return self.opened_at is None
+
+    def release(self) -> None:
+        # appel autorisé qui n'est pas parti : l'essai semi-ouvert revient au suivant
+        with self._lock:
+            self.probing = False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                self.probing = False
+                return
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self.probing = False
+                self.trips += 1
+                print(json.dumps({"msg": "upstream_circuit_open", "failures": self.failures}))
+
+    def metrics(self) -> Dict[str, Any]:
+        state = "closed" if self.opened_at is None else ("half_open" if self.probing else "open")
+        return {"state": state, "failures": self.failures, "trips": self.trips, "rejected": self.rejected}
+
+
+class _OpStats:
+    """Latences récentes d'une opération upstream (succès seulement) -> délai de hedging (p95)."""
+
+    def __init__(self):
+        self.samples: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._p95: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+            self._p95 = None
+
+    def _p95_locked(self) -> Optional[float]:
+        if self._p95 is None and len(self.samples) >= HEDGE_MIN_SAMPLES:
+            ordered = sorted(self.samples)
+            self._p95 = ordered[int(0.95 * (len(ordered) - 1))]
+        return self._p95
+
+    def start(self) -> Optional[float]:
+        """Compte l'appel -> délai avant hedge (None tant que les mesures manquent)."""
+        with self._lock:
+            self.calls += 1
+            p95 = self._p95_locked()
+        return None if p95 is None else max(HEDGE_MIN_DELAY, p95)
+
+    def take_hedge(self) -> bool:
+        # budget : jamais plus de HEDGE_BUDGET des appels doublés (upstream lent pour tout le monde)
+        with self._lock:
+            if self.hedged >= HEDGE_BUDGET * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def hedge_won(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            p95 = self._p95_locked()
+            return {"calls": self.calls, "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+                    "p95_ms": round(p95 * 1000, 3) if p95 is not None else None}
+
+
+_upstream_lock = threading.Lock()
+_breakers: Dict[str, _CircuitBreaker] = {}
+_op_stats: Dict[str, _OpStats] = {}
+
+# tentatives (1re + hedge) : pool séparé du fan-out, dont les threads attendent ces tentatives
+_attempt_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _breaker(origin: str) -> _CircuitBreaker:
+    with _upstream_lock:
+        b = _breakers.get(origin)
+        if b is None:
+            b = _breakers[origin] = _CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+        return b
+
+
+def _stats(op: str) -> _OpStats:
+    with _upstream_lock:
+        s = _op_stats.get(op)
+        if s is None:
+            s = _op_stats[op] = _OpStats()
+        return s
+
+
+def _attempt_pool() -> ThreadPoolExecutor:
+    global _attempt_executor
+    if _attempt_executor is None:
+        with _upstream_lock:
+            if _attempt_executor is None:
+                _attempt_executor = ThreadPoolExecutor(
+                    max_workers=2 * UPSTREAM_MAX_WORKERS + 2, thread_name_prefix="bff-attempt"
+                )
+    return _attempt_executor
+
+
+def _request_deadline(budget: float) -> float:
+    """Échéance (time.monotonic) d'une opération de `budget` secondes, bornée par l'invocation."""
+    deadline = time.monotonic() + budget
+    lambda_deadline = _deadline_var.get()
+    return deadline if lambda_deadline is None else min(deadline, lambda_deadline)
+
+
+def _attempt(method: str, url: str, data: Optional[bytes], headers: Dict[str, str], timeout: float,
+             breaker: _CircuitBreaker, stats: _OpStats, hedge: bool = False):
+    with _span("upstream") as span:
+        t0 = time.perf_counter()
+        try:
+            status, raw_bytes, resp_headers = _http_pool.request(method, url, data, headers, timeout)
+        except _REQUEST_ERRORS:
+            breaker.release()
+            raise
+        except (OSError, http.client.HTTPException):
+            breaker.record(False)
+            raise
+        breaker.record(status < 500)
+        if status < 500:
+            stats.observe(time.perf_counter() - t0)
+        if span:
+            # Server-Timing de l'upstream gardé tel quel (détail côté service, même correlation_id)
+            span.set(method=method, path=urlsplit(url).path, status=status, bytes=len(raw_bytes),
+                     upstream_timing=resp_headers.get("server-timing"))
+            if hedge:
+                span.set(hedge=True)
+    return status, raw_bytes, resp_headers
+
+
+def _first_ok(futures: List[Future], deadline: float, stats: _OpStats):
+    """Première tentative réussie (< 500) ; sinon la dernière erreur. La perdante finit en fond."""
+    pending = set(futures)
+    outcome: Optional[Future] = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for fut in done:
+            outcome = fut
+            if fut.exception() is None and fut.result()[0] < 500:
+                if fut is not futures[0]:
+                    stats.hedge_won()
+                return fut.result()
+    if pending or outcome is None:
+        raise _UpstreamFailure(504, "upstream_timeout")
+    return outcome.result()
+
+
+def _send(method: str, url: str, data: Optional[bytes], headers: Dict[str, str], op: str):
+    """
+    Un appel upstream, sous :
+    - le temps Lambda restant (moins DEADLINE_MARGIN) : timeout = min(UPSTREAM_TIMEOUT, restant)
+    - le circuit breaker de l'origine (ouvert -> 503 immédiat)
+    - pour un GET (idempotent) : hedge après le p95 de `op` si la 1re tentative traîne
+    """
+    u = urlsplit(url)
+    breaker = _breaker(f"{u.scheme}://{u.netloc}")
+    stats = _stats(op)
+
+    deadline = _request_deadline(UPSTREAM_TIMEOUT)
+    timeout = deadline - time.monotonic()
+    if timeout <= 0:
+        raise _UpstreamFailure(504, "deadline_exceeded")
+    if not breaker.allow():
+        raise _UpstreamFailure(503, "upstream_circuit_open")
+
+    delay = stats.start()
+    if not HEDGE_ENABLED or method != "GET" or delay is None or delay >= timeout:
+        return _attempt(method, url, data, headers, timeout, breaker, stats)
+
+    # chaque tentative a sa copie du contexte (trace, correlation id)
+    ctx = contextvars.copy_context()
+    pool = _attempt_pool()
+    futures = [pool.submit(ctx.copy().run, _attempt, method, url, data, headers, timeout, breaker, stats)]
+    done, _ = wait(futures, timeout=delay)
+    if not done and breaker.closed() and stats.take_hedge():
+        futures.append(pool.submit(ctx.copy().run, _attempt, method, url, data, headers,
+                                   deadline - time.monotonic(), breaker, stats, True))
+    return _first_ok(futures, deadline, stats)
+
+
+def _http_json(method: str, url: str, body: Optional[Dict[str, Any]] = None, op: Optional[str] = None):
+    """
+    -> (status, payload). Timeout, upstream injoignable, circuit ouvert ou délai Lambda
+    épuisé donnent 504 / 502 / 503 avec {"error": ...}, sans exception ; une requête
+    impossible à construire (URL, header reçu du client) donne 400.
+    `op` : nom de l'opération pour les latences (hedging) ; par défaut "METHOD /chemin".
+    """
     data = None
-    headers = {"Accept": "application/json"}
+    # le saut BFF -> products-service voyage compressé lui aussi
+    headers = {"Accept": "application/json", "Accept-Encoding": "gzip"}
+
+    correlation_id = _correlation_var.get()
+    if correlation_id:
+        headers["X-Correlation-Id"] = correlation_id
+    if _trace_var.get() is not None:
+        headers["X-Trace-Sampled"] = "1"
 
     if body is not None:
         data = json.dumps(body, ensure_ascii=False).encode("utf-8")
         headers["Content-Type"] = "application/json"
 
-    req = urllib.request.Request(url, data=data, headers=headers, method=method)
-
+    op = op or f"{method} {urlsplit(url).path}"
     try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            raw = resp.read().decode("utf-8")
-            return resp.status, json.loads(raw) if raw else None
+        status, raw_bytes, resp_headers = _send(method, url, data, headers, op)
+    except _UpstreamFailure as e:
+        return e.status, {"error": e.error}
+    except _REQUEST_ERRORS:
+        return 400, {"error": "invalid_request"}
+    except (socket.timeout, TimeoutError):
+        return 504, {"error": "upstream_timeout"}
+    except (OSError, http.client.HTTPException):
+        return 502, {"error": "upstream_unreachable"}
+
+    _observe_catalog_version(resp_headers.get("x-catalog-version"))
+    with _span("parse"):
+        if resp_headers.get("content-encoding") == "gzip":
+            raw_bytes = gzip.decompress(raw_bytes)
+        raw = raw_bytes.decode("utf-8")
 
-    except urllib.error.HTTPError as e:
-        raw = e.read().decode("utf-8") if e.fp else ""
+        if status >= 400:
+            try:
+                payload = json.loads(raw) if raw else {"error": "upstream_error"}
+            except json.JSONDecodeError:
+                payload = {"error": "upstream_error", "raw": raw}
+            return status, payload
+
+        return status, json.loads(raw) if raw else None
+
+
+def _local_json(method: str, url: str, body: Optional[Dict[str, Any]] = None):
+    """
+    BFF_TRANSPORT=inprocess : même contrat que _http_json -> (status, payload), via
+    products.app.invoke / contact.app.invoke avec un event API Gateway synthétisé.
+    """
+    u = urlsplit(url)
+    parts = [unquote(x) for x in u.path.split("/") if x]
+    headers = {}
+    correlation_id = _correlation_var.get()
+    if correlation_id:
+        headers["X-Correlation-Id"] = correlation_id
+    if _trace_var.get() is not None:
+        headers["X-Trace-Sampled"] = "1"
+    event = {
+        "httpMethod": method,
+        "path": u.path,
+        "headers": headers,
+        "queryStringParameters": {k: v[-1] for k, v in parse_qs(u.query, keep_blank_values=True).items()},
+        "pathParameters": None,
+        "body": None,
+    }
+
+    if method == "GET" and parts[:1] == ["products"] and len(parts) <= 2:
+        service = _products_app
+        if len(parts) == 2 and parts[1] != "search":
+            event["pathParameters"] = {"product_id": parts[1]}
+    elif method == "POST" and parts == ["contacts"]:
+        service = _contact_app
+        event["body"] = json.dumps(body, ensure_ascii=False) if body is not None else None
+    else:
+        return 404, {"error": "route_not_found"}
+
+    with _span("upstream") as span:
         try:
-            payload = json.loads(raw) if raw else {"error": "upstream_error"}
-        except json.JSONDecodeError:
-            payload = {"error": "upstream_error", "raw": raw}
-        return e.code, payload
+            res = service.invoke(event)
+        except Exception as e:
+            # l'équivalent d'une Lambda upstream en erreur (502 côté API Gateway)
+            print(json.dumps({"msg": "inprocess_upstream_failed", "path": u.path, "error": repr(e)}))
+            return 502, {"error": "upstream_error"}
+        if span:
+            span.set(method=method, path=u.path, status=res["statusCode"], transport="inprocess",
+                     upstream_timing=(res.get("headers") or {}).get("Server-Timing"))
+    _observe_catalog_version((res.get("headers") or {}).get("X-Catalog-Version"))
+    return res["statusCode"], res.get("payload")
+
+
+def _upstream_json(method: str, url: str, body: Optional[Dict[str, Any]] = None, op: Optional[str] = None):
+    if TRANSPORT == "inprocess":
+        return _local_json(method, url, body)
+    return _http_json(method, url, body, op)
+
+
+def _upstream_pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=UPSTREAM_MAX_WORKERS, thread_name_prefix="bff-upstream"
+        )
+    return _executor
+
+
+def _submit_get(url: str, op: str) -> Future:
+    # fan-out désactivé : appel immédiat, résultat déjà disponible
+    if not UPSTREAM_FANOUT:
+        fut: Future = Future()
+        try:
+            fut.set_result(_upstream_json("GET", url, op=op))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+    # le thread du pool voit la trace / le correlation id / l'échéance de la requête
+    return _upstream_pool().submit(contextvars.copy_context().run, _upstream_json, "GET", url, None, op)
+
+
+# -----------------------------
+# Pagination products-service
+# -----------------------------
+# products-service renvoie next_token dès que le Scan/Query DynamoDB pagine (1 Mo).
+# On suit next_token jusqu'au bout, avec une page d'avance, sous un délai global.
+PAGINATION_DEADLINE = float(os.environ.get("BFF_PAGINATION_DEADLINE", "12"))  # s, borné par l'invocation
+
+
+class _UpstreamPageError(Exception):
+    def __init__(self, status: int, payload: Any):
+        super().__init__(status)
+        self.status = status
+        self.payload = payload
+
+
+def _with_query(url: str, **params: str) -> str:
+    sep = "&" if "?" in url else "?"
+    # virgules (ids=, fields=) gardées telles quelles : pas de %2C qui triple la longueur
+    return url + sep + urlencode(params, safe=",")
+
+
+def _drain_pages(url: str, op: str, fut: Future, deadline: float) -> Iterator[List[Dict[str, Any]]]:
+    pages = 0
+    while fut is not None:
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                raise FuturesTimeout()
+            status, data = fut.result(timeout=remaining)
+        except FuturesTimeout:
+            raise _UpstreamPageError(504, {"error": "upstream_deadline_exceeded", "pages": pages})
+
+        if status >= 400:
+            raise _UpstreamPageError(status, data)
+        pages += 1
+
+        # prefetch: la page suivante part avant que l'appelant traite celle-ci
+        token = data.get("next_token") if isinstance(data, dict) else None
+        fut = _submit_get(_with_query(url, next_token=token), op) if token else None
+
+        yield _as_list_payload(data)
+
+
+def _paginate(url: str, op: str, deadline: float) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Itère sur les pages (listes d'items) de `url` en suivant next_token.
+    La première page est demandée tout de suite (pas au premier next()).
+    Lève _UpstreamPageError(status, payload) sur erreur upstream ou délai dépassé.
+    """
+    return _drain_pages(url, op, _submit_get(url, op), deadline)
 
 
 def _as_list_payload(data: Any) -> List[Dict[str, Any]]:
@@ -56,38 +683,73 @@ def _as_list_payload(data: Any) -> List[Dict[str, Any]]:
     return []
 
 
-def handler(event, context):
-    path = event.get("rawPath") or event.get("path") or ""
-    method = (event.get("httpMethod") or "").upper()
-    path_params = event.get("pathParameters") or {}
-    product_id = path_params.get("product_id")
+# -----------------------------
+# Construction de l'arbre du catalogue
+# -----------------------------
+_CIDGROUPE_ROOT = "https://cidgroupe.com/"
+_URL_SLOW_CHARS = ";[]\t\r\n"
 
-    # -----------------------------
-    # 0) GET /api/catalog
-    # -----------------------------
-    # But: réponse "prête front" (menu + catégories + produits groupés)
-    #
-    # Stratégie:
-    # - GET products?type=category  -> catégories + sous-catégories
-    # - GET products?type=product   -> produits
-    #
-    # Problème actuel: parent_id des produits ne match pas toujours l'id des sous-catégories.
-    # Solution: on attache les produits par URL (niveau 2) en fallback.
-    if method == "GET" and path.endswith("/api/catalog"):
-        s1, cats_data = _http_json("GET", f"{PRODUCTS_BASE}/products?type=category")
-        if s1 >= 400:
-            return _resp(s1, {"error": "products_categories_failed", "details": cats_data})
 
-        s2, prods_data = _http_json("GET", f"{PRODUCTS_BASE}/products?type=product")
-        if s2 >= 400:
-            return _resp(s2, {"error": "products_list_failed", "details": prods_data})
+# URL absolue "simple" (cas normal du seeder) : chemin = après le netloc, avant ?/#
+_SIMPLE_URL_PATH = re.compile(r"https?://[^/?#]*([^?#]*)")
+
+
+def _url_path_parts(src: str) -> Tuple[str, ...]:
+    if not any(c in src for c in _URL_SLOW_CHARS):
+        m = _SIMPLE_URL_PATH.match(src)
+        if m:
+            return tuple(x for x in m.group(1).split("/") if x)
+
+    # cas rares : même résultat que urlparse (params ";", IPv6, tab/newline)
+    try:
+        path = urlsplit(src).path
+        if ";" in path:
+            path = urlparse(src).path
+    except Exception:
+        return ()
+    return tuple(x for x in path.strip("/").split("/") if x)
+
+
+# seuls champs lus par _CatalogBuilder (ProjectionExpression côté products-service)
+CATALOG_CATEGORY_FIELDS = "product_id,name,source_url,category,level,parent_id"
+CATALOG_PRODUCT_FIELDS = "product_id,name,source_url,category,level,type,parent_id"
+
 
-        categories = _as_list_payload(cats_data)
-        products = _as_list_payload(prods_data)
+def _by_name(x):
+    return (x.get("name") or "").lower()
+
+
+class _CatalogBuilder:
+    """
+    Arbre "prêt front" : catégories niveau 1 -> sous-catégories -> produits.
+
+    Tout est indexé une fois, puis chaque produit est rattaché en O(1) :
+    - catégories par id
+    - catégorie niveau 1 par slug `category` (parent_id des sous-catégories)
+    - catégories par chemin d'URL (<lvl1>,) / (<lvl1>, <lvl2>) pour le fallback URL
+
+    Priorité de rattachement d'un produit :
+    1) parent_id exact (si ça match un node id)
+    2) sinon: URL niveau 2 (https://cidgroupe.com/<lvl1>/<lvl2>)
+    3) sinon: URL niveau 1 (https://cidgroupe.com/<lvl1>)
+    sinon: orphelin -> ignoré
+
+    `roots` (slugs de catégories niveau 1) limite la sortie à ces sous-arbres ;
+    les produits hors sélection sont écartés dès le rattachement.
+
+    add_products() peut être appelé plusieurs fois (pages upstream), mais
+    seulement après add_categories().
+    """
 
-        # Index des catégories par id
-        cat_by_id: Dict[str, Dict[str, Any]] = {}
-        top: List[Dict[str, Any]] = []
+    def __init__(self, roots: Optional[set] = None):
+        self.roots = roots
+        self.cat_by_id: Dict[str, Dict[str, Any]] = {}
+        self.cat_by_parts: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self.top: List[Dict[str, Any]] = []
+        self._selected: Optional[set] = None  # id(node) des sous-arbres demandés
+
+    def add_categories(self, categories: List[Dict[str, Any]]) -> None:
+        cat_by_id = self.cat_by_id
 
         # 1) Préparer les catégories
         for c in categories:
@@ -95,7 +757,7 @@ def handler(event, context):
             if not cid:
                 continue
 
-            node = {
+            cat_by_id[cid] = {
                 "id": cid,
                 "name": c.get("name"),
                 "url": c.get("source_url"),
@@ -104,17 +766,23 @@ def handler(event, context):
                 "children": [],   # sous-catégories
                 "products": [],   # produits attachés à ce node
             }
-            cat_by_id[cid] = node
 
-        # Index des catégories par URL (pour rattacher les produits même si parent_id ne match pas)
-        cat_by_url: Dict[str, Dict[str, Any]] = {}
+        # Index (une passe) :
+        # - niveau 1 par slug (le premier gagne)
+        # - chemin d'URL -> node (le dernier gagne), pour rattacher les produits
+        #   même si parent_id ne match pas
+        top_by_slug: Dict[Any, Dict[str, Any]] = {}
         for node in cat_by_id.values():
+            if node.get("level") == 1:
+                top_by_slug.setdefault(node.get("category"), node)
+
             u = (node.get("url") or "").rstrip("/")
-            if u:
-                cat_by_url[u] = node
+            if u.startswith(_CIDGROUPE_ROOT):
+                segs = tuple(u[len(_CIDGROUPE_ROOT):].split("/"))
+                if len(segs) <= 2 and all(segs):
+                    self.cat_by_parts[segs] = node
 
-        # 2) Trouver les top categories (level=1 ou pas de parent_id)
-        #    + rattacher les sous-catégories (level=2)
+        # 2) Top categories (pas de parent_id) + rattacher les sous-catégories
         for c in categories:
             cid = c.get("product_id")
             if not cid or cid not in cat_by_id:
@@ -124,112 +792,402 @@ def handler(event, context):
             parent = c.get("parent_id")
 
             if not parent:
-                top.append(node)
-            else:
-                # parent_id de niveau 2 ressemble souvent à "engrais" ou "produits-chimiques"
-                parent_slug = parent
-                parent_top = None
-
-                for t in cat_by_id.values():
-                    if t.get("level") == 1 and t.get("category") == parent_slug:
-                        parent_top = t
-                        break
-
-                if parent_top:
-                    parent_top["children"].append(node)
-                else:
-                    # fallback: si le parent_id est un vrai ID
-                    if parent in cat_by_id:
-                        cat_by_id[parent]["children"].append(node)
-
-        # 3) Rattacher les produits
-        # Priorité:
-        # 1) parent_id exact (si ça match un node id)
-        # 2) sinon: URL niveau 2 (https://cidgroupe.com/<lvl1>/<lvl2>)
-        # 3) sinon: URL niveau 1 (https://cidgroupe.com/<lvl1>)
+                self.top.append(node)
+                continue
+
+            # parent_id de niveau 2 ressemble souvent à "engrais" ou "produits-chimiques"
+            parent_top = top_by_slug.get(parent)
+            if parent_top:
+                parent_top["children"].append(node)
+            elif parent in cat_by_id:
+                # fallback: si le parent_id est un vrai ID
+                cat_by_id[parent]["children"].append(node)
+
+        if self.roots is not None:
+            self.top = [t for t in self.top if t.get("category") in self.roots]
+            selected = set()
+            stack = list(self.top)
+            while stack:
+                node = stack.pop()
+                if id(node) in selected:
+                    continue
+                selected.add(id(node))
+                stack.extend(node["children"])
+            self._selected = selected
+
+    def _resolve(self, p: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # 1) match direct parent_id -> category node id
+        parent_id = p.get("parent_id")
+        if parent_id and parent_id in self.cat_by_id:
+            return self.cat_by_id[parent_id]
+
+        parts = _url_path_parts((p.get("source_url") or "").rstrip("/"))
+
+        # 2) fallback: URL "niveau 2"
+        if len(parts) >= 2:
+            node = self.cat_by_parts.get(parts[:2])
+            if node:
+                return node
+
+        # 3) fallback: URL niveau 1
+        if len(parts) >= 1:
+            return self.cat_by_parts.get(parts[:1])
+
+        return None
+
+    def add_products(self, products: List[Dict[str, Any]]) -> None:
+        selected = self._selected
         for p in products:
             pid = p.get("product_id")
             if not pid:
                 continue
 
-            prod = {
+            node = self._resolve(p)
+            if node is None or (selected is not None and id(node) not in selected):
+                continue
+
+            node["products"].append({
                 "id": pid,
                 "name": p.get("name"),
                 "url": p.get("source_url"),
                 "category": p.get("category"),
                 "level": p.get("level"),
                 "type": p.get("type"),
-            }
+            })
 
-            # 1) match direct parent_id -> category node id
-            parent_id = p.get("parent_id")
-            if parent_id and parent_id in cat_by_id:
-                cat_by_id[parent_id]["products"].append(prod)
-                continue
+    def build(self) -> Dict[str, Any]:
+        # Tri par nom (menu stable)
+        top = self.top
+        for t in top:
+            t["children"].sort(key=_by_name)
+            t["products"].sort(key=_by_name)
+            for ch in t["children"]:
+                ch["products"].sort(key=_by_name)
 
-            # 2) fallback: calculer l'URL "niveau 2"
-            src = (p.get("source_url") or "").rstrip("/")
-            try:
-                parts = [x for x in urlparse(src).path.strip("/").split("/") if x]
-            except Exception:
-                parts = []
+        top.sort(key=_by_name)
+        return {"categories": top}
 
-            if len(parts) >= 2:
-                lvl2_url = f"https://cidgroupe.com/{parts[0]}/{parts[1]}"
-                node = cat_by_url.get(lvl2_url)
-                if node:
-                    node["products"].append(prod)
-                    continue
 
-            # 3) fallback: URL niveau 1
-            if len(parts) >= 1:
-                lvl1_url = f"https://cidgroupe.com/{parts[0]}"
-                node = cat_by_url.get(lvl1_url)
-                if node:
-                    node["products"].append(prod)
-                    continue
+def _load_catalog(roots: Optional[set] = None) -> Tuple[int, Any]:
+    """
+    Appelle products-service et construit l'arbre du catalogue -> (status, payload).
+    `roots` : ne construire que ces catégories niveau 1 (None = tout).
+    """
+    deadline = _request_deadline(PAGINATION_DEADLINE)
 
-            # sinon: orphelin -> on ignore (ou tu peux les collecter)
+    # les deux listes démarrent en même temps (fan-out)
+    base = f"{PRODUCTS_BASE}/products"
+    cat_pages = _paginate(_with_query(base, type="category", fields=CATALOG_CATEGORY_FIELDS),
+                          "catalog_categories", deadline)
+    prod_pages = _paginate(_with_query(base, type="product", fields=CATALOG_PRODUCT_FIELDS),
+                           "catalog_products", deadline)
 
-        # Tri par nom (menu stable)
-        def by_name(x):
-            return (x.get("name") or "").lower()
+    builder = _CatalogBuilder(roots)
+    try:
+        # les produits se rattachent aux catégories : il les faut toutes d'abord
+        categories = [c for page in cat_pages for c in page]
+    except _UpstreamPageError as e:
+        return e.status, {"error": "products_categories_failed", "details": e.payload}
+    with _span("build"):
+        builder.add_categories(categories)
 
-        for t in top:
-            t["children"].sort(key=by_name)
-            t["products"].sort(key=by_name)
-            for ch in t["children"]:
-                ch["products"].sort(key=by_name)
+    try:
+        # puis les pages produits sont intégrées au fil de l'eau
+        for page in prod_pages:
+            with _span("build"):
+                builder.add_products(page)
+    except _UpstreamPageError as e:
+        return e.status, {"error": "products_list_failed", "details": e.payload}
+
+    with _span("build"):
+        return 200, builder.build()
 
-        top.sort(key=by_name)
 
-        return _resp(200, {"categories": top})
+# -----------------------------
+# Cache du catalogue (par container)
+# -----------------------------
+# Le catalogue ne change qu'après un run de seed_cid_products.py :
+# - frais pendant CATALOG_CACHE_TTL secondes
+# - ensuite servi "stale" encore CATALOG_CACHE_SWR secondes pendant qu'un thread le rafraîchit
+# - au-delà (ou TTL=0) : rechargement synchrone
+# Les erreurs upstream ne sont jamais mises en cache.
+CATALOG_CACHE_TTL = float(os.environ.get("BFF_CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_SWR = float(os.environ.get("BFF_CATALOG_CACHE_SWR", "300"))
+
+# une entrée par sélection de sous-arbres (?category=...), bornée
+CATALOG_CACHE_MAX_KEYS = 32
+
+# clé -> {"body": str, "etag": str, "stored_at": float, "encoded": {encoding: body base64}}
+_catalog_cache: Dict[str, Dict[str, Any]] = {}
+_catalog_refreshing: set = set()
+_catalog_lock = threading.Lock()
+
+
+def _store_catalog(key: str, payload: Any) -> Dict[str, Any]:
+    with _span("serialize"):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default)
+        raw = body.encode("utf-8")
+    entry = {
+        "body": body,
+        "size": len(raw),
+        "etag": hashlib.sha256(raw).hexdigest()[:32],
+        "stored_at": time.monotonic(),
+        # variantes compressées, calculées une fois au premier hit qui les demande
+        "encoded": {},
+    }
+    if CATALOG_CACHE_TTL > 0:
+        with _catalog_lock:
+            if key not in _catalog_cache and len(_catalog_cache) >= CATALOG_CACHE_MAX_KEYS:
+                oldest = min(_catalog_cache, key=lambda k: _catalog_cache[k]["stored_at"])
+                del _catalog_cache[oldest]
+            _catalog_cache[key] = entry
+    return entry
+
+
+def _refresh_catalog(key: str, roots: Optional[set]) -> None:
+    try:
+        status, payload = _load_catalog(roots)
+        if status < 400:
+            _store_catalog(key, payload)
+        # sinon: on garde l'entrée stale, le prochain hit réessaiera
+    except Exception as e:
+        print(json.dumps({"msg": "catalog_refresh_failed", "error": repr(e)}))
+    finally:
+        with _catalog_lock:
+            _catalog_refreshing.discard(key)
+
+
+def _refresh_catalog_async(key: str, roots: Optional[set]) -> None:
+    with _catalog_lock:
+        if key in _catalog_refreshing:
+            return
+        _catalog_refreshing.add(key)
+    # thread dédié (pas le pool upstream : _load_catalog y soumet ses propres appels).
+    # Lambda gèle le container après la réponse : le refresh peut se terminer au dégel suivant.
+    threading.Thread(target=_refresh_catalog, args=(key, roots), daemon=True).start()
+
+
+def _etag_matches(event, etag: str) -> bool:
+    """`etag` = hash du contenu (sans guillemets) ; chaque encodage a son ETag "hash-gzip"."""
+    inm = _header(event, "If-None-Match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    # comparaison faible (RFC 9110) : W/"x" matche "x" ; même contenu quel que soit l'encodage
+    for t in inm.split(","):
+        t = t.strip()
+        t = t[2:] if t.startswith("W/") else t
+        if t.strip('"').split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def _catalog_roots(event) -> Optional[set]:
+    # ?category=engrais,adblue -> seulement ces sous-arbres
+    qs = event.get("queryStringParameters") or {}
+    raw = qs.get("category") or ""
+    roots = {x.strip() for x in raw.split(",") if x.strip()}
+    return roots or None
+
+
+def _catalog_response(event):
+    roots = _catalog_roots(event)
+    key = ",".join(sorted(roots)) if roots else "*"
+    now = time.monotonic()
+    entry = _catalog_cache.get(key)
+    age = now - entry["stored_at"] if entry else None
+
+    if entry is None or age > CATALOG_CACHE_TTL + CATALOG_CACHE_SWR:
+        status, payload = _load_catalog(roots)
+        if status >= 400:
+            return _resp(status, payload)
+        entry = _store_catalog(key, payload)
+    elif age > CATALOG_CACHE_TTL:
+        _refresh_catalog_async(key, roots)
+
+    enc = None
+    if entry["size"] >= COMPRESS_MIN_BYTES:
+        enc = _negotiate_encoding(_header(event, "Accept-Encoding"))
+
+    headers = {
+        "ETag": '"%s-%s"' % (entry["etag"], enc) if enc else '"%s"' % entry["etag"],
+        "Cache-Control": "public, max-age=%d, stale-while-revalidate=%d"
+        % (int(CATALOG_CACHE_TTL), int(CATALOG_CACHE_SWR)),
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(event, entry["etag"]):
+        return _resp_body(304, "", headers)
+    if not enc:
+        return _resp_body(200, entry["body"], headers)
+
+    # octets compressés gardés dans l'entrée de cache : pas de recompression à chaque hit
+    encoded = entry["encoded"].get(enc)
+    if encoded is None:
+        encoded = base64.b64encode(_compress(entry["body"].encode("utf-8"), enc)).decode("ascii")
+        entry["encoded"][enc] = encoded
+    headers["Content-Encoding"] = enc
+    res = _resp_body(200, encoded, headers)
+    res["isBase64Encoded"] = True
+    return res
+
+
+# -----------------------------
+# Cache LRU des détails produit (par container)
+# -----------------------------
+# GET /api/products/{id} : trafic concentré sur quelques produits (AdBlue, granulés).
+# Corps JSON de products-service gardé sérialisé (hit : ni appel upstream ni json.dumps),
+# un par (product_id, ?fields=), borné en entrées et en octets, TTL par entrée.
+# - 404 product_not_found gardés DETAIL_CACHE_NEGATIVE_TTL secondes (0 = jamais)
+# - autres erreurs (4xx, 5xx, 504...) jamais gardées
+# - vidé dès qu'une réponse upstream (quelle que soit la route) porte un X-Catalog-Version
+#   différent : snapshot republié ou item de version réécrit dans la table après un reseed
+DETAIL_CACHE_TTL = float(os.environ.get("BFF_DETAIL_CACHE_TTL", "60"))  # s, 0 = désactivé
+DETAIL_CACHE_NEGATIVE_TTL = float(os.environ.get("BFF_DETAIL_CACHE_NEGATIVE_TTL", "5"))  # s
+DETAIL_CACHE_MAX_ITEMS = int(os.environ.get("BFF_DETAIL_CACHE_MAX_ITEMS", "5000"))
+DETAIL_CACHE_MAX_BYTES = int(os.environ.get("BFF_DETAIL_CACHE_MAX_BYTES", str(16 * 2**20)))
+
+_detail_cache = _LRUCache(DETAIL_CACHE_MAX_ITEMS, DETAIL_CACHE_MAX_BYTES)
+_catalog_version: Optional[str] = None  # dernier X-Catalog-Version vu chez products-service
+_version_lock = threading.Lock()
+
+
+def _observe_catalog_version(version: Optional[str]) -> None:
+    global _catalog_version
+    if not version or version == _catalog_version:
+        return
+    with _version_lock:
+        if version == _catalog_version:
+            return
+        previous, _catalog_version = _catalog_version, version
+    if previous is not None:
+        _detail_cache.clear()
+        print(json.dumps({"msg": "detail_cache_invalidated", "from": previous, "to": version}))
+
+
+def _detail_response(product_id: str, fields: Dict[str, str]):
+    key = (product_id, fields.get("fields"))
+    cached = _detail_cache.read(key) if DETAIL_CACHE_TTL > 0 else _MISS
+    if cached is not _MISS:
+        return _resp_body(cached[0], cached[1])
+
+    # id encodé en un seul segment de chemin (espace, "/", "?"... -> %XX)
+    url = f"{PRODUCTS_BASE}/products/{quote(product_id, safe='')}"
+    url = _with_query(url, **fields) if fields else url
+    status, data = _upstream_json("GET", url, op="product_detail")
+    with _span("serialize"):
+        body = json.dumps(data, ensure_ascii=False, default=_json_default)
+    if status == 200:
+        _detail_cache.put(key, (status, body), len(body), DETAIL_CACHE_TTL)
+    elif status == 404 and isinstance(data, dict) and data.get("error") == "product_not_found":
+        _detail_cache.put(key, (status, body), len(body), DETAIL_CACHE_NEGATIVE_TTL, negative=True)
+    return _resp_body(status, body)
+
+
+def handler(event, context):
+    t0 = time.perf_counter()
+    trace = _start_trace(event)
+    _trace_var.set(trace)
+    _correlation_var.set(trace.correlation_id if trace else _correlation_id(event))
+    # budget de l'invocation : chaque appel upstream s'arrête avant le Timeout Lambda
+    remaining_ms = getattr(context, "get_remaining_time_in_millis", None)
+    _deadline_var.set(time.monotonic() + remaining_ms() / 1000 - DEADLINE_MARGIN if remaining_ms else None)
+
+    res = _encode_response(event, _route(event, context))
+    if trace is not None:
+        res = finish_trace(trace, "bff", event, res)
+    if _startup.pending:
+        _startup.report(t0, upstream=_upstream_metrics(), detail_cache=_detail_cache.metrics())
+    return res
+
+
+def _route(event, context):
+    path = event.get("rawPath") or event.get("path") or ""
+    method = (event.get("httpMethod") or "").upper()
+    path_params = event.get("pathParameters") or {}
+    product_id = path_params.get("product_id")
+    qs = event.get("queryStringParameters") or {}
+
+    # ?fields=... transmis tel quel à products-service (ProjectionExpression)
+    fields = {"fields": qs["fields"]} if qs.get("fields") else {}
+
+    # -----------------------------
+    # 0) GET /api/catalog
+    # -----------------------------
+    # But: réponse "prête front" (menu + catégories + produits groupés)
+    #
+    # Stratégie:
+    # - GET products?type=category  -> catégories + sous-catégories
+    # - GET products?type=product   -> produits
+    # (les deux listes partent en parallèle et sont paginées jusqu'au bout, cf. _paginate)
+    #
+    # Problème actuel: parent_id des produits ne match pas toujours l'id des sous-catégories.
+    # Solution: on attache les produits par URL (niveau 2) en fallback.
+    #
+    # ?category=engrais,adblue -> seulement ces sous-arbres (cf. _CatalogBuilder).
+    # Réponse mise en cache par container (TTL + stale-while-revalidate) avec ETag / 304.
+    if method == "GET" and path.endswith("/api/catalog"):
+        return _catalog_response(event)
 
     # -----------------------------
     # 1) GET /api/products -> products-service /products
     # -----------------------------
+    # (toutes les pages, cf. _paginate)
     if method == "GET" and path.endswith("/api/products"):
-        status, data = _http_json("GET", f"{PRODUCTS_BASE}/products")
+        items: List[Dict[str, Any]] = []
+        try:
+            url = _with_query(f"{PRODUCTS_BASE}/products", **fields) if fields else f"{PRODUCTS_BASE}/products"
+            for page in _paginate(url, "products_list", _request_deadline(PAGINATION_DEADLINE)):
+                items.extend(page)
+        except _UpstreamPageError as e:
+            return _resp(e.status, e.payload)
+        return _resp(200, {"items": items})
+
+    # -----------------------------
+    # 1b) GET /api/products/batch?ids=a,b,c -> products-service /products?ids=...
+    # -----------------------------
+    # (panier, comparatif, produits liés : un seul aller-retour au lieu de N)
+    if method == "GET" and path.endswith("/api/products/batch"):
+        ids = qs.get("ids") or ""
+        if not ids.strip():
+            return _resp(400, {"error": "missing_ids"})
+        status, data = _upstream_json("GET", _with_query(f"{PRODUCTS_BASE}/products", ids=ids, **fields),
+                                      op="products_batch")
+        return _resp(status, data)
+
+    # -----------------------------
+    # 1c) GET /api/search?q=...&type=&limit= -> products-service /products/search
+    # -----------------------------
+    # (recherche / autocomplétion : index en mémoire côté products-service)
+    if method == "GET" and path.endswith("/api/search"):
+        if not (qs.get("q") or "").strip():
+            return _resp(400, {"error": "missing_q"})
+        params = {k: qs[k] for k in ("q", "type", "limit") if qs.get(k)}
+        status, data = _upstream_json("GET", _with_query(f"{PRODUCTS_BASE}/products/search", **params, **fields),
+                                      op="products_search")
         return _resp(status, data)
 
     # -----------------------------
     # 2) GET /api/products/{id} -> products-service /products/{id}
     # -----------------------------
+    # (cache LRU par container, cf. _detail_response)
     if method == "GET" and product_id:
-        status, data = _http_json("GET", f"{PRODUCTS_BASE}/products/{product_id}")
-        return _resp(status, data)
+        return _detail_response(product_id, fields)
 
     # -----------------------------
     # 3) POST /api/contact -> contact-service /contacts
     # -----------------------------
     if method == "POST" and path.endswith("/api/contact"):
-        body_str = event.get("body") or ""
+        body_str = _event_body(event)
         try:
             payload = json.loads(body_str) if body_str else {}
         except json.JSONDecodeError:
             return _resp(400, {"error": "invalid_json"})
 
-        status, data = _http_json("POST", f"{CONTACT_BASE}/contacts", payload)
+        status, data = _upstream_json("POST", f"{CONTACT_BASE}/contacts", payload, op="contact_create")
         return _resp(status, data)
 
-    return _resp(404, {"error": "route_not_found"})
\ No newline at end of file
+    return _resp(404, {"error": "route_not_found"})
+
+
+_startup.imported()
@@ -1,32 +1,87 @@
+import time
+
+_MODULE_T0 = time.perf_counter()
+
+import base64
 import json
 import os
 import uuid
 from datetime import datetime, timezone
 from typing import Any, Dict
 
-import boto3
+from cid_shared.encoding import encode_response as _encode_response
+from cid_shared.inprocess import inprocess_var as _inprocess_var, invoke as _invoke
+from cid_shared.startup import EAGER_INIT, StartupProfile as _StartupProfile
+from cid_shared.tracing import Span as _Span, finish_trace, span as _span, start_trace as _start_trace
+from cid_shared.tracing import trace_var as _trace_var
+
+# boto3 importé au premier POST valide : le cold start ne le paie pas
+# pour les requêtes rejetées en validation.
 
-dynamodb = boto3.resource("dynamodb")
 TABLE_NAME = os.environ["CONTACTS_TABLE"]
 
+# Traces (TRACE_SAMPLE_RATE, cf. cid_shared.tracing) : spans parse, dynamodb (avec
+# ReturnConsumedCapacity), serialize.
+
 REQUIRED_FIELDS = ["name", "email", "message"]
 
+_startup = _StartupProfile("contact", _MODULE_T0)  # STARTUP_PROFILE / EAGER_INIT, cf. cid_shared.startup
+_client = None
+
+def _dynamodb_client():
+    # client botocore bas niveau : ni le modèle "resource" ni boto3/s3transfer
+    # à charger (~250 ms de moins au cold start)
+    global _client
+    if _client is None:
+        t0 = time.perf_counter()
+        import botocore.session
+        _client = botocore.session.get_session().create_client("dynamodb")
+        _startup.mark_init("dynamodb_client", t0)
+    return _client
+
 def _resp(status: int, payload: Dict[str, Any]):
+    if _inprocess_var.get():  # cf. cid_shared.inprocess
+        return {"statusCode": status, "headers": {"Content-Type": "application/json"}, "payload": payload}
+    with _span("serialize"):
+        body = json.dumps(payload)
     return {
         "statusCode": status,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(payload),
+        "body": body,
     }
 
 def _parse_json_body(event) -> Dict[str, Any]:
     body = event.get("body") or ""
     try:
+        # BinaryMediaTypes "*/*" : API Gateway passe le body en base64
+        if body and event.get("isBase64Encoded"):
+            body = base64.b64decode(body).decode("utf-8")
         return json.loads(body)
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, ValueError):
         return {}
 
+# -----------------------------
+# Traces par requête (cf. cid_shared.tracing)
+# -----------------------------
 def handler(event, context):
-    payload = _parse_json_body(event)
+    t0 = time.perf_counter()
+    trace = _start_trace(event)
+    _trace_var.set(trace)
+
+    res = _encode_response(event, _route(event, context))
+    if trace is not None:
+        res = finish_trace(trace, "contact", event, res)
+    if _startup.pending:
+        _startup.report(t0)
+    return res
+
+def invoke(event) -> Dict[str, Any]:
+    """Entrée du BFF colocalisé (BFF_TRANSPORT=inprocess, cf. cid_shared.inprocess)."""
+    return _invoke("contact", _route, event)
+
+def _route(event, context):
+    with _span("parse"):
+        payload = _parse_json_body(event)
 
     missing = [f for f in REQUIRED_FIELDS if not payload.get(f)]
     if missing:
@@ -35,8 +90,6 @@ def handler(event, context):
     if "@" not in payload["email"]:
         return _resp(400, {"error": "validation_error", "field": "email", "message": "invalid email"})
 
-    table = dynamodb.Table(TABLE_NAME)
-
     contact_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
 
@@ -53,5 +106,18 @@ def handler(event, context):
         "source": (payload.get("source") or "website").strip(),
     }
 
-    table.put_item(Item=item)
-    return _resp(201, {"ok": True, "contact_id": contact_id})
\ No newline at end of file
+    # tous les attributs sont des chaînes : typage DynamoDB direct
+    request = {"TableName": TABLE_NAME, "Item": {k: {"S": v} for k, v in item.items()}}
+    trace = _trace_var.get()
+    if trace is None:
+        _dynamodb_client().put_item(**request)
+    else:
+        with _Span(trace, "dynamodb") as span:
+            res = _dynamodb_client().put_item(ReturnConsumedCapacity="TOTAL", **request)
+            span.set(op="put_item", capacity_units=(res.get("ConsumedCapacity") or {}).get("CapacityUnits"))
+    return _resp(201, {"ok": True, "contact_id": contact_id})
+
+if EAGER_INIT:
+    _dynamodb_client()
+
+_startup.imported()
@@ -1,14 +1,162 @@
+import time
+
+_MODULE_T0 = time.perf_counter()
+
+import base64
+import bisect
+import contextvars
+import gzip
+import heapq
 import json
 import os
+import random
+import re
+import threading
+import unicodedata
 from decimal import Decimal
 from typing import Any, Dict, List, Optional, Tuple
 
-import boto3
-from boto3.dynamodb.conditions import Attr
+from cid_shared.encoding import encode_response as _encode_response
+from cid_shared.inprocess import inprocess_var as _inprocess_var, invoke as _invoke
+from cid_shared.lru import MISS as _MISS, LRUCache as _LRUCache
+from cid_shared.startup import EAGER_INIT, StartupProfile as _StartupProfile
+from cid_shared.tracing import Span as _Span, finish_trace, span as _span, start_trace as _start_trace
+from cid_shared.tracing import trace_var as _trace_var
+
+# boto3 (~250 ms d'import) et concurrent.futures sont importés à la première
+# utilisation : un container servi par le snapshot local n'en a jamais besoin.
 
-dynamodb = boto3.resource("dynamodb")
 TABLE_NAME = os.environ["PRODUCTS_TABLE"]
 
+# GSI par attribut filtrable, du plus sélectif au moins sélectif :
+# parent_id (une sous-catégorie) > category (une famille) > type (~ la moitié de la table)
+QUERY_INDEXES = (
+    ("parent_id", "parent_id-index"),
+    ("category", "category-index"),
+    ("type", "type-index"),
+)
+# PRODUCTS_USE_INDEXES : index interrogés (ACTIVE seulement : un GSI en backfill refuse les Query)
+# - "1" : tous ; "0" : aucun -> ancien comportement (Scan + FilterExpression)
+# - liste d'attributs ("parent_id,category") : pendant le déploiement index par index
+_INDEXES_ENV = os.environ.get("PRODUCTS_USE_INDEXES", "1").strip()
+if _INDEXES_ENV in ("0", "1"):
+    ENABLED_INDEXES = frozenset(attr for attr, _ in QUERY_INDEXES) if _INDEXES_ENV == "1" else frozenset()
+else:
+    ENABLED_INDEXES = frozenset(x.strip() for x in _INDEXES_ENV.split(",") if x.strip())
+USE_INDEXES = bool(ENABLED_INDEXES)
+
+# Lecture via le client DynamoDB bas niveau + décodeur dédié (int/float/str natifs,
+# sans Decimal ni callback _json_default). PRODUCTS_FAST_DECODE=0 -> resource boto3.
+FAST_DECODE = os.environ.get("PRODUCTS_FAST_DECODE", "1") != "0"
+
+# Scan sans filtre découpé en segments parallèles (Segment / TotalSegments).
+# 1 = Scan séquentiel. Surcharge possible par requête : ?segments=N
+SCAN_SEGMENTS = int(os.environ.get("PRODUCTS_SCAN_SEGMENTS", "4"))
+MAX_SCAN_SEGMENTS = 16
+# items max par segment et par appel (réponse Lambda < 6 Mo)
+SCAN_SEGMENT_LIMIT = int(os.environ.get("PRODUCTS_SCAN_SEGMENT_LIMIT", "1000"))
+
+# GET /products?ids=a,b,c -> BatchGetItem (100 clés max par appel)
+BATCH_GET_CHUNK = 100
+# ids dans l'URL : 100 ids d'une soixantaine de caractères restent sous la limite de
+# 10 Ko d'API Gateway (ligne de requête + headers)
+MAX_BATCH_IDS = int(os.environ.get("PRODUCTS_MAX_BATCH_IDS", "100"))
+BATCH_GET_RETRIES = 6
+
+# ?fields=name,source_url -> ProjectionExpression (attributs écrits par seed_cid_products.py).
+# Sans ?fields=, les lectures de table projettent aussi sur ces champs publics : content_hash
+# (réservé à seed_cid_products.py --sync) ne sort pas de l'API.
+PROJECTABLE_FIELDS = ("product_id", "type", "level", "name", "category", "parent_id", "source_url", "active")
+
+# Snapshot du catalogue produit par seed_cid_products.py --snapshot :
+# chemin local ou s3://bucket/key. Vide -> lecture DynamoDB.
+CATALOG_SNAPSHOT = os.environ.get("CATALOG_SNAPSHOT", "")
+SNAPSHOT_CHECK_INTERVAL = float(os.environ.get("CATALOG_SNAPSHOT_CHECK_INTERVAL", "30"))  # s
+# taille de page par défaut (réponse Lambda < 6 Mo, comme une page Scan de 1 Mo)
+SNAPSHOT_PAGE_ITEMS = int(os.environ.get("CATALOG_SNAPSHOT_PAGE_ITEMS", "2000"))
+
+# GET /products/search?q= : index inversé en mémoire sur name + category (cf. _SearchIndex),
+# construit depuis le snapshot s'il est configuré, sinon par un Scan de la table hors requête
+# (init avec EAGER_INIT, sinon tâche de fond lancée par la première recherche -> 503 d'ici là),
+# relancé seulement quand la version du catalogue change (cf. _check_catalog_version).
+# SEARCH_REFRESH_INTERVAL : rafraîchissement périodique, pour une table sans item de version
+SEARCH_REFRESH_INTERVAL = float(os.environ.get("PRODUCTS_SEARCH_REFRESH_INTERVAL", "300"))  # s
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_QUERY_CHARS = 200
+SEARCH_MIN_PREFIX = 2        # dernier mot de la requête traité en préfixe à partir de 2 caractères
+SEARCH_MAX_EXPANSIONS = 50   # mots du vocabulaire retenus pour un préfixe (ordre alphabétique)
+SEARCH_MAX_CANDIDATES = 1000  # au-delà : total minoré ("total_relation": "gte")
+SEARCH_REBUILD_RATIO = 0.2   # mises à jour incrémentales cumulées avant reconstruction complète
+
+# GET /products/{id} sans snapshot : cache LRU par container devant get_item (cf. _get_product).
+# Trafic concentré sur quelques produits (AdBlue, granulés) -> la plupart des détails sans
+# appel DynamoDB. Vidé quand l'item de version écrit par seed_cid_products.py (CATALOG_META_ID)
+# change, relu au plus toutes les CATALOG_VERSION_CHECK_INTERVAL secondes ; le TTL reste le
+# filet de sécurité (écritures hors seeder). Cette version part aussi en X-Catalog-Version,
+# comme celle du snapshot : le BFF vide son propre cache quand elle change.
+# TTL=0 -> désactivé ; NEGATIVE_TTL : 404 gardés moins longtemps (0 = jamais)
+DETAIL_CACHE_TTL = float(os.environ.get("PRODUCTS_DETAIL_CACHE_TTL", "60"))  # s
+DETAIL_CACHE_NEGATIVE_TTL = float(os.environ.get("PRODUCTS_DETAIL_CACHE_NEGATIVE_TTL", "5"))  # s
+DETAIL_CACHE_MAX_ITEMS = int(os.environ.get("PRODUCTS_DETAIL_CACHE_MAX_ITEMS", "5000"))
+DETAIL_CACHE_MAX_BYTES = int(os.environ.get("PRODUCTS_DETAIL_CACHE_MAX_BYTES", str(16 * 2**20)))
+CATALOG_VERSION_CHECK_INTERVAL = float(os.environ.get("PRODUCTS_CATALOG_VERSION_CHECK_INTERVAL", "30"))  # s
+
+# Item de version du catalogue dans la table (même clé que le seeder) : jamais renvoyé par l'API
+CATALOG_META_ID = "__catalog_meta__"
+
+# Traces (TRACE_SAMPLE_RATE, cf. cid_shared.tracing) : spans dynamodb (avec
+# ReturnConsumedCapacity), decode, serialize, compress.
+
+_scan_executor = None
+_local = threading.local()
+
+# -----------------------------
+# Initialisation (lazy, gardée entre invocations warm)
+# -----------------------------
+_startup = _StartupProfile("products", _MODULE_T0)  # STARTUP_PROFILE / EAGER_INIT, cf. cid_shared.startup
+_dynamodb = None
+_table = None
+_client = None
+_s3 = None
+
+
+def _products_table():
+    global _dynamodb, _table
+    if _table is None:
+        t0 = time.perf_counter()
+        import boto3
+        _startup.mark_init("import_boto3", t0)
+
+        t0 = time.perf_counter()
+        _dynamodb = boto3.resource("dynamodb")
+        _table = _dynamodb.Table(TABLE_NAME)
+        _startup.mark_init("dynamodb_table", t0)
+    return _table
+
+
+def _dynamodb_client():
+    # client botocore : thread-safe (partagé par les segments / lots), sans boto3 à importer
+    global _client
+    if _client is None:
+        t0 = time.perf_counter()
+        import botocore.config
+        import botocore.session
+        config = botocore.config.Config(max_pool_connections=MAX_SCAN_SEGMENTS)
+        _client = botocore.session.get_session().create_client("dynamodb", config=config)
+        _startup.mark_init("dynamodb_client", t0)
+    return _client
+
+
+def _s3_client():
+    global _s3
+    if _s3 is None:
+        t0 = time.perf_counter()
+        import botocore.session
+        _s3 = botocore.session.get_session().create_client("s3")
+        _startup.mark_init("s3_client", t0)
+    return _s3
+
 
 def _json_default(o):
     if isinstance(o, Decimal):
@@ -23,83 +171,1040 @@ def _resp(status: int, payload, headers: Optional[Dict[str, str]] = None):
     base_headers = {"Content-Type": "application/json"}
     if headers:
         base_headers.update(headers)
+    if _inprocess_var.get():  # cf. cid_shared.inprocess
+        return {"statusCode": status, "headers": base_headers, "payload": payload}
+    with _span("serialize"):
+        body = json.dumps(payload, default=_json_default)
     return {
         "statusCode": status,
         "headers": base_headers,
-        "body": json.dumps(payload, default=_json_default),
+        "body": body,
     }
 
 
+# -----------------------------
+# Traces par requête (cf. cid_shared.tracing)
+# -----------------------------
+# contextvars (trace_var, _inprocess_var) : copiées vers les threads du pool de scan / BatchGet (_pool_map)
+
+
+def _dynamodb_call(op: str, fn, **kwargs) -> Dict[str, Any]:
+    """Appel DynamoDB (client ou resource) ; requête tracée : span + ReturnConsumedCapacity."""
+    trace = _trace_var.get()
+    if trace is None:
+        return fn(**kwargs)
+    with _Span(trace, "dynamodb") as span:
+        res = fn(ReturnConsumedCapacity="TOTAL", **kwargs)
+        consumed = res.get("ConsumedCapacity")
+        if isinstance(consumed, list):  # BatchGetItem : une entrée par table
+            units = sum(c.get("CapacityUnits") or 0 for c in consumed)
+        else:
+            units = (consumed or {}).get("CapacityUnits")
+        span.set(op=op, capacity_units=units)
+        if "Count" in res:
+            span.set(count=res["Count"], scanned=res.get("ScannedCount"))
+    return res
+
+
+def _pool_map(fn, items):
+    # chaque tâche dans une copie du contexte de la requête (trace visible dans le thread)
+    ctx = contextvars.copy_context()
+    return _scan_pool().map(lambda item: ctx.copy().run(fn, item), items)
+
+
 def _get_qs(event) -> Dict[str, str]:
     # API Gateway REST: queryStringParameters peut être None
     return event.get("queryStringParameters") or {}
 
 
+def _plan(filters: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Petit planificateur : filtres d'égalité -> ("query" | "scan", kwargs).
+    - au moins un filtre indexé (index activé, cf. ENABLED_INDEXES) -> Query sur le GSI
+      le plus sélectif, les autres filtres en FilterExpression
+    - aucun filtre -> Scan
+    Expressions en texte (#k / :k) : valables pour la resource comme pour le client bas niveau.
+    """
+    kwargs: Dict[str, Any] = {}
+    names: Dict[str, str] = {}
+    values: Dict[str, Any] = {}
+    rest = dict(filters)
+
+    op = "scan"
+    if USE_INDEXES:
+        for attr, index_name in QUERY_INDEXES:
+            if attr in rest and attr in ENABLED_INDEXES:
+                names["#k0"], values[":k0"] = attr, rest.pop(attr)
+                kwargs["IndexName"] = index_name
+                kwargs["KeyConditionExpression"] = "#k0 = :k0"
+                op = "query"
+                break
+
+    conds = []
+    for i, (attr, value) in enumerate(rest.items()):
+        names[f"#f{i}"], values[f":f{i}"] = attr, value
+        conds.append(f"#f{i} = :f{i}")
+    if op == "scan":
+        # l'item de version n'a aucun attribut indexé : seul un Scan le lit
+        names["#meta"], values[":meta"] = "product_id", CATALOG_META_ID
+        conds.append("#meta <> :meta")
+    if conds:
+        kwargs["FilterExpression"] = " AND ".join(conds)
+
+    if names:
+        kwargs["ExpressionAttributeNames"] = names
+        kwargs["ExpressionAttributeValues"] = values
+    return op, kwargs
+
+
+def _with_projection(kwargs: Dict[str, Any], projection: Dict[str, Any]) -> Dict[str, Any]:
+    # les placeholders #p* de _projection ne recoupent pas ceux de _plan
+    if not projection:
+        return kwargs
+    names = dict(kwargs.get("ExpressionAttributeNames") or {}, **projection["ExpressionAttributeNames"])
+    return dict(kwargs, ProjectionExpression=projection["ProjectionExpression"], ExpressionAttributeNames=names)
+
+
+def _projection(raw: Optional[str]) -> Dict[str, Any]:
+    """
+    fields=a,b,c -> kwargs ProjectionExpression pour get_item / query / scan / batch_get.
+    Noms via ExpressionAttributeNames (name, type, level sont des mots réservés).
+    product_id est toujours inclus. Champ inconnu -> ValueError.
+    """
+    if raw is None:
+        return {}
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in PROJECTABLE_FIELDS]
+    if unknown or not fields:
+        raise ValueError(unknown)
+
+    fields = list(dict.fromkeys(["product_id"] + fields))
+    names = {f"#p{i}": f for i, f in enumerate(fields)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+_PUBLIC_PROJECTION = _projection(",".join(PROJECTABLE_FIELDS))
+
+
+def _encode_token(obj: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(obj).encode("utf-8")).decode("utf-8")
+
+
+def _decode_token(token: str) -> Any:
+    return json.loads(base64.urlsafe_b64decode(token.encode("utf-8")).decode("utf-8"))
+
+
+# -----------------------------
+# Décodage rapide (client bas niveau)
+# -----------------------------
+def _decode_number(n: str):
+    # même résultat que _json_default(Decimal(n)), Decimal seulement pour les non-entiers
+    if "." in n or "e" in n or "E" in n:
+        return _json_default(Decimal(n))
+    return int(n)
+
+
+def _decode_value(av: Dict[str, Any]):
+    (t, v), = av.items()
+    if t == "S" or t == "BOOL":
+        return v
+    if t == "N":
+        return _decode_number(v)
+    if t == "NULL":
+        return None
+    if t == "M":
+        return _decode_item(v)
+    if t == "L":
+        return [_decode_value(x) for x in v]
+    if t == "SS":
+        return list(v)
+    if t == "NS":
+        return [_decode_number(x) for x in v]
+    if t == "B":
+        return base64.b64encode(v).decode("ascii")
+    if t == "BS":
+        return [base64.b64encode(x).decode("ascii") for x in v]
+    raise TypeError(f"Unsupported DynamoDB type descriptor {t!r}")
+
+
+def _decode_item(item: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    # S et N couvrent tous les attributs du seeder : testés en premier, sans appel de fonction
+    out = {}
+    for k, av in item.items():
+        v = av.get("S")
+        if v is not None:
+            out[k] = v
+            continue
+        v = av.get("N")
+        out[k] = _decode_value(av) if v is None else _decode_number(v)
+    return out
+
+
+def _encode_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, str):
+        return {"S": v}
+    if isinstance(v, bool):
+        return {"BOOL": v}
+    if isinstance(v, (int, float, Decimal)):
+        return {"N": str(v)}
+    if v is None:
+        return {"NULL": True}
+    if isinstance(v, dict):
+        return {"M": _encode_item(v)}
+    if isinstance(v, (list, tuple)):
+        return {"L": [_encode_value(x) for x in v]}
+    raise TypeError(f"Unsupported value for DynamoDB: {type(v).__name__}")
+
+
+def _encode_item(item: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {k: _encode_value(v) for k, v in item.items()}
+
+
+def _fast_read(op: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    query / scan / get_item sur le client bas niveau, kwargs au format resource
+    (valeurs Python) ; réponse au même format que la resource (Items / Item /
+    LastEvaluatedKey décodés), donc next_token identique dans les deux modes.
+    """
+    req = dict(kwargs, TableName=TABLE_NAME)
+    for k in ("Key", "ExclusiveStartKey", "ExpressionAttributeValues"):
+        if k in req:
+            req[k] = _encode_item(req[k])
+
+    res = _dynamodb_call(op, getattr(_dynamodb_client(), op), **req)
+    with _span("decode"):
+        if "Items" in res:
+            res["Items"] = [_decode_item(it) for it in res["Items"]]
+        if "Item" in res:
+            res["Item"] = _decode_item(res["Item"])
+        if "LastEvaluatedKey" in res:
+            res["LastEvaluatedKey"] = _decode_item(res["LastEvaluatedKey"])
+    return res
+
+
+def _fast_batch_get(request: Dict[str, Any]) -> Dict[str, Any]:
+    """BatchGetItem bas niveau ; Responses et UnprocessedKeys rendus au format resource."""
+    typed = {name: dict(req, Keys=[_encode_item(k) for k in req["Keys"]]) for name, req in request.items()}
+    res = _dynamodb_call("batch_get_item", _dynamodb_client().batch_get_item, RequestItems=typed)
+    with _span("decode"):
+        responses = {name: [_decode_item(it) for it in items] for name, items in res.get("Responses", {}).items()}
+        unprocessed = {
+            name: dict(req, Keys=[_decode_item(k) for k in req["Keys"]])
+            for name, req in (res.get("UnprocessedKeys") or {}).items()
+        }
+    return {"Responses": responses, "UnprocessedKeys": unprocessed}
+
+
+def _thread_resource():
+    # les ressources boto3 ne sont pas thread-safe : une par thread du pool
+    resource = getattr(_local, "resource", None)
+    if resource is None:
+        import boto3
+        resource = boto3.session.Session().resource("dynamodb")
+        _local.resource = resource
+    return resource
+
+
+def _thread_table():
+    table = getattr(_local, "table", None)
+    if table is None:
+        table = _thread_resource().Table(TABLE_NAME)
+        _local.table = table
+    return table
+
+
+def _scan_pool():
+    global _scan_executor
+    if _scan_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _scan_executor = ThreadPoolExecutor(max_workers=MAX_SCAN_SEGMENTS, thread_name_prefix="scan")
+    return _scan_executor
+
+
+def _valid_segment_positions(positions: Any) -> bool:
+    """Token segmenté : 1..MAX_SCAN_SEGMENTS positions {} / {"product_id": str} / null, au moins une non nulle."""
+    if not isinstance(positions, list) or not 0 < len(positions) <= MAX_SCAN_SEGMENTS:
+        return False
+    for pos in positions:
+        if pos is None or pos == {}:
+            continue
+        if not isinstance(pos, dict) or set(pos) != {"product_id"} or not isinstance(pos["product_id"], str):
+            return False
+    return any(pos is not None for pos in positions)
+
+
+def _valid_start_key(start: Dict[str, Any], key_attrs: Tuple[str, ...]) -> bool:
+    """Token de reprise (LastEvaluatedKey) : exactement les attributs de clé attendus, en chaînes."""
+    return set(start) == set(key_attrs) and all(isinstance(start[k], str) for k in key_attrs)
+
+
+def _segmented_scan(read_kwargs: Dict[str, Any], positions: List[Optional[Dict[str, Any]]]):
+    """
+    Un appel Scan par segment encore actif, en parallèle ; items fusionnés dans l'ordre des segments.
+
+    positions[i] : {} = début du segment, LastEvaluatedKey = reprise, None = segment terminé.
+    Renvoie (items, positions suivantes ou None si tout est lu).
+
+    Avec Limit : ceil(Limit / segments actifs) par segment, puis page fusionnée coupée à Limit ;
+    un segment coupé reprend après son dernier item renvoyé (clé de la table = product_id,
+    toujours présent même avec ?fields=).
+    """
+    total = len(positions)
+    active = [seg for seg, pos in enumerate(positions) if pos is not None]
+
+    limit = read_kwargs.get("Limit")
+    per_segment = SCAN_SEGMENT_LIMIT if limit is None else max(1, -(-limit // len(active)))
+
+    def scan_segment(seg: int):
+        kwargs = dict(read_kwargs, Segment=seg, TotalSegments=total, Limit=per_segment)
+        if positions[seg]:
+            kwargs["ExclusiveStartKey"] = positions[seg]
+        res = _fast_read("scan", kwargs) if FAST_DECODE else _dynamodb_call("scan", _thread_table().scan, **kwargs)
+        return res.get("Items", []), res.get("LastEvaluatedKey")
+
+    results = dict(zip(active, _pool_map(scan_segment, active)))
+
+    items: List[Dict[str, Any]] = []
+    following: List[Optional[Dict[str, Any]]] = []
+    for seg in range(total):
+        seg_items, lek = results.get(seg, ([], None))
+        if limit is not None and len(items) + len(seg_items) > limit:
+            kept = seg_items[:limit - len(items)]
+            lek = {"product_id": kept[-1]["product_id"]} if kept else positions[seg]
+            seg_items = kept
+        items.extend(seg_items)
+        following.append(lek)
+
+    if all(pos is None for pos in following):
+        return items, None
+    return items, following
+
+
+class _BatchGetThrottled(Exception):
+    def __init__(self, unprocessed: List[str]):
+        super().__init__(len(unprocessed))
+        self.unprocessed = unprocessed
+
+
+def _batch_get_chunk(ids: List[str], projection: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Un BatchGetItem (<= 100 clés). Les UnprocessedKeys sont rejouées avec un
+    backoff exponentiel "full jitter" ; au-delà de BATCH_GET_RETRIES -> _BatchGetThrottled.
+    """
+    request = {TABLE_NAME: dict(projection, Keys=[{"product_id": x} for x in ids])}
+    found: List[Dict[str, Any]] = []
+
+    for attempt in range(BATCH_GET_RETRIES + 1):
+        if attempt:
+            time.sleep(random.uniform(0, min(1.0, 0.05 * (2 ** attempt))))
+        if FAST_DECODE:
+            res = _fast_batch_get(request)
+        else:
+            res = _dynamodb_call("batch_get_item", _thread_resource().batch_get_item, RequestItems=request)
+        found.extend(res.get("Responses", {}).get(TABLE_NAME, []))
+        request = res.get("UnprocessedKeys") or {}
+        if not request:
+            return found
+
+    raise _BatchGetThrottled([k["product_id"] for k in request[TABLE_NAME]["Keys"]])
+
+
+def _batch_get(ids: List[str], projection: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Lecture groupée par product_id, morceaux de 100 en parallèle.
+    Renvoie (items dans l'ordre des ids demandés, ids introuvables).
+    """
+    chunks = [ids[i:i + BATCH_GET_CHUNK] for i in range(0, len(ids), BATCH_GET_CHUNK)]
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for found in _pool_map(lambda chunk: _batch_get_chunk(chunk, projection), chunks):
+        for item in found:
+            by_id[item["product_id"]] = item
+    by_id.pop(CATALOG_META_ID, None)  # item de version : jamais renvoyé
+
+    items = [by_id[x] for x in ids if x in by_id]
+    missing = [x for x in ids if x not in by_id]
+    return items, missing
+
+
+# -----------------------------
+# Snapshot catalogue en mémoire
+# -----------------------------
+class _Snapshot:
+    """
+    Catalogue complet en mémoire, indexé par product_id et par attribut filtrable.
+    Items triés par product_id ; les index stockent des positions croissantes,
+    ce qui permet de reprendre une pagination avec un simple bisect.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.version: str = data["version"]
+        self.items: List[Dict[str, Any]] = sorted(data["items"], key=lambda x: x["product_id"])
+        self.ids: List[str] = [it["product_id"] for it in self.items]
+        self.by_id: Dict[str, Dict[str, Any]] = dict(zip(self.ids, self.items))
+        self.by_attr: Dict[str, Dict[str, List[int]]] = {attr: {} for attr, _ in QUERY_INDEXES}
+        for pos, it in enumerate(self.items):
+            for attr, index in self.by_attr.items():
+                v = it.get(attr)
+                if v is not None:
+                    index.setdefault(v, []).append(pos)
+
+    def select(self, filters: Dict[str, str]) -> List[int]:
+        # même logique que _plan : l'index le plus sélectif, puis filtre sur le reste
+        rest = dict(filters)
+        candidates: Any = range(len(self.items))
+        for attr, _ in QUERY_INDEXES:
+            if attr in rest:
+                candidates = self.by_attr[attr].get(rest.pop(attr), [])
+                break
+        if rest:
+            items = self.items
+            candidates = [i for i in candidates if all(items[i].get(k) == v for k, v in rest.items())]
+        return candidates
+
+    def page(self, candidates: List[int], start: Optional[Dict[str, Any]], limit: int):
+        """-> (items, product_id du dernier item si la liste continue)"""
+        i = 0
+        if start and start.get("product_id"):
+            # positions >= threshold <=> product_id > celui du token
+            threshold = bisect.bisect_right(self.ids, start["product_id"])
+            i = bisect.bisect_left(candidates, threshold)
+        out = [self.items[pos] for pos in candidates[i:i + limit]]
+        more = i + limit < len(candidates)
+        return out, (out[-1]["product_id"] if more and out else None)
+
+
+_snapshot: Optional[_Snapshot] = None
+_snapshot_marker: Any = None      # mtime/taille (fichier) ou ETag (S3) du dernier chargement
+_snapshot_checked_at = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def _snapshot_source_marker() -> Any:
+    if CATALOG_SNAPSHOT.startswith("s3://"):
+        bucket, _, key = CATALOG_SNAPSHOT[5:].partition("/")
+        return _s3_client().head_object(Bucket=bucket, Key=key)["ETag"]
+    st = os.stat(CATALOG_SNAPSHOT)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _snapshot_read() -> Dict[str, Any]:
+    if CATALOG_SNAPSHOT.startswith("s3://"):
+        bucket, _, key = CATALOG_SNAPSHOT[5:].partition("/")
+        raw = _s3_client().get_object(Bucket=bucket, Key=key)["Body"].read()
+    else:
+        with open(CATALOG_SNAPSHOT, "rb") as f:
+            raw = f.read()
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    return json.loads(raw)
+
+
+def _current_snapshot() -> Optional[_Snapshot]:
+    """
+    Snapshot chargé au premier appel puis gardé par le container.
+    Toutes les SNAPSHOT_CHECK_INTERVAL secondes : la source a-t-elle changé ?
+    Si oui et que la version diffère -> rechargement. En cas d'erreur on garde
+    l'ancien snapshot (ou None -> lecture DynamoDB).
+    """
+    global _snapshot, _snapshot_marker, _snapshot_checked_at
+    if not CATALOG_SNAPSHOT:
+        return None
+
+    now = time.monotonic()
+    if _snapshot is not None and now - _snapshot_checked_at < SNAPSHOT_CHECK_INTERVAL:
+        return _snapshot
+
+    with _snapshot_lock:
+        if _snapshot is not None and now - _snapshot_checked_at < SNAPSHOT_CHECK_INTERVAL:
+            return _snapshot
+        _snapshot_checked_at = now
+        try:
+            with _span("snapshot") as span:
+                marker = _snapshot_source_marker()
+                span.set(changed=marker != _snapshot_marker)
+            if marker != _snapshot_marker:
+                with _span("snapshot_load"):
+                    data = _snapshot_read()
+                if _snapshot is None or data["version"] != _snapshot.version:
+                    _snapshot = _Snapshot(data)
+                    print(json.dumps({"msg": "catalog_snapshot_loaded", "version": _snapshot.version,
+                                      "items": len(_snapshot.items)}))
+                _snapshot_marker = marker
+        except Exception as e:
+            print(json.dumps({"msg": "catalog_snapshot_unavailable", "error": repr(e)}))
+        return _snapshot
+
+
+# -----------------------------
+# Recherche : index inversé en mémoire
+# -----------------------------
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae"})
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# mots vides (et élisions l' / d') : ni indexés ni cherchés
+_STOPWORDS = frozenset("a au aux avec d de des du en et l la le les par pour sur un une".split())
+
+# poids d'un mot de la requête selon où il matche
+_SCORE_NAME_EXACT = 3.0
+_SCORE_NAME_PREFIX = 2.0
+_SCORE_CATEGORY_EXACT = 1.0
+_SCORE_CATEGORY_PREFIX = 0.5
+_SCORE_LEADING = 1.0  # le nom commence par le 1er mot cherché
+
+
+def _search_words(text: str) -> List[str]:
+    """"Granulés de BOIS – sac 15kg" -> ["granules", "bois", "sac", "15kg"] (sans accents ni mots vides)."""
+    folded = unicodedata.normalize("NFKD", text.lower().translate(_LIGATURES))
+    folded = folded.encode("ascii", "ignore").decode("ascii")
+    return [w for w in _WORD_RE.findall(folded) if w not in _STOPWORDS]
+
+
+def _search_rank(item: Dict[str, Any]):
+    # ordre statique des documents : catégories d'abord, puis noms courts (plus spécifiques)
+    name = item.get("name") or ""
+    return item.get("type") != "category", len(name), name
+
+
+class _SearchIndex:
+    """
+    Index inversé mot -> ids de documents + vocabulaire trié (préfixes par bisect).
+
+    Les ids suivent l'ordre statique _search_rank : les listes de postings, en ordre
+    croissant, donnent les meilleurs candidats en premier, ce qui permet de s'arrêter
+    à SEARCH_MAX_CANDIDATES sans tout parcourir. Mise à jour incrémentale (update) :
+    un document modifié est marqué supprimé et ré-ajouté en fin ; au-delà de
+    SEARCH_REBUILD_RATIO de changements cumulés, update() demande une reconstruction.
+    """
+
+    def __init__(self, items: List[Dict[str, Any]], version: Optional[str] = None):
+        self.version = version
+        self.docs: List[Optional[Dict[str, Any]]] = []  # id -> item (None = supprimé)
+        self.words: List[Tuple[Tuple[str, ...], Tuple[str, ...]]] = []  # id -> (mots du nom, de category)
+        self.by_pid: Dict[str, int] = {}
+        self.postings: Dict[str, List[int]] = {}
+        self.changes = 0
+        self.lock = threading.Lock()
+        for item in sorted(items, key=_search_rank):
+            self._add(item)
+        self.vocab: List[str] = sorted(self.postings)
+
+    def __len__(self) -> int:
+        return len(self.by_pid)
+
+    def _add(self, item: Dict[str, Any]) -> List[str]:
+        """Ajoute un document ; renvoie les mots nouveaux pour le vocabulaire."""
+        doc_id = len(self.docs)
+        name_words = tuple(_search_words(item.get("name") or ""))
+        cat_words = tuple(_search_words(item.get("category") or ""))
+        self.docs.append(item)
+        self.words.append((name_words, cat_words))
+        self.by_pid[item["product_id"]] = doc_id
+        new = []
+        for w in set(name_words + cat_words):
+            posting = self.postings.get(w)
+            if posting is None:
+                posting = self.postings[w] = []
+                new.append(w)
+            posting.append(doc_id)
+        return new
+
+    def update(self, items: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """
+        Applique l'état `items` (catalogue complet) : seuls les documents ajoutés,
+        modifiés ou disparus sont touchés. None si une reconstruction est préférable.
+        Le diff est calculé hors verrou ; les recherches ne voient que l'état avant / après.
+        """
+        seen = set()
+        added: List[Dict[str, Any]] = []
+        replaced: List[Tuple[int, Dict[str, Any]]] = []
+        reindexed: List[Tuple[int, Dict[str, Any]]] = []
+        for item in items:
+            pid = item["product_id"]
+            seen.add(pid)
+            doc_id = self.by_pid.get(pid)
+            if doc_id is None:
+                added.append(item)
+                continue
+            old = self.docs[doc_id]
+            if old is item or old == item:
+                continue
+            if old.get("name") == item.get("name") and old.get("category") == item.get("category"):
+                replaced.append((doc_id, item))   # mêmes mots : document remplacé sur place
+            else:
+                reindexed.append((doc_id, item))
+        removed = [doc_id for pid, doc_id in self.by_pid.items() if pid not in seen]
+
+        if self.changes + len(added) + len(reindexed) + len(removed) > SEARCH_REBUILD_RATIO * max(len(self), 1):
+            return None
+        with self.lock:
+            for doc_id, item in replaced:
+                self.docs[doc_id] = item
+            for doc_id in removed + [doc_id for doc_id, _ in reindexed]:
+                del self.by_pid[self.docs[doc_id]["product_id"]]
+                self.docs[doc_id] = None  # les postings gardent l'id, ignoré à la recherche
+            new_words: List[str] = []
+            for item in added + [item for _, item in reindexed]:
+                new_words += self._add(item)
+            for w in new_words:
+                bisect.insort(self.vocab, w)
+            self.changes += len(added) + len(reindexed) + len(removed)
+        return {"added": len(added), "updated": len(replaced) + len(reindexed), "removed": len(removed)}
+
+    def _expand(self, prefix: str) -> List[str]:
+        vocab = self.vocab
+        i = bisect.bisect_left(vocab, prefix)
+        out = []
+        while i < len(vocab) and vocab[i].startswith(prefix) and len(out) < SEARCH_MAX_EXPANSIONS:
+            out.append(vocab[i])
+            i += 1
+        return out
+
+    def search(self, query: str, limit: int, typ: Optional[str] = None):
+        """
+        -> (items classés, total, total exact ?). Tous les mots doivent matcher (ET) ;
+        le dernier vaut aussi en préfixe (autocomplétion) sauf s'il est suivi d'un espace.
+        """
+        words = list(dict.fromkeys(_search_words(query)))
+        if not words:
+            return [], 0, True
+        prefix = None
+        if not query[-1:].isspace() and len(words[-1]) >= SEARCH_MIN_PREFIX:
+            prefix = words.pop()
+        first = words[0] if words else prefix
+
+        with self.lock:
+            exact_lists = []
+            for w in words:
+                posting = self.postings.get(w)
+                if not posting:
+                    return [], 0, True
+                exact_lists.append(posting)
+            expansions = self._expand(prefix) if prefix else []
+            if prefix and not expansions:
+                return [], 0, True
+
+            # parcours de la liste la plus courte, en ordre statique ; le reste est vérifié
+            # sur les mots du document
+            shortest = min(exact_lists, key=len) if exact_lists else None
+            if shortest is not None and (not prefix or len(shortest) <= sum(len(self.postings[w]) for w in expansions)):
+                candidates: Any = shortest
+            else:
+                candidates = heapq.merge(*(self.postings[w] for w in expansions))
+
+            docs, doc_words = self.docs, self.words
+            matches: List[Tuple[float, int]] = []
+            last = -1
+            complete = True
+            for doc_id in candidates:
+                if doc_id == last:
+                    continue  # même document via deux mots du préfixe
+                last = doc_id
+                doc = docs[doc_id]
+                if doc is None or (typ and doc.get("type") != typ):
+                    continue
+                name_words, cat_words = doc_words[doc_id]
+                score = 0.0
+                for w in words:
+                    if w in name_words:
+                        score += _SCORE_NAME_EXACT
+                    elif w in cat_words:
+                        score += _SCORE_CATEGORY_EXACT
+                    else:
+                        break
+                else:
+                    if prefix:
+                        if prefix in name_words:
+                            score += _SCORE_NAME_EXACT
+                        elif any(w.startswith(prefix) for w in name_words):
+                            score += _SCORE_NAME_PREFIX
+                        elif prefix in cat_words:
+                            score += _SCORE_CATEGORY_EXACT
+                        elif any(w.startswith(prefix) for w in cat_words):
+                            score += _SCORE_CATEGORY_PREFIX
+                        else:
+                            continue
+                    if name_words and name_words[0].startswith(first):
+                        score += _SCORE_LEADING
+                    if len(matches) == SEARCH_MAX_CANDIDATES:
+                        complete = False
+                        break
+                    matches.append((-score, doc_id))
+            best = heapq.nsmallest(limit, matches)
+            return [docs[doc_id] for _, doc_id in best], len(matches), complete
+
+
+_search_index: Optional[_SearchIndex] = None
+_search_source: Any = None      # snapshot dont l'index est issu, ou "table" (version : _search_index.version)
+_search_built_at = 0.0
+_search_refreshing = False
+_search_lock = threading.Lock()
+
+
+def _scan_search_items() -> List[Dict[str, Any]]:
+    """Toute la table (champs publics), Scan segmenté en parallèle."""
+    read_kwargs = _with_projection(_plan({})[1], _PUBLIC_PROJECTION)
+    items: List[Dict[str, Any]] = []
+    positions: Optional[List[Optional[Dict[str, Any]]]] = [{}] * max(1, SCAN_SEGMENTS)
+    while positions:
+        batch, positions = _segmented_scan(read_kwargs, positions)
+        items.extend(batch)
+    return items
+
+
+def _apply_search_items(items: List[Dict[str, Any]], source: Any, version: Optional[str]) -> None:
+    """Mise à jour incrémentale de l'index courant, ou nouvel index (premier appel, trop de changements)."""
+    global _search_index, _search_source, _search_built_at
+    index = _search_index
+    with _span("search_index") as span:
+        stats = index.update(items) if index is not None else None
+        if stats is None:
+            index = _SearchIndex(items, version)
+            stats = {"rebuilt": len(index)}
+        index.version = version
+        if span:
+            span.set(**stats)
+    _search_index, _search_source, _search_built_at = index, source, time.monotonic()
+    print(json.dumps(dict(stats, msg="search_index_updated", version=version, docs=len(index))))
+
+
+def _refresh_search_index(version: Optional[str]) -> None:
+    """Scan de la table -> index à jour, étiqueté avec la version lue avant le Scan."""
+    global _search_refreshing
+    try:
+        items = _scan_search_items()
+        with _search_lock:
+            _apply_search_items(items, "table", version)
+    except Exception as e:
+        print(json.dumps({"msg": "search_index_refresh_failed", "error": repr(e)}))
+    finally:
+        _search_refreshing = False
+
+
+def _table_index_stale(version: Optional[str]) -> bool:
+    if _search_index is None or _search_source != "table":
+        return True
+    if version is not None:
+        return _search_index.version != version
+    return time.monotonic() - _search_built_at > SEARCH_REFRESH_INTERVAL
+
+
+def _current_search_index(snap: Optional[_Snapshot], version: Optional[str]) -> Optional[_SearchIndex]:
+    """
+    Index de recherche du container (None : pas encore construit) :
+    - snapshot : reconstruit / mis à jour quand _current_snapshot() en charge un nouveau
+    - table : Scan complet en tâche de fond quand `version` (item de version du catalogue)
+      diffère de celle de l'index, jamais dans la requête ; l'index en place (éventuellement
+      issu d'un snapshot devenu indisponible) reste servi pendant ce temps
+    """
+    global _search_refreshing
+    if snap is not None:
+        if _search_source is not snap:
+            with _search_lock:
+                if _search_source is not snap:
+                    _apply_search_items(snap.items, snap, snap.version)
+        return _search_index
+
+    if _table_index_stale(version) and not _search_refreshing:
+        _search_refreshing = True
+        # Lambda gèle le container après la réponse : le Scan peut finir au dégel suivant
+        threading.Thread(target=_refresh_search_index, args=(version,), daemon=True).start()
+    return _search_index
+
+
+# -----------------------------
+# Cache LRU des détails (table)
+# -----------------------------
+_detail_cache = _LRUCache(DETAIL_CACHE_MAX_ITEMS, DETAIL_CACHE_MAX_BYTES)
+_catalog_version: Optional[str] = None
+_catalog_version_checked_at = 0.0
+_catalog_version_lock = threading.Lock()
+
+
+def _check_catalog_version() -> Optional[str]:
+    """
+    Relit l'item de version (au plus toutes les CATALOG_VERSION_CHECK_INTERVAL secondes) et
+    vide _detail_cache s'il a changé depuis la dernière lecture (reseed). Erreur de lecture :
+    cache gardé, nouvel essai à l'intervalle suivant. -> version courante (None : jamais écrite).
+    """
+    global _catalog_version, _catalog_version_checked_at
+    now = time.monotonic()
+    if now - _catalog_version_checked_at < CATALOG_VERSION_CHECK_INTERVAL:
+        return _catalog_version
+    with _catalog_version_lock:
+        if now - _catalog_version_checked_at < CATALOG_VERSION_CHECK_INTERVAL:
+            return _catalog_version
+        _catalog_version_checked_at = now
+        kwargs = {"Key": {"product_id": CATALOG_META_ID}, "ProjectionExpression": "#v",
+                  "ExpressionAttributeNames": {"#v": "version"}}
+        try:
+            if FAST_DECODE:
+                res = _fast_read("get_item", kwargs)
+            else:
+                res = _dynamodb_call("get_item", _products_table().get_item, **kwargs)
+        except Exception as e:
+            print(json.dumps({"msg": "catalog_version_error", "error": repr(e)}))
+            return _catalog_version
+        version = (res.get("Item") or {}).get("version")
+        if version != _catalog_version:
+            if _catalog_version is not None:
+                print(json.dumps({"msg": "detail_cache_invalidated", "from": _catalog_version, "to": version}))
+            _detail_cache.clear()
+            _catalog_version = version
+        return version
+
+
+def _get_product(product_id: str) -> Optional[Dict[str, Any]]:
+    """
+    get_item derrière _detail_cache -> item public complet (None : absent, gardé aussi).
+    Toujours tous les champs publics : la projection (?fields=) ne change pas les RCU d'un
+    get_item, elle est appliquée après coup (_project) -> une seule entrée par produit.
+    La version du catalogue (invalidation) est vérifiée par _route avant l'appel.
+    """
+    if product_id == CATALOG_META_ID:
+        return None
+    item = _detail_cache.read(product_id) if DETAIL_CACHE_TTL > 0 else _MISS
+    if item is not _MISS:
+        return item
+
+    key = {"product_id": product_id}
+    if FAST_DECODE:
+        res = _fast_read("get_item", dict(_PUBLIC_PROJECTION, Key=key))
+    else:
+        res = _dynamodb_call("get_item", _products_table().get_item, Key=key, **_PUBLIC_PROJECTION)
+    item = res.get("Item")
+    if item is None:
+        _detail_cache.put(product_id, None, len(product_id), DETAIL_CACHE_NEGATIVE_TTL, negative=True)
+    else:
+        # taille estimée sans sérialiser (le JSON n'est produit qu'à la réponse) : clés + valeurs en texte
+        _detail_cache.put(product_id, item, sum(len(k) + len(str(v)) for k, v in item.items()), DETAIL_CACHE_TTL)
+    return item
+
+
+def _project(item: Dict[str, Any], projection: Dict[str, Any]) -> Dict[str, Any]:
+    if not projection:
+        return item
+    fields = projection["ExpressionAttributeNames"].values()
+    return {f: item[f] for f in fields if f in item}
+
+
 def handler(event, context):
-    table = dynamodb.Table(TABLE_NAME)
+    t0 = time.perf_counter()
+    trace = _start_trace(event)
+    _trace_var.set(trace)
+
+    res = _encode_response(event, _route(event, context))
+    if trace is not None:
+        res = finish_trace(trace, "products", event, res)
+    if _startup.pending:
+        _startup.report(t0, detail_cache=_detail_cache.metrics())
+    return res
+
+
+def invoke(event) -> Dict[str, Any]:
+    """
+    Entrée du BFF colocalisé (BFF_TRANSPORT=inprocess, cf. cid_shared.inprocess). Le payload
+    peut partager des objets avec le snapshot en mémoire : lecture seule.
+    """
+    return _invoke("products", _route, event)
+
+
+def _search(qs: Dict[str, str], projection: Dict[str, Any], snap: Optional[_Snapshot],
+            version: Optional[str], version_headers: Optional[Dict[str, str]]):
+    query = (qs.get("q") or "")[:SEARCH_MAX_QUERY_CHARS]
+    if not query.strip():
+        return _resp(400, {"error": "missing_q"})
+    typ = qs.get("type")
+    if typ and typ not in ("category", "product"):
+        return _resp(400, {"error": "invalid_type", "expected": ["category", "product"], "got": typ})
+    try:
+        limit = int(qs.get("limit") or SEARCH_DEFAULT_LIMIT)
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            raise ValueError(limit)
+    except ValueError:
+        return _resp(400, {"error": "invalid_limit", "max": SEARCH_MAX_LIMIT, "got": qs.get("limit")})
+
+    index = _current_search_index(snap, version)
+    if index is None:
+        # premier Scan de la table en cours (container sans EAGER_INIT)
+        return _resp(503, {"error": "search_index_building"}, {"Retry-After": "1"})
+    with _span("search") as span:
+        found, total, complete = index.search(query, limit, typ)
+        if span:
+            span.set(total=total, docs=len(index))
+    return _resp(200, {
+        "query": query,
+        "items": [_project(it, projection) for it in found],
+        "total": total,
+        "total_relation": "eq" if complete else "gte",
+    }, version_headers)
+
+
+def _route(event, context):
+    qs = _get_qs(event)
+    try:
+        projection = _projection(qs.get("fields"))
+    except ValueError:
+        return _resp(400, {"error": "invalid_fields", "allowed": list(PROJECTABLE_FIELDS), "got": qs.get("fields")})
+
+    # snapshot en mémoire si configuré (aucun appel DynamoDB), sinon table
+    snap = _current_snapshot()
+    # version du snapshot ou de l'item de version (table), renvoyée au BFF (invalidation)
+    version = snap.version if snap else _check_catalog_version()
+    version_headers = {"X-Catalog-Version": version} if version else None
+
+    # 0) Recherche: /products/search?q=...&type=product&limit=10 (avant le détail : chemin fixe)
+    if (event.get("path") or "").endswith("/products/search"):
+        return _search(qs, projection, snap, version, version_headers)
 
     # 1) Détail: /products/{product_id}
     path_params = event.get("pathParameters") or {}
     product_id = path_params.get("product_id")
+    if product_id and snap:
+        item = snap.by_id.get(product_id)
+        if not item:
+            return _resp(404, {"error": "product_not_found", "product_id": product_id}, version_headers)
+        return _resp(200, _project(item, projection), version_headers)
     if product_id:
-        res = table.get_item(Key={"product_id": product_id})
-        item = res.get("Item")
+        item = _get_product(product_id)
         if not item:
-            return _resp(404, {"error": "product_not_found", "product_id": product_id})
-        return _resp(200, item)
+            return _resp(404, {"error": "product_not_found", "product_id": product_id}, version_headers)
+        return _resp(200, _project(item, projection), version_headers)
 
-    # 2) Liste: /products + filtres
-    qs = _get_qs(event)
+    # 2) Lecture groupée: /products?ids=a,b,c (ordre conservé, doublons ignorés)
+    if qs.get("ids") is not None:
+        ids = list(dict.fromkeys(x.strip() for x in qs["ids"].split(",") if x.strip()))
+        if not ids:
+            return _resp(400, {"error": "invalid_ids"})
+        if len(ids) > MAX_BATCH_IDS:
+            return _resp(400, {"error": "too_many_ids", "max": MAX_BATCH_IDS, "got": len(ids)})
+        if snap:
+            items = [_project(snap.by_id[x], projection) for x in ids if x in snap.by_id]
+            missing = [x for x in ids if x not in snap.by_id]
+            return _resp(200, {"items": items, "missing": missing}, version_headers)
+        try:
+            items, missing = _batch_get(ids, projection or _PUBLIC_PROJECTION)
+        except _BatchGetThrottled as e:
+            return _resp(503, {"error": "batch_get_throttled", "unprocessed": e.unprocessed})
+        return _resp(200, {"items": items, "missing": missing}, version_headers)
 
+    # 3) Liste: /products + filtres
     typ = qs.get("type")          # "category" | "product"
     parent_id = qs.get("parent_id")
     category = qs.get("category")  # ex: "engrais" (optionnel)
 
-    # FilterExpression (scan)
-    filt = None
+    filters: Dict[str, str] = {}
 
     if typ:
         if typ not in ("category", "product"):
             return _resp(400, {"error": "invalid_type", "expected": ["category", "product"], "got": typ})
-        filt = Attr("type").eq(typ)
+        filters["type"] = typ
 
     if parent_id:
-        cond = Attr("parent_id").eq(parent_id)
-        filt = cond if filt is None else (filt & cond)
+        filters["parent_id"] = parent_id
 
     if category:
-        cond = Attr("category").eq(category)
-        filt = cond if filt is None else (filt & cond)
+        filters["category"] = category
+
+    # Query sur GSI si un filtre est indexé, sinon Scan
+    op, read_kwargs = _plan(filters)
+    read_kwargs = _with_projection(read_kwargs, projection or _PUBLIC_PROJECTION)
 
     # (optionnel) pagination basique
     limit = qs.get("limit")
     next_token = qs.get("next_token")
 
-    scan_kwargs: Dict[str, Any] = {}
-    if filt is not None:
-        scan_kwargs["FilterExpression"] = filt
     if limit:
         try:
-            scan_kwargs["Limit"] = int(limit)
+            read_kwargs["Limit"] = int(limit)
+            if read_kwargs["Limit"] < 1:
+                raise ValueError(limit)
         except ValueError:
             return _resp(400, {"error": "invalid_limit", "got": limit})
+    start = None
     if next_token:
         # next_token = JSON de LastEvaluatedKey encodé en base64-url (simple)
+        # (même format pour Scan et Query ; sur un GSI la clé contient aussi l'attribut indexé)
+        # Scan segmenté : {"segments": [LastEvaluatedKey | null, ...]} dans la même enveloppe
         try:
-            import base64
-            lek_json = base64.urlsafe_b64decode(next_token.encode("utf-8")).decode("utf-8")
-            scan_kwargs["ExclusiveStartKey"] = json.loads(lek_json)
+            start = _decode_token(next_token)
+            if not isinstance(start, dict):
+                raise ValueError(next_token)
         except Exception:
             return _resp(400, {"error": "invalid_next_token"})
 
-    res = table.scan(**scan_kwargs)
+    if snap:
+        # token de la table accepté (seul product_id compte), sauf un token segmenté
+        if start is not None and ("segments" in start or not isinstance(start.get("product_id"), str)):
+            return _resp(400, {"error": "invalid_next_token"})
+        page, last_id = snap.page(snap.select(filters), start, read_kwargs.get("Limit") or SNAPSHOT_PAGE_ITEMS)
+        payload: Dict[str, Any] = {"items": [_project(it, projection) for it in page]}
+        if last_id:
+            payload["next_token"] = _encode_token({"product_id": last_id})
+        return _resp(200, payload, version_headers)
+
+    segments = SCAN_SEGMENTS
+    if qs.get("segments"):
+        try:
+            segments = int(qs["segments"])
+        except ValueError:
+            return _resp(400, {"error": "invalid_segments", "got": qs["segments"]})
+    segments = max(1, min(segments, MAX_SCAN_SEGMENTS))
+
+    # Scan parallèle : premier appel sans filtre, ou reprise d'un token segmenté
+    positions = None
+    if start is not None and "segments" in start:
+        positions = start["segments"]
+        if op != "scan" or set(start) != {"segments"} or not _valid_segment_positions(positions):
+            return _resp(400, {"error": "invalid_next_token"})
+    elif start is None and op == "scan" and segments > 1:
+        positions = [{}] * segments
+    elif start is not None:
+        # clé de la table, plus l'attribut de l'index pour une Query : un token altéré ou
+        # venu d'une autre liste serait refusé par DynamoDB (ValidationException -> 500)
+        key_attrs = ("product_id",) if op == "scan" else ("product_id", read_kwargs["ExpressionAttributeNames"]["#k0"])
+        if not _valid_start_key(start, key_attrs):
+            return _resp(400, {"error": "invalid_next_token"})
+
+    if positions is not None:
+        items, following = _segmented_scan(read_kwargs, positions)
+        if following:
+            return _resp(200, {"items": items, "next_token": _encode_token({"segments": following})},
+                         version_headers)
+        return _resp(200, {"items": items}, version_headers)
+
+    if start is not None:
+        read_kwargs["ExclusiveStartKey"] = start
+
+    if FAST_DECODE:
+        res = _fast_read(op, read_kwargs)
+    else:
+        table = _products_table()
+        res = _dynamodb_call(op, table.query if op == "query" else table.scan, **read_kwargs)
     items: List[Dict[str, Any]] = res.get("Items", [])
 
     # renvoyer next_token si pagination
     lek = res.get("LastEvaluatedKey")
     if lek:
-        import base64
-        token = base64.urlsafe_b64encode(json.dumps(lek).encode("utf-8")).decode("utf-8")
-        return _resp(200, {"items": items, "next_token": token})
+        return _resp(200, {"items": items, "next_token": _encode_token(lek)}, version_headers)
+
+    return _resp(200, {"items": items}, version_headers)
+
+
+# -----------------------------
+# Fin de l'init du module
+# -----------------------------
+if EAGER_INIT:
+    if FAST_DECODE:
+        _dynamodb_client()
+    else:
+        _products_table()
+    # index de recherche construit pendant l'init aussi (snapshot, sinon Scan de la table)
+    _snap = _current_snapshot()
+    if _snap is not None:
+        _current_search_index(_snap, _snap.version)
+    else:
+        _refresh_search_index(_check_catalog_version())
 
-    return _resp(200, {"items": items})
\ No newline at end of file
+_startup.imported()
@@ -0,0 +1,10 @@
+"""
+Code commun aux services (layer Lambda cid-shared, cf. services/shared/template.yaml).
+
+- events : lecture des événements API Gateway
+- tracing : traces par requête (spans, Server-Timing, log JSON "trace")
+- encoding : compression des réponses (Accept-Encoding, gzip / br)
+- lru : cache LRU par container (TTL, bornes en entrées et en octets)
+- inprocess : appel des services par le BFF colocalisé (BFF_TRANSPORT=inprocess)
+- startup : profil de démarrage (STARTUP_PROFILE) et init anticipée (EAGER_INIT)
+"""
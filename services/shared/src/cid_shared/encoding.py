@@ -0,0 +1,68 @@
+"""
+Compression des réponses selon Accept-Encoding (gzip, br si `brotli` est installé).
+
+Au-delà de COMPRESS_MIN_BYTES, API Gateway attend un body base64 + isBase64Encoded
+(cf. BinaryMediaTypes "*~1*" des templates).
+"""
+import base64
+import gzip
+import os
+from typing import Any, Dict, Optional
+
+from cid_shared.events import header
+from cid_shared.tracing import span
+
+try:
+    import brotli  # optionnel : absent du runtime Lambda par défaut
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Accept-Encoding -> "br" | "gzip" | None (q=0 respecté, br préféré s'il est installé)."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    star = accepted.get("*", 0.0)
+    for enc in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(enc, star) > 0:
+            return enc
+    return None
+
+
+def compress(raw: bytes, encoding: str) -> bytes:
+    with span("compress"):
+        if encoding == "br":
+            return brotli.compress(raw, quality=5)
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+
+
+def encode_response(event, res: Dict[str, Any]) -> Dict[str, Any]:
+    """Compresse le body si le client l'accepte et qu'il dépasse COMPRESS_MIN_BYTES."""
+    body = res.get("body")
+    if not body or res.get("isBase64Encoded"):
+        return res
+    raw = body.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return res
+
+    headers = dict(res.get("headers") or {})
+    headers["Vary"] = "Accept-Encoding"
+    enc = negotiate_encoding(header(event, "Accept-Encoding"))
+    if enc:
+        res = dict(res, body=base64.b64encode(compress(raw, enc)).decode("ascii"), isBase64Encoded=True)
+        headers["Content-Encoding"] = enc
+    res["headers"] = headers
+    return res
@@ -0,0 +1,11 @@
+from typing import Optional
+
+
+def header(event, name: str) -> Optional[str]:
+    # API Gateway ne normalise pas la casse des headers
+    headers = event.get("headers") or {}
+    low = name.lower()
+    for k, v in headers.items():
+        if k.lower() == low:
+            return v
+    return None
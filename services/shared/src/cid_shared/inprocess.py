@@ -0,0 +1,31 @@
+"""
+Appel en processus par le BFF colocalisé (BFF_TRANSPORT=inprocess).
+
+products.app et contact.app sont alors empaquetés avec le BFF, qui appelle leur invoke(event)
+au lieu de passer par API Gateway : même routage que handler, mais réponse
+{"statusCode", "headers", "payload"} avec le payload Python tel quel (ni json.dumps ni
+compression). Pendant l'appel, `inprocess_var` vaut True : le _resp() des services renvoie
+alors le payload au lieu du body sérialisé.
+"""
+import contextvars
+from typing import Any, Callable, Dict
+
+from cid_shared.tracing import finish_trace, start_trace, trace_var
+
+inprocess_var: contextvars.ContextVar = contextvars.ContextVar("inprocess", default=False)
+
+
+def invoke(service: str, route: Callable[[Dict[str, Any], Any], Dict[str, Any]],
+           event: Dict[str, Any]) -> Dict[str, Any]:
+    """`route(event, context)` du service, tracé comme par son handler."""
+    trace = start_trace(event)
+    trace_token = trace_var.set(trace)
+    token = inprocess_var.set(True)
+    try:
+        res = route(event, None)
+    finally:
+        inprocess_var.reset(token)
+        trace_var.reset(trace_token)
+    if trace is not None:
+        res = finish_trace(trace, service, event, res)
+    return res
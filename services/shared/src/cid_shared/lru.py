@@ -0,0 +1,100 @@
+"""
+Cache LRU par container (détails produit de products-service et du BFF).
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from cid_shared.tracing import span
+
+# get() sur une clé absente ou expirée (None est une valeur légitime : 404 en cache négatif)
+MISS = object()
+
+
+class LRUCache:
+    """
+    LRU par container, borné en entrées et en octets (taille estimée à l'insertion),
+    avec un TTL par entrée : les 404 (négatifs) expirent plus tôt que les items. Thread-safe.
+    `name` : nom du span et du log JSON des compteurs (toutes les `log_every` lectures, cf. read).
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, name: str = "detail_cache", log_every: int = 1000):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.name = name
+        self.log_every = log_every
+        # clé -> (expire_at monotonic, taille, négatif, valeur) ; fin = plus récent
+        self.entries: "OrderedDict[Any, Tuple[float, int, bool, Any]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """-> valeur, ou MISS (absente ou expirée)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.entries[key]
+                self.bytes -= entry[1]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISS
+            self.entries.move_to_end(key)
+            if entry[2]:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[3]
+
+    def read(self, key: Any) -> Any:
+        """get() mesuré : span `name` (hit=...), log des compteurs toutes les `log_every` lectures."""
+        with span(self.name) as s:
+            value = self.get(key)
+            if s:
+                s.set(hit=value is not MISS)
+        if self.log_every and self.lookups() % self.log_every == 0:
+            print(json.dumps({"msg": self.name, **self.metrics()}))
+        return value
+
+    def put(self, key: Any, value: Any, size: int, ttl: float, negative: bool = False) -> None:
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (time.monotonic() + ttl, size, negative, value)
+            self.bytes += size
+            while len(self.entries) > self.max_items or self.bytes > self.max_bytes:
+                _, (_, evicted_size, _, _) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.bytes = 0
+
+    def lookups(self) -> int:
+        return self.hits + self.negative_hits + self.misses
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "items": len(self.entries), "bytes": self.bytes, "hits": self.hits,
+                "negative_hits": self.negative_hits, "misses": self.misses, "expired": self.expired,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+                "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,51 @@
+"""
+Profil de démarrage des handlers (cold start).
+
+- STARTUP_PROFILE=1 : au premier appel du container, log JSON "startup_profile" : durée
+  d'import du module (phase Init Lambda), durée de création de chaque client (créés au
+  premier usage, cf. StartupProfile.mark_init) et durée du premier appel
+- EAGER_INIT=1 : clients (products : aussi snapshot et index de recherche) créés pendant
+  l'init Lambda plutôt qu'au premier appel ; utile avec provisioned concurrency / SnapStart,
+  où l'init est payée hors requête
+"""
+import json
+import os
+import time
+from typing import Dict, Optional
+
+STARTUP_PROFILE = os.environ.get("STARTUP_PROFILE") == "1"
+EAGER_INIT = os.environ.get("EAGER_INIT") == "1"
+
+
+class StartupProfile:
+    """
+    Temps de démarrage d'un service ; `module_t0` : perf_counter() relevé en tête du module,
+    avant ses imports.
+    """
+
+    def __init__(self, service: str, module_t0: float):
+        self.service = service
+        self.module_t0 = module_t0
+        self.module_import_ms: Optional[float] = None
+        self.init_ms: Dict[str, float] = {}
+        self.pending = STARTUP_PROFILE
+
+    def mark_init(self, name: str, t0: float) -> None:
+        if STARTUP_PROFILE:
+            self.init_ms[name] = round((time.perf_counter() - t0) * 1000, 3)
+
+    def imported(self) -> None:
+        """Fin de l'import du module (dernière instruction du module)."""
+        self.module_import_ms = round((time.perf_counter() - self.module_t0) * 1000, 3)
+
+    def report(self, invoke_t0: float, **extra) -> None:
+        """Log "startup_profile", une seule fois ; `extra` : compteurs propres au service."""
+        self.pending = False
+        print(json.dumps({
+            "msg": "startup_profile",
+            "service": self.service,
+            "module_import_ms": self.module_import_ms,
+            "init_ms": self.init_ms,
+            "first_invoke_ms": round((time.perf_counter() - invoke_t0) * 1000, 3),
+            **extra,
+        }))
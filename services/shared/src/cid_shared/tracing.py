@@ -0,0 +1,138 @@
+"""
+Traces par requête (spans + Server-Timing), communes au BFF et aux services.
+
+TRACE_SAMPLE_RATE : part des requêtes tracées (0 = désactivé). Une requête reçue avec
+X-Trace-Sampled: 1 (posé par le BFF) est toujours tracée. Requête tracée :
+- étapes nommées mesurées (`with span("parse"): ...`)
+- log JSON {"msg": "trace", "service": ..., ...} avec tous les spans
+- header Server-Timing (durée cumulée par nom, + total)
+X-Correlation-Id (reçu, sinon requestId API Gateway) joint les traces du BFF et des services.
+"""
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from cid_shared.events import header
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+
+# Trace de la requête en cours. BFF_TRANSPORT=inprocess : un invoke() de service pose la
+# sienne (set/reset) et le BFF retrouve la sienne au retour.
+trace_var: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    def __init__(self, correlation_id: str):
+        self.correlation_id = correlation_id
+        self.t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, t0: float, t1: float, attrs: Dict[str, Any]) -> None:
+        span = {"name": name, "start_ms": round((t0 - self.t0) * 1000, 3), "dur_ms": round((t1 - t0) * 1000, 3)}
+        span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+
+    def server_timing(self, total_ms: float) -> str:
+        # durées cumulées par nom : des spans parallèles peuvent dépasser "total"
+        by_name: Dict[str, List[float]] = {}
+        for span in self.spans:
+            by_name.setdefault(span["name"], []).append(span["dur_ms"])
+        parts = []
+        for name, durations in by_name.items():
+            part = "%s;dur=%.3f" % (name, sum(durations))
+            if len(durations) > 1:
+                part += ';desc="x%d"' % len(durations)
+            parts.append(part)
+        parts.append("total;dur=%.3f" % total_ms)
+        return ", ".join(parts)
+
+
+class Span:
+    __slots__ = ("trace", "name", "attrs", "t0")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+        self.attrs: Dict[str, Any] = {}
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.add(self.name, self.t0, time.perf_counter(), self.attrs)
+        return False
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+class NoSpan:
+    # requête non tracée : rien à mesurer ; faux en booléen (`if span:` saute les attributs)
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+NO_SPAN = NoSpan()
+
+
+def span(name: str):
+    trace = trace_var.get()
+    return NO_SPAN if trace is None else Span(trace, name)
+
+
+def correlation_id(event) -> Optional[str]:
+    return header(event, "X-Correlation-Id") or (event.get("requestContext") or {}).get("requestId")
+
+
+def start_trace(event) -> Optional[Trace]:
+    sampled = TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+    if not sampled and header(event, "X-Trace-Sampled") != "1":
+        return None
+    return Trace(correlation_id(event) or str(uuid.uuid4()))
+
+
+def _json_default(o):
+    # attributs de span lus via la resource boto3 (Decimal)
+    if isinstance(o, Decimal):
+        return int(o) if o % 1 == 0 else float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def finish_trace(trace: Trace, service: str, event, res: Dict[str, Any]) -> Dict[str, Any]:
+    total_ms = (time.perf_counter() - trace.t0) * 1000
+    print(json.dumps({
+        "msg": "trace",
+        "service": service,
+        "correlation_id": trace.correlation_id,
+        "method": event.get("httpMethod"),
+        "path": event.get("rawPath") or event.get("path"),
+        "status": res.get("statusCode"),
+        "total_ms": round(total_ms, 3),
+        "spans": trace.spans,
+    }, ensure_ascii=False, default=_json_default))
+    headers = dict(res.get("headers") or {})
+    headers["Server-Timing"] = trace.server_timing(total_ms)
+    headers["X-Correlation-Id"] = trace.correlation_id
+    return dict(res, headers=headers)
@@ -0,0 +1,81 @@
+"""
+Tests des services (pytest) : chemins d'erreur, hors réseau et hors AWS.
+
+Mêmes outils que les benchmarks (benchmarks/common.py) : services importables, stubs
+HTTP locaux, catalogue synthétique, table DynamoDB moto.
+
+    pip install pytest boto3 moto
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)  # seed_cid_products
+
+from common import create_products_table, seed_products_table, set_default_env, synthetic_catalog  # noqa: E402
+
+set_default_env()
+
+
+def api_event(method: str, path: str, qs=None, product_id=None, headers=None):
+    """Événement API Gateway (REST, v1) minimal."""
+    return {
+        "httpMethod": method,
+        "path": path,
+        "headers": headers or {},
+        "queryStringParameters": qs,
+        "pathParameters": {"product_id": product_id} if product_id else None,
+        "body": None,
+    }
+
+
+def put_catalog_version(app, version: str) -> None:
+    """Item de version du catalogue, comme seed_cid_products.write_catalog_version."""
+    import boto3
+
+    boto3.client("dynamodb").put_item(TableName=app.TABLE_NAME, Item={
+        "product_id": {"S": app.CATALOG_META_ID}, "version": {"S": version}})
+
+
+@pytest.fixture
+def catalog():
+    categories, products = synthetic_catalog(60, n_top=2, per_top=3)
+    return categories + products
+
+
+@pytest.fixture
+def products(monkeypatch, catalog):
+    """products.app devant une table moto seedée (pas de snapshot), état du container remis à zéro."""
+    from moto import mock_aws
+    import boto3
+
+    with mock_aws():
+        seed_products_table(create_products_table(boto3.resource("dynamodb")), catalog)
+        from products import app
+
+        monkeypatch.setattr(app, "_client", None)
+        monkeypatch.setattr(app, "_table", None)
+        monkeypatch.setattr(app, "_local", app.threading.local())
+        monkeypatch.setattr(app, "CATALOG_SNAPSHOT", "")
+        monkeypatch.setattr(app, "_detail_cache", app._LRUCache(100, 2**20))
+        monkeypatch.setattr(app, "_catalog_version", None)
+        monkeypatch.setattr(app, "_catalog_version_checked_at", 0.0)
+        yield app
+
+
+@pytest.fixture
+def bff(monkeypatch):
+    """bff.app (transport http, sans hedging), breakers / latences / cache de détails remis à zéro."""
+    from bff import app
+
+    monkeypatch.setattr(app, "TRANSPORT", "http")
+    monkeypatch.setattr(app, "HEDGE_ENABLED", False)
+    monkeypatch.setattr(app, "_breakers", {})
+    monkeypatch.setattr(app, "_op_stats", {})
+    monkeypatch.setattr(app, "DETAIL_CACHE_TTL", 0.0)
+    monkeypatch.setattr(app, "_detail_cache", app._LRUCache(100, 2**20))
+    yield app
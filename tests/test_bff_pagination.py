@@ -0,0 +1,52 @@
+"""BFF : pagination products-service (next_token), erreurs et délai global."""
+import json
+
+from common import StubUpstream
+from conftest import api_event
+
+PAGES = 4
+PER_PAGE = 3
+
+
+def paged_route(fail_page=None):
+    def route(method, path, query, body):
+        page = int(query.get("next_token") or 0)
+        if page == fail_page:
+            return 500, {"message": "Internal server error"}
+        items = [{"product_id": f"p-{page}-{i}"} for i in range(PER_PAGE)]
+        if page + 1 < PAGES:
+            return 200, {"items": items, "next_token": str(page + 1)}
+        return 200, {"items": items}
+    return route
+
+
+def list_products(app):
+    res = app.handler(api_event("GET", "/api/products"), None)
+    return res["statusCode"], json.loads(res["body"])
+
+
+def test_follows_next_token_to_the_end(bff, monkeypatch):
+    with StubUpstream(paged_route()) as stub:
+        monkeypatch.setattr(bff, "PRODUCTS_BASE", stub.base_url)
+        status, body = list_products(bff)
+    assert status == 200
+    assert [it["product_id"] for it in body["items"]] == [f"p-{p}-{i}" for p in range(PAGES) for i in range(PER_PAGE)]
+    assert stub.requests == PAGES
+
+
+def test_upstream_error_mid_pagination_is_returned(bff, monkeypatch):
+    with StubUpstream(paged_route(fail_page=2)) as stub:
+        monkeypatch.setattr(bff, "PRODUCTS_BASE", stub.base_url)
+        status, body = list_products(bff)
+    assert (status, body) == (500, {"message": "Internal server error"})
+    assert stub.requests == 3  # pas de page après l'erreur
+
+
+def test_pagination_deadline_returns_504(bff, monkeypatch):
+    monkeypatch.setattr(bff, "PAGINATION_DEADLINE", 0.25)
+    with StubUpstream(paged_route(), latency=0.1) as stub:
+        monkeypatch.setattr(bff, "PRODUCTS_BASE", stub.base_url)
+        status, body = list_products(bff)
+    assert status == 504
+    assert body["error"] == "upstream_deadline_exceeded"
+    assert 0 < body["pages"] < PAGES
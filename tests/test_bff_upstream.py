@@ -0,0 +1,155 @@
+"""BFF : client upstream (échéance Lambda, circuit breaker, ids invalides)."""
+import json
+import time
+from urllib.parse import unquote
+
+from common import StubUpstream
+from conftest import api_event
+
+
+class FakeContext:
+    """Contexte Lambda minimal : temps restant avant le Timeout."""
+
+    def __init__(self, remaining_ms: int):
+        self.deadline = time.monotonic() + remaining_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self.deadline - time.monotonic()) * 1000)
+
+
+def detail(app, pid: str, context=None, headers=None):
+    res = app.handler(api_event("GET", f"/api/products/{pid}", product_id=pid, headers=headers), context)
+    return res["statusCode"], json.loads(res["body"])
+
+
+class Upstream:
+    """products-service simulé : mode "up" (200 / 404), "down" (503) ou "hang" (latence)."""
+
+    def __init__(self):
+        self.mode = "up"
+        self.paths = []
+
+    def route(self, method, path, query, body):
+        self.paths.append(path)
+        if self.mode == "down":
+            return 503, {"message": "Service Unavailable"}
+        pid = unquote(path.rsplit("/", 1)[-1])
+        if pid.startswith("inconnu"):
+            return 404, {"error": "product_not_found", "product_id": pid}
+        return 200, {"product_id": pid}
+
+    def latency(self):
+        return 2.0 if self.mode == "hang" else 0.0
+
+
+def stub(bff, monkeypatch, upstream):
+    s = StubUpstream(upstream.route, latency_fn=upstream.latency)
+    s.__enter__()
+    monkeypatch.setattr(bff, "PRODUCTS_BASE", s.base_url)
+    return s
+
+
+def breaker_state(bff):
+    (state,) = bff._upstream_metrics()["breakers"].values()
+    return state
+
+
+def test_deadline_returns_504_before_lambda_timeout(bff, monkeypatch):
+    upstream = Upstream()
+    upstream.mode = "hang"
+    s = stub(bff, monkeypatch, upstream)
+    try:
+        t0 = time.monotonic()
+        status, body = detail(bff, "p-1", FakeContext(600))
+        elapsed = time.monotonic() - t0
+    finally:
+        s.__exit__()
+    assert (status, body) == (504, {"error": "upstream_timeout"})
+    assert elapsed < 0.6 - bff.DEADLINE_MARGIN + 0.2
+
+
+def test_exhausted_budget_skips_the_call(bff, monkeypatch):
+    upstream = Upstream()
+    s = stub(bff, monkeypatch, upstream)
+    try:
+        status, body = detail(bff, "p-1", FakeContext(int(bff.DEADLINE_MARGIN * 1000) - 50))
+    finally:
+        s.__exit__()
+    assert (status, body) == (504, {"error": "deadline_exceeded"})
+    assert upstream.paths == []
+
+
+def test_breaker_opens_fails_fast_and_reopens_after_failed_probe(bff, monkeypatch):
+    monkeypatch.setattr(bff, "BREAKER_COOLDOWN", 0.2)
+    upstream = Upstream()
+    upstream.mode = "down"
+    s = stub(bff, monkeypatch, upstream)
+    try:
+        for _ in range(bff.BREAKER_THRESHOLD):
+            assert detail(bff, "p-1")[0] == 503
+        assert breaker_state(bff)["state"] == "open"
+
+        calls = len(upstream.paths)
+        assert detail(bff, "p-1") == (503, {"error": "upstream_circuit_open"})
+        assert len(upstream.paths) == calls  # refusé sans appel
+
+        time.sleep(0.25)
+        assert detail(bff, "p-1")[0] == 503  # essai semi-ouvert, upstream toujours en panne
+        assert len(upstream.paths) == calls + 1
+        state = breaker_state(bff)
+        assert state["state"] == "open" and state["trips"] == 2
+        assert detail(bff, "p-1") == (503, {"error": "upstream_circuit_open"})
+
+        upstream.mode = "up"
+        time.sleep(0.25)
+        assert detail(bff, "p-1") == (200, {"product_id": "p-1"})  # essai réussi : fermé
+        assert breaker_state(bff)["state"] == "closed"
+        assert detail(bff, "p-2")[0] == 200
+    finally:
+        s.__exit__()
+
+
+def test_upstream_4xx_does_not_count_as_failure(bff, monkeypatch):
+    upstream = Upstream()
+    s = stub(bff, monkeypatch, upstream)
+    try:
+        for i in range(2 * bff.BREAKER_THRESHOLD):
+            assert detail(bff, f"inconnu-{i}")[0] == 404
+    finally:
+        s.__exit__()
+    state = breaker_state(bff)
+    assert state["state"] == "closed" and state["failures"] == 0
+
+
+def test_malformed_ids_are_encoded_and_never_open_the_breaker(bff, monkeypatch):
+    upstream = Upstream()
+    s = stub(bff, monkeypatch, upstream)
+    try:
+        for pid in ["bad id"] * (2 * bff.BREAKER_THRESHOLD) + ["a/b?c=d#e", "é"]:
+            assert detail(bff, pid) == (200, {"product_id": pid})
+        assert upstream.paths[0] == "/products/bad%20id"
+        assert "/products/a%2Fb%3Fc%3Dd%23e" in upstream.paths
+        assert breaker_state(bff)["state"] == "closed"
+        assert detail(bff, "abc") == (200, {"product_id": "abc"})
+    finally:
+        s.__exit__()
+
+
+def test_unbuildable_request_is_400_and_releases_the_probe(bff, monkeypatch):
+    monkeypatch.setattr(bff, "BREAKER_COOLDOWN", 0.1)
+    upstream = Upstream()
+    upstream.mode = "down"
+    s = stub(bff, monkeypatch, upstream)
+    try:
+        for _ in range(bff.BREAKER_THRESHOLD):
+            detail(bff, "p-1")
+        upstream.mode = "up"
+        time.sleep(0.15)
+        # header invalide reçu du client : rien ne part, l'essai semi-ouvert reste disponible
+        bad = {"X-Correlation-Id": "a\r\nX-Injecte: 1"}
+        assert detail(bff, "p-1", headers=bad) == (400, {"error": "invalid_request"})
+        assert breaker_state(bff)["state"] == "open"  # pas bloqué en "half_open"
+        assert detail(bff, "p-1") == (200, {"product_id": "p-1"})
+        assert breaker_state(bff)["state"] == "closed"
+    finally:
+        s.__exit__()
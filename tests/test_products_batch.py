@@ -0,0 +1,49 @@
+"""GET /products?ids=... (products-service) et /api/products/batch (BFF) : entrées invalides."""
+import json
+
+from conftest import api_event, put_catalog_version
+
+
+def batch(app, ids: str):
+    res = app.handler(api_event("GET", "/products", {"ids": ids}), None)
+    return res["statusCode"], json.loads(res["body"])
+
+
+def test_empty_ids_rejected(products):
+    for ids in ("", " ", ",,", " , "):
+        assert batch(products, ids) == (400, {"error": "invalid_ids"})
+
+
+def test_too_many_ids_rejected(products):
+    ids = ",".join(f"p-{i}" for i in range(products.MAX_BATCH_IDS + 1))
+    status, body = batch(products, ids)
+    assert status == 400
+    assert body == {"error": "too_many_ids", "max": products.MAX_BATCH_IDS, "got": products.MAX_BATCH_IDS + 1}
+
+
+def test_limit_fits_in_an_api_gateway_url(products):
+    # ids du seeder (<top>__<leaf>__<hash>) : ligne de requête < 10 Ko à la limite
+    ids = ",".join(f"granules-de-bois__granules-de-bois-premium-sac-15kg-{i:04d}__0a1b2c3d"
+                   for i in range(products.MAX_BATCH_IDS))
+    assert len(f"GET /products?ids={ids} HTTP/1.1") < 10 * 1024
+
+
+def test_unknown_duplicate_and_meta_ids(products, catalog):
+    put_catalog_version(products, "v1")
+    known = [catalog[3]["product_id"], catalog[1]["product_id"]]
+    ids = ",".join([known[0], "inconnu", known[1], known[0], products.CATALOG_META_ID])
+    status, body = batch(products, ids)
+    assert status == 200
+    assert [it["product_id"] for it in body["items"]] == known  # ordre demandé, doublon ignoré
+    assert body["missing"] == ["inconnu", products.CATALOG_META_ID]
+
+
+def test_bff_requires_ids(bff):
+    for qs in (None, {"ids": ""}, {"ids": "  "}):
+        res = bff.handler(api_event("GET", "/api/products/batch", qs), None)
+        assert (res["statusCode"], json.loads(res["body"])) == (400, {"error": "missing_ids"})
+
+
+def test_bff_keeps_commas_in_upstream_query(bff):
+    url = bff._with_query("http://upstream/products", ids="a,b c,d&e", fields="name,source_url")
+    assert url == "http://upstream/products?ids=a,b+c,d%26e&fields=name,source_url"
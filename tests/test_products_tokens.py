@@ -0,0 +1,98 @@
+"""products-service : next_token (Query sur GSI, Scan, Scan segmenté) malformé ou altéré -> 400."""
+import base64
+import json
+
+import pytest
+
+from conftest import api_event
+
+
+def list_products(app, **qs):
+    res = app.handler(api_event("GET", "/products", qs), None)
+    return res["statusCode"], json.loads(res["body"])
+
+
+def token(obj) -> str:
+    return base64.urlsafe_b64encode(json.dumps(obj).encode("utf-8")).decode("utf-8")
+
+
+def drain(app, **qs):
+    items, pages = [], 0
+    while True:
+        status, body = list_products(app, **qs)
+        assert status == 200
+        items += body["items"]
+        pages += 1
+        if "next_token" not in body:
+            return items, pages
+        qs["next_token"] = body["next_token"]
+
+
+def test_query_tokens_round_trip(products, catalog):
+    items, pages = drain(products, type="product", limit="7")
+    assert pages > 1
+    want = [x["product_id"] for x in catalog if x["type"] == "product"]
+    assert sorted(it["product_id"] for it in items) == sorted(want)
+
+
+def test_segmented_scan_tokens_round_trip(products, catalog):
+    items, pages = drain(products, limit="10", segments="4")
+    assert pages > 1
+    assert sorted(it["product_id"] for it in items) == sorted(x["product_id"] for x in catalog)
+
+
+@pytest.mark.parametrize("next_token", [
+    "pas du base64 !",
+    base64.urlsafe_b64encode(b"{pas du json").decode(),
+    token(["product_id", "x"]),
+    token("x"),
+])
+def test_malformed_token(products, next_token):
+    assert list_products(products, next_token=next_token) == (400, {"error": "invalid_next_token"})
+
+
+@pytest.mark.parametrize("qs, start", [
+    # Query sur type-index : product_id + type attendus
+    ({"type": "product"}, {"product_id": "x"}),
+    ({"type": "product"}, {"product_id": "x", "category": "famille-0"}),
+    ({"type": "product"}, {"product_id": 5, "type": "product"}),
+    ({"type": "product"}, {"product_id": "x", "type": "product", "admin": True}),
+    # Scan (séquentiel) : product_id seul
+    ({"segments": "1"}, {"product_id": "x", "type": "product"}),
+    ({"segments": "1"}, {"product_id": ["x"]}),
+    ({"segments": "1"}, {}),
+])
+def test_tampered_start_key(products, qs, start):
+    assert list_products(products, next_token=token(start), **qs) == (400, {"error": "invalid_next_token"})
+
+
+@pytest.mark.parametrize("qs, start", [
+    ({}, {"segments": []}),
+    ({}, {"segments": [None, None]}),                       # tout lu : rien à reprendre
+    ({}, {"segments": [{}] * 17}),                          # > MAX_SCAN_SEGMENTS
+    ({}, {"segments": [{"product_id": 1}, {}]}),
+    ({}, {"segments": [{"product_id": "x", "type": "product"}, {}]}),
+    ({}, {"segments": ["x", {}]}),
+    ({}, {"segments": {"0": {}}}),
+    ({}, {"segments": [{}, {}], "product_id": "x"}),
+    ({"type": "product"}, {"segments": [{}, {}]}),          # token de Scan sur une Query
+])
+def test_tampered_segment_token(products, qs, start):
+    assert list_products(products, next_token=token(start), **qs) == (400, {"error": "invalid_next_token"})
+
+
+def test_snapshot_rejects_foreign_tokens(products, monkeypatch, tmp_path, catalog):
+    import seed_cid_products as seed
+    from common import typed_item
+
+    path = str(tmp_path / "catalog_snapshot.json.gz")
+    seed.write_snapshot(seed.build_snapshot([typed_item(x) for x in catalog]), path)
+    monkeypatch.setattr(products, "CATALOG_SNAPSHOT", path)
+    monkeypatch.setattr(products, "_snapshot", None)
+    monkeypatch.setattr(products, "_snapshot_marker", None)
+
+    # token d'une Query sur la table : accepté (product_id seul compte)
+    status, body = list_products(products, type="product", next_token=token({"product_id": "a", "type": "product"}))
+    assert status == 200 and body["items"]
+    for start in ({"segments": [{}, {}]}, {"product_id": 5}, {"type": "product"}):
+        assert list_products(products, next_token=token(start)) == (400, {"error": "invalid_next_token"})
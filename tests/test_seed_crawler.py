@@ -0,0 +1,121 @@
+"""seed_cid_products : crawl concurrent face à un site lent ou en erreur (throttle, reprises)."""
+import io
+import threading
+import time
+from urllib.error import HTTPError
+
+import seed_cid_products as seed
+from common import SyntheticSite
+
+URL = "https://cidgroupe.com/engrais"
+PAGE = b"<html><head><title>Engrais | CID Groupe</title></head><body><a href='/engrais/gamme-0'>g</a></body></html>"
+
+
+class ScriptedGet:
+    """get_fn de PageFetcher : rejoue une suite de réponses (code HTTP, exception ou 200)."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self, url, headers):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, int) and outcome != 200:
+            raise HTTPError(url, outcome, "erreur", {}, None)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return 200, io.BytesIO(PAGE), {"ETag": '"v1"'}
+
+
+def fetcher(get_fn, retries=2):
+    return seed.PageFetcher(throttle=seed.HostThrottle(per_host=2, first_backoff=0.01), retries=retries,
+                            get_fn=get_fn)
+
+
+def test_transient_errors_are_retried():
+    for first in (503, 429, TimeoutError("lent"), ConnectionResetError()):
+        get = ScriptedGet(first, 200)
+        f = fetcher(get)
+        page = f.get(URL)
+        assert page["title"] == "Engrais"
+        assert get.calls == 2 and f.stats["errors"] == 0
+        assert f.throttle.stats()["cidgroupe.com"]["errors"] == 1
+
+
+def test_missing_page_is_not_retried_nor_throttled():
+    get = ScriptedGet(404)
+    f = fetcher(get)
+    assert f.get(URL) is None
+    assert get.calls == 1 and f.stats["errors"] == 1
+    host = f.throttle.stats()["cidgroupe.com"]
+    assert host["errors"] == 0 and host["interval"] == 0
+
+
+def test_persistent_failure_gives_up_after_retries():
+    get = ScriptedGet(500)
+    f = fetcher(get, retries=2)
+    assert f.get(URL) is None
+    assert get.calls == 3 and f.stats["errors"] == 1
+    assert f.get(URL) is None and get.calls == 3  # pas de nouvel essai pendant le même run
+    assert f.title(URL) == URL
+
+
+def test_throttle_backs_off_then_recovers():
+    throttle = seed.HostThrottle(per_host=1, min_interval=0.0, max_interval=0.4, slow_after=0.05, first_backoff=0.1)
+    st = throttle.acquire("h")
+    throttle.release(st, 0.01, ok=False)
+    assert st["interval"] == 0.1
+    for want in (0.2, 0.4, 0.4):  # doublé, plafonné à max_interval
+        throttle.release(throttle.acquire("h"), 0.01, ok=False)
+        assert st["interval"] == want
+    throttle.release(throttle.acquire("h"), 0.06, ok=True)  # lente : compte comme un ralentissement
+    assert st["slow"] == 1 and st["interval"] == 0.4
+    while st["interval"] > 0:
+        throttle.release(throttle.acquire("h"), 0.0, ok=True)
+    assert throttle.stats()["h"]["errors"] == 4
+
+
+def test_throttle_bounds_requests_in_flight_per_host():
+    throttle = seed.HostThrottle(per_host=2)
+    lock = threading.Lock()
+    state = {"now": 0, "max": 0}
+
+    def request():
+        st = throttle.acquire("h")
+        with lock:
+            state["now"] += 1
+            state["max"] = max(state["max"], state["now"])
+        time.sleep(0.01)
+        with lock:
+            state["now"] -= 1
+        throttle.release(st, 0.01, ok=True)
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert state["max"] == 2
+
+
+def crawl(site, **kwargs):
+    get_fn = lambda url, headers: seed.http_open(site.fetch_url(url), headers)  # noqa: E731
+    f = seed.PageFetcher(throttle=seed.HostThrottle(per_host=4, first_backoff=0.01), get_fn=get_fn)
+    return seed.crawl(seed.START_URLS, f, workers=8, **kwargs), f
+
+
+def test_flaky_site_gives_the_same_urls():
+    with SyntheticSite(subs=2, products=3) as site:
+        (ref_seen, ref_urls), _ = crawl(site)
+    with SyntheticSite(subs=2, products=3, flaky=0.3) as site:
+        (seen, urls), f = crawl(site)
+    assert (seen, urls) == (ref_seen, ref_urls)
+    assert f.stats["errors"] == len(SyntheticSite.TOPS)  # lien mort "gamme-<subs>" de chaque famille (404)
+    assert sum(h["errors"] for h in f.throttle.stats().values()) > 0  # 503 rejouées
+
+
+def test_max_pages_cut_is_kept():
+    with SyntheticSite(subs=2, products=3) as site:
+        (seen, urls), _ = crawl(site, max_pages=10)
+    assert len(seen) == 10 and len(urls) <= 10